@@ -1,12 +1,19 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, make_response, g, session, jsonify
-from casa_apuestas import CasaDeApuestas
-import csv
-from io import StringIO, BytesIO
-from openpyxl import Workbook
-from openpyxl.styles import Font, PatternFill, Alignment
-import threading
+from flask import Flask, render_template, request, redirect, url_for, flash, make_response, g, session, jsonify, send_file
+from flask import Response, stream_with_context
+from casa_apuestas import PoolConexiones, inicializar_base_datos
+from cache_reportes import CacheReportes, etag_para
+from archivo import adjuntar_archivos, directorio_por_defecto
+from simulador_riesgo import simular_riesgo
+from eventos import BusEventos
+from cuotas import CacheCuotas
+import cola_escritura
+import replica_reportes
+from metricas import instrumentar_app
+# exportaciones y simulador_riesgo cargan openpyxl y NumPy en su primer uso, no aquí
+from exportaciones import EXCEL_MIMETYPE, escribir_excel, generar_csv, generar_ndjson
+import logging
+import tempfile
 import time
-import webbrowser
 import sys
 import os
 
@@ -23,21 +30,121 @@ template_folder = resource_path('templates')
 app = Flask(__name__, template_folder=template_folder)
 app.secret_key = "llave_secreta_para_local"
 
+# --- Logs y métricas ---
+logging.basicConfig(level=os.environ.get('CASA_LOG_LEVEL', 'INFO'),
+                    format="%(asctime)s %(levelname)s [%(name)s] %(message)s")
+log = logging.getLogger('casa_apuestas.app')
+# Latencia por ruta, SQL por petición y GET /metrics (ver metricas.py)
+instrumentar_app(app, 'casa')
+
 # --- Configuración DB ---
 DB_FILENAME = 'casa_apuestas.db'
-DB_PATH = resource_path(DB_FILENAME)
+DB_PATH = os.environ.get('CASA_DB_PATH') or resource_path(DB_FILENAME)
+
+# El index solo muestra las últimas partidas resueltas; el resto está en /reportes
+LIMITE_PARTIDAS_RESUELTAS_INDEX = 10
+# Filas por página en las tablas de /reportes
+TAMANO_PAGINA_REPORTES = 50
+# Bases del historial archivado (ver archivo.py); /reportes?incluir_archivo=1 las consulta
+DIRECTORIO_ARCHIVO = directorio_por_defecto(DB_PATH)
+# Tope de simulaciones por petición en /api/reportes/riesgo
+MAX_SIMULACIONES_RIESGO = 100000
+# Hilos de cada worker que nunca se dan a un stream de /eventos (quedan para las demás rutas)
+HILOS_PETICIONES = int(os.environ.get('CASA_HILOS_PETICIONES', 8))
 
 # --- Gestión DB ---
+# El esquema se crea una sola vez al cargar el módulo (arranque del worker);
+# cada hilo reutiliza su propia conexión del pool entre peticiones.
+inicializar_base_datos(DB_PATH)
+pool_conexiones = PoolConexiones(DB_PATH)
+
+# Un hilo por worker lee la tabla eventos y la reparte a los clientes de /eventos
+bus_eventos = BusEventos(DB_PATH)
+# Pozos y cuotas de las partidas abiertas en memoria, al día con los eventos del bus
+cache_cuotas = CacheCuotas(DB_PATH, bus_eventos)
+
+# Con CASA_COLA_ESCRITURA=1 las escrituras se agrupan en transacciones (ver cola_escritura.py)
+cola = cola_escritura.ColaEscritura(DB_PATH) if cola_escritura.ACTIVA else None
+
+# Con CASA_REPLICA_REPORTES=1 /reportes y las exportaciones leen una copia (ver replica_reportes.py)
+replica = replica_reportes.ReplicaReportes(DB_PATH) if replica_reportes.ACTIVA else None
+
+# Caché de reportes por worker; la clave lleva la versión de datos guardada en SQLite
+cache_reportes = CacheReportes()
+
+def _flash_error(mensaje, e):
+    """Muestra el error al usuario; los que no son de validación (ValueError) quedan en el log con traza."""
+    if isinstance(e, ValueError):
+        log.info("%s: %s", mensaje, e)
+    else:
+        log.exception("%s: %s", mensaje, e)
+    flash(f"{mensaje}: {e}", "error")
+
 def get_casa():
     if 'casa' not in g:
-        g.casa = CasaDeApuestas(DB_PATH)
+        g.casa = pool_conexiones.obtener()
     return g.casa
 
+def escribir(metodo, *args):
+    """casa.metodo(*args) con la conexión del hilo, o por la cola de group commit si está activa."""
+    if cola is not None:
+        return cola.ejecutar(metodo, *args)
+    return getattr(get_casa(), metodo)(*args)
+
+def get_casa_reportes():
+    """Conexión para los reportes pesados: la copia de solo lectura si está activa, si no la del pool."""
+    if replica is None:
+        return get_casa()
+    if 'casa_reportes' not in g:
+        replica.iniciar()
+        g.casa_reportes = replica.obtener()
+    return g.casa_reportes
+
+def _versiones_reportes(casa):
+    """Versiones de datos para el ETag; con la copia activa cuenta también la fecha de la copia."""
+    versiones = casa.obtener_versiones_datos()
+    if replica is not None:
+        versiones = {**versiones, 'copia': int(replica.copiada_en() or 0)}
+    return versiones
+
+def _info_replica():
+    """Fecha y antigüedad de la copia para mostrarlas en /reportes (None si se lee la base viva)."""
+    if replica is None:
+        return None
+    copiada = replica.copiada_en()
+    return {'copiada_en': time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(copiada)),
+            'antiguedad_s': int(time.time() - copiada), 'intervalo_s': int(replica.intervalo),
+            'max_antiguedad_s': int(replica.max_antiguedad)}
+
 @app.teardown_appcontext
 def teardown_casa(exception):
     casa = g.pop('casa', None)
     if casa is not None:
-        casa.cerrar_conexion()
+        pool_conexiones.liberar(casa)
+    casa_reportes = g.pop('casa_reportes', None)
+    if casa_reportes is not None:
+        pool_conexiones.liberar(casa_reportes)
+
+def calentar(hilos=None):
+    """
+    Deja el worker listo antes de su primera petición (lo llama gunicorn.conf.py tras el fork):
+    compila las plantillas y abre la conexión de este hilo, que ya lee el esquema.
+    hilos son los hilos del worker (None si no los limita, p. ej. gevent). Cada cliente de
+    /eventos ocupa uno mientras dura el stream: los streams pueden usar todos menos
+    HILOS_PETICIONES, que quedan para las demás rutas (con pocos hilos, como mucho la mitad;
+    con uno solo /eventos responde 503 y el index funciona sin SSE).
+    """
+    inicio = time.perf_counter()
+    if hilos is not None:
+        bus_eventos.max_suscriptores = min(bus_eventos.max_suscriptores, max(hilos // 2, hilos - HILOS_PETICIONES))
+    for plantilla in app.jinja_env.list_templates():
+        app.jinja_env.get_template(plantilla)
+    casa = pool_conexiones.obtener()
+    try:
+        casa.obtener_versiones_datos()
+    finally:
+        pool_conexiones.liberar(casa)
+    log.info("Worker %d listo en %.0f ms", os.getpid(), (time.perf_counter() - inicio) * 1000)
 
 # --- Rutas de la Aplicación (Públicas) ---
 
@@ -47,12 +154,12 @@ def index():
     try:
         apostadores = casa.obtener_apostadores()
         partidas_abiertas = casa.obtener_partidas_abiertas()
-        partidas_resueltas = casa.obtener_partidas_resueltas()
-        apuestas_por_partida = {}
-        for partida in partidas_abiertas:
-            apuestas_por_partida[partida['id']] = casa.obtener_apuestas_partida(partida['id'])
+        partidas_resueltas = casa.obtener_partidas_resueltas(limite=LIMITE_PARTIDAS_RESUELTAS_INDEX)
+        # Todas las apuestas abiertas en una sola consulta, agrupadas por partida
+        agrupadas = casa.obtener_apuestas_abiertas_por_partida()
+        apuestas_por_partida = {p['id']: agrupadas.get(p['id'], []) for p in partidas_abiertas}
     except Exception as e:
-        print(f"Error index: {e}")
+        log.exception("Error index: %s", e)
         flash("Error al cargar datos.", "error")
         apostadores, partidas_abiertas, partidas_resueltas = [], [], []
         apuestas_por_partida = {}
@@ -60,142 +167,247 @@ def index():
     return render_template('index.html', apostadores=apostadores, 
                            partidas_abiertas=partidas_abiertas, 
                            partidas_resueltas=partidas_resueltas, 
-                           apuestas_por_partida=apuestas_por_partida)
+                           apuestas_por_partida=apuestas_por_partida,
+                           limite_resueltas=LIMITE_PARTIDAS_RESUELTAS_INDEX)
 
 @app.route('/add_apostador', methods=['POST'])
 def add_apostador():
-    casa = get_casa()
     nombre = request.form['nombre']
     try:
         saldo = float(request.form['saldo'])
-        casa.registrar_apostador(nombre, saldo)
+        escribir('registrar_apostador', nombre, saldo)
         flash(f"Apostador '{nombre}' registrado.", "success")
     except Exception as e:
-        flash(f"Error: {e}", "error")
+        _flash_error("Error", e)
     return redirect(url_for('index'))
 
 @app.route('/ajustar_saldo', methods=['POST'])
 def ajustar_saldo():
-    casa = get_casa()
     try:
         nombre = request.form['nombre_apostador']
         monto = float(request.form['monto'])
-        casa.ajustar_saldo_apostador(nombre, monto)
+        escribir('ajustar_saldo_apostador', nombre, monto)
         flash(f"Saldo ajustado para '{nombre}'.", "success")
     except Exception as e:
-        flash(f"Error: {e}", "error")
+        _flash_error("Error", e)
     return redirect(url_for('index'))
 
 @app.route('/crear_partida', methods=['POST'])
 def crear_partida():
-    casa = get_casa()
     try:
-        casa.crear_partida(request.form['equipo1'], request.form['equipo2'])
+        escribir('crear_partida', request.form['equipo1'], request.form['equipo2'])
         flash("Partida creada.", "success")
     except Exception as e:
-        flash(f"Error: {e}", "error")
+        _flash_error("Error", e)
     return redirect(url_for('index', active_tab='partidas-abiertas'))
 
 @app.route('/registrar_apuesta', methods=['POST'])
 def registrar_apuesta():
-    casa = get_casa()
     try:
-        casa.registrar_apuesta(int(request.form['partida_id']), 
-                               request.form['nombre_apostador'], 
-                               float(request.form['monto']), 
-                               int(request.form['equipo']))
+        escribir('registrar_apuesta', int(request.form['partida_id']),
+                 request.form['nombre_apostador'],
+                 float(request.form['monto']),
+                 int(request.form['equipo']))
         flash("Apuesta registrada.", "success")
     except Exception as e:
-        flash(f"Error: {e}", "error")
+        _flash_error("Error", e)
     return redirect(url_for('index', active_tab='partidas-abiertas'))
 
+@app.route('/api/apuestas/lote', methods=['POST'])
+def registrar_apuestas_lote():
+    """Registra un lote de apuestas (JSON) en una sola transacción: todo o nada."""
+    datos = request.get_json(silent=True) or {}
+    apuestas = datos.get('apuestas')
+    if not isinstance(apuestas, list):
+        return jsonify({"status": "error", "error": "Se esperaba {'apuestas': [...]}."}), 400
+    try:
+        registradas = escribir('registrar_apuestas_lote', apuestas)
+    except ValueError as e:
+        return jsonify({"status": "error", "error": str(e)}), 400
+    return jsonify({"status": "success", "registradas": registradas})
+
 @app.route('/resolver_partida', methods=['POST'])
 def resolver_partida():
-    casa = get_casa()
     try:
-        casa.resolver_partida(int(request.form['partida_id']), int(request.form['equipo_ganador']))
+        escribir('resolver_partida', int(request.form['partida_id']), int(request.form['equipo_ganador']))
         flash("Partida resuelta.", "success")
     except Exception as e:
-        flash(f"Error: {e}", "error")
+        _flash_error("Error", e)
     return redirect(url_for('index', active_tab='partidas-resueltas'))
 
+@app.route('/eventos')
+def eventos():
+    """Stream SSE de apuestas, pozos y partidas (ver eventos.py); admite Last-Event-ID."""
+    desde_id = request.headers.get('Last-Event-ID', type=int)
+    if desde_id is None:
+        desde_id = request.args.get('desde', type=int)
+    suscripcion = bus_eventos.suscribir()
+    if suscripcion is None:
+        return jsonify({"status": "error", "error": "Demasiados clientes conectados."}), 503
+    resp = Response(bus_eventos.flujo(suscripcion, desde_id), mimetype='text/event-stream')
+    resp.headers['Cache-Control'] = 'no-cache'
+    resp.headers['X-Accel-Buffering'] = 'no'  # que un proxy nginx no acumule el stream
+    return resp
+
+def _filtros_reportes():
+    """Filtros de /reportes tomados de la query string (vacíos = sin filtro)."""
+    return {
+        'apostador': request.args.get('apostador') or None,
+        'partida_id': request.args.get('partida_id', type=int),
+        'desde': request.args.get('desde') or None,
+        'hasta': request.args.get('hasta') or None,
+        'incluir_archivo': 1 if request.args.get('incluir_archivo') else None,
+    }
+
+def _respuesta_no_modificada(etag):
+    """304 si el cliente ya tiene esta versión (salvo que haya mensajes flash pendientes de mostrar)."""
+    if request.if_none_match.contains(etag) and not session.get('_flashes'):
+        resp = make_response('', 304)
+        resp.set_etag(etag)
+        return resp
+    return None
+
+def _marcar_cacheable(resp, etag):
+    resp.set_etag(etag)
+    # El navegador puede guardarla, pero debe revalidar siempre con If-None-Match
+    resp.headers['Cache-Control'] = 'private, no-cache'
+    return resp
+
 @app.route('/reportes')
 def reportes():
-    casa = get_casa()
     try:
-        return render_template('reportes.html', 
-                               apostadores=casa.obtener_balance_apostadores(), 
-                               rentabilidad=casa.calcular_rentabilidad_total() or 0.0,
-                               reporte_partidas=casa.obtener_reporte_partidas(),
-                               reporte_apuestas_detallado=casa.obtener_reporte_apuestas_detallado())
+        casa = get_casa_reportes()
+        etag = etag_para('reportes', _versiones_reportes(casa))
+        no_modificada = _respuesta_no_modificada(etag)
+        if no_modificada:
+            return no_modificada
+        datos = cache_reportes.obtener(('reportes', etag, request.query_string),
+                                       lambda: _datos_reportes(casa))
+        return _marcar_cacheable(make_response(render_template('reportes.html', replica=_info_replica(), **datos)),
+                                 etag)
     except Exception as e:
-        flash(f"Error reportes: {e}", "error")
+        _flash_error("Error reportes", e)
         return redirect(url_for('index'))
 
+def _datos_reportes(casa):
+    """Consulta los datos de /reportes (página y filtros de la query string)."""
+    filtros = _filtros_reportes()
+    # Cursores keyset: 'detalle_despues=<partida_id>-<id>' y 'partidas_despues=<id>'
+    detalle_despues = request.args.get('detalle_despues')
+    if detalle_despues:
+        detalle_despues = tuple(int(x) for x in detalle_despues.split('-', 1))
+    partidas_despues = request.args.get('partidas_despues', type=int)
+    if filtros['incluir_archivo']:
+        adjuntar_archivos(casa, DIRECTORIO_ARCHIVO)
+
+    detalle, siguiente_detalle = casa.obtener_reporte_apuestas_pagina(
+        TAMANO_PAGINA_REPORTES, despues_de=detalle_despues, **filtros)
+    partidas, siguiente_partidas = casa.obtener_reporte_partidas_pagina(
+        TAMANO_PAGINA_REPORTES, despues_de=partidas_despues, **filtros)
+    return dict(apostadores=casa.obtener_balance_apostadores(filtros['incluir_archivo']), 
+                rentabilidad=casa.calcular_rentabilidad_total(filtros['incluir_archivo']) or 0.0,
+                reporte_partidas=partidas,
+                reporte_apuestas_detallado=detalle,
+                filtros=filtros,
+                siguiente_detalle=f"{siguiente_detalle[0]}-{siguiente_detalle[1]}" if siguiente_detalle else None,
+                siguiente_partidas=siguiente_partidas)
+
+@app.route('/api/reportes/resumen')
+def resumen_reportes():
+    """Cuadros resumen del reporte (coste constante: solo lee las tablas de resumen)."""
+    casa = get_casa()
+    etag = etag_para('resumen', casa.obtener_versiones_datos())
+    no_modificada = _respuesta_no_modificada(etag)
+    if no_modificada:
+        return no_modificada
+    resumen = cache_reportes.obtener(('resumen', etag), casa.obtener_resumen_reportes)
+    return _marcar_cacheable(jsonify({"status": "success", **resumen}), etag)
+
+@app.route('/api/reportes/riesgo')
+def riesgo_partidas_abiertas():
+    """Riesgo de las partidas abiertas (ver simulador_riesgo.py): ?simulaciones=&modelo=&metodo=&seed="""
+    casa = get_casa()
+    # Cualquier apuesta o resolución sube 'saldos', así que la versión sirve de clave
+    etag = etag_para('riesgo', casa.obtener_versiones_datos())
+    no_modificada = _respuesta_no_modificada(etag)
+    if no_modificada:
+        return no_modificada
+    simulaciones = min(request.args.get('simulaciones', 10000, type=int), MAX_SIMULACIONES_RIESGO)
+    try:
+        riesgo = cache_reportes.obtener(('riesgo', etag, request.query_string), lambda: simular_riesgo(
+            casa, simulaciones, request.args.get('modelo', 'pozo'),
+            seed=request.args.get('seed', type=int), metodo=request.args.get('metodo', 'auto')))
+    except ValueError as e:
+        return jsonify({"status": "error", "error": str(e)}), 400
+    return _marcar_cacheable(jsonify({"status": "success", **riesgo}), etag)
+
+@app.route('/api/odds')
+def cuotas_partidas_abiertas():
+    """Pozos y cuotas (pago por unidad apostada) de todas las partidas abiertas, desde memoria."""
+    return jsonify({"status": "success", "partidas": cache_cuotas.obtener()})
+
+@app.route('/api/odds/<int:partida_id>')
+def cuotas_partida(partida_id):
+    cuotas = cache_cuotas.obtener(partida_id)
+    if cuotas is None:
+        return jsonify({"status": "error", "error": f"Partida {partida_id} no encontrada o ya resuelta."}), 404
+    return jsonify({"status": "success", **cuotas})
+
 @app.route('/exportar_excel')
 def exportar_excel():
-    casa = get_casa()
     try:
-        wb = Workbook()
-        header_font = Font(bold=True, color="FFFFFF")
-        header_fill = PatternFill(start_color="4472C4", end_color="4472C4", fill_type="solid")
-        header_align = Alignment(horizontal="center", vertical="center")
-        
-        # Hoja 1
-        ws1 = wb.active
-        ws1.title = "Balance Consolidado"
-        ws1.append(['Apostador', 'Saldo Final', 'Total Apostado', 'Total Retornado', 'Ganancia Neta'])
-        for cell in ws1[1]: cell.font, cell.fill, cell.alignment = header_font, header_fill, header_align
-        
-        for a in casa.obtener_balance_apostadores():
-            ws1.append([a.get('nombre'), a.get('saldo_final'), a.get('total_apostado'), a.get('total_ganado'), a.get('ganancia_neta')])
-            
-        # Hoja 2
-        ws2 = wb.create_sheet("Ganancias Casa")
-        ws2.append(['Partida', 'Ganador', 'Comisión (S/)'])
-        for cell in ws2[1]: cell.font, cell.fill, cell.alignment = header_font, header_fill, header_align
-        
-        for p in casa.obtener_reporte_partidas():
-            ganador = p['nombre_equipo1'] if p['equipo_ganador'] == 1 else p['nombre_equipo2']
-            ws2.append([f"{p['nombre_equipo1']} vs {p['nombre_equipo2']}", ganador, p['ganancia_casa']])
-        ws2.append(['TOTAL','', casa.calcular_rentabilidad_total() or 0.0])
-
-        # Hoja 3
-        ws3 = wb.create_sheet("Detalle Apuestas")
-        ws3.append(['Partida ID', 'Apostador', 'Partida', 'Equipo Apostado', 'Monto', 'Cobrado', 'Neto', 'Resultado'])
-        for cell in ws3[1]: cell.font, cell.fill, cell.alignment = header_font, header_fill, header_align
-        
-        for ap in casa.obtener_reporte_apuestas_detallado():
-            ws3.append([ap.get('partida_id'), ap.get('apostador'), ap.get('partida_nombre'), ap.get('equipo_apostado_nombre'),
-                        ap.get('monto_apostado'), ap.get('monto_cobrado'), ap.get('ganancia_neta'), ap.get('resultado_texto')])
-
-        out = BytesIO()
-        wb.save(out)
-        out.seek(0)
-        resp = make_response(out.read())
-        resp.headers["Content-Disposition"] = "attachment; filename=reporte_casa_apuestas.xlsx"
-        resp.headers["Content-type"] = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-        return resp
+        casa = get_casa_reportes()
+        etag = etag_para('excel', _versiones_reportes(casa))
+        no_modificada = _respuesta_no_modificada(etag)
+        if no_modificada:
+            return no_modificada
+        # Se escribe a un archivo temporal (no a memoria) y se envía por trozos;
+        # el archivo se cierra y desaparece al terminar la respuesta.
+        archivo = tempfile.TemporaryFile(suffix='.xlsx')
+        escribir_excel(casa, archivo)
+        archivo.seek(0)
+        return _marcar_cacheable(send_file(archivo, mimetype=EXCEL_MIMETYPE, as_attachment=True,
+                                           download_name="reporte_casa_apuestas.xlsx"), etag)
     except Exception as e:
-        print(f"Error Excel: {e}")
-        flash(f"Error exportar: {e}", "error")
+        _flash_error("Error exportar", e)
         return redirect(url_for('index'))
 
+def _exportar_historial(generador, mimetype, extension):
+    """Respuesta en streaming del historial, leído del cursor por lotes (filtros: since_id, partida_id)."""
+    since_id = request.args.get('since_id', type=int)
+    partida_id = request.args.get('partida_id', type=int)
+    filas = get_casa_reportes().iterar_historial(since_id=since_id, partida_id=partida_id)
+    resp = Response(stream_with_context(generador(filas)), mimetype=mimetype)
+    resp.headers["Content-Disposition"] = f"attachment; filename=historial_apuestas.{extension}"
+    return resp
+
+@app.route('/exportar_csv')
+def exportar_csv():
+    return _exportar_historial(generar_csv, 'text/csv', 'csv')
+
+@app.route('/exportar_ndjson')
+def exportar_ndjson():
+    return _exportar_historial(generar_ndjson, 'application/x-ndjson', 'ndjson')
+
 @app.route('/borrar_historial', methods=['POST'])
 def borrar_historial():
     try:
-        get_casa().borrar_partidas_resueltas()
+        escribir('borrar_partidas_resueltas')
         flash("Historial borrado.", "warning")
     except Exception as e:
-        flash(f"Error: {e}", "error")
+        _flash_error("Error", e)
     return redirect(url_for('index', active_tab='partidas-resueltas'))
 
 def open_browser():
     """Abre el navegador después de que el servidor esté listo."""
+    import webbrowser  # solo en ejecución local
+
     time.sleep(1.5)
     webbrowser.open('http://127.0.0.1:5000')
 
 if __name__ == '__main__':
+    import threading
+
     # Solo abrir navegador en desarrollo local (no en Render o producción)
     # Render establece automáticamente la variable RENDER=true
     is_local = os.environ.get('RENDER') is None
@@ -0,0 +1,233 @@
+"""
+Archivado del historial de la Casa de Apuestas.
+
+Mueve las partidas resueltas anteriores a una fecha de corte (y sus filas de
+apuestas_historial) a bases SQLite por periodo, p. ej. ``archivo/historial_2025.db``.
+Trabaja por lotes acotados para que cada transacción dure poco y las apuestas
+en vivo nunca esperen mucho al bloqueo de escritura.
+
+Cada lote se procesa en dos fases:
+  1. Copia (INSERT OR IGNORE) de las filas al archivo del periodo.
+  2. Comprobación de la copia y borrado de las tablas calientes, descontando los
+     resúmenes y subiendo la versión 'historial' en la misma transacción.
+Si el proceso se corta entre las dos fases, al relanzarlo las filas ya copiadas
+se ignoran y solo queda pendiente el borrado: nunca se pierde una fila.
+
+Los archivos guardan las filas tal como se leen (vista apuestas_historial y
+columnas REAL de partidas: nombres y montos en soles), no las claves enteras ni
+los céntimos de la base caliente. Así cada archivo se entiende por sí solo y los
+creados antes de la migración 8 siguen cuadrando con los nuevos.
+
+Para consultar juntos los datos calientes y los archivados, ``adjuntar_archivos``
+adjunta los archivos a la conexión y crea las vistas temporales
+``partidas_completas`` e ``historial_completo``.
+"""
+import glob
+import json
+import os
+import re
+import time
+
+# Formato strftime del periodo de cada archivo. Ojo: SQLite admite 10 bases
+# adjuntas por conexión, por eso el periodo por defecto es el año.
+FORMATOS_PERIODO = {'anual': '%Y', 'mensual': '%Y_%m'}
+# Partidas resueltas antes de la migración 4 (sin fecha_resolucion)
+PERIODO_SIN_FECHA = 'sin_fecha'
+TABLAS_ARCHIVADAS = ('partidas', 'apuestas_historial')
+MAX_ARCHIVOS_ADJUNTOS = 10
+
+
+def directorio_por_defecto(db_name):
+    """Carpeta de archivos: CASA_ARCHIVO_DIR o 'archivo/' junto a la base principal."""
+    return os.environ.get('CASA_ARCHIVO_DIR') or os.path.join(os.path.dirname(os.path.abspath(db_name)), 'archivo')
+
+
+def ruta_archivo(directorio, periodo):
+    return os.path.join(directorio, f"historial_{periodo}.db")
+
+
+def _columnas(conexion, esquema, tabla):
+    """(nombre, tipo) de las columnas archivadas: incluye las generadas y omite las *_cent."""
+    return [(fila[1], fila[2]) for fila in conexion.execute(f"PRAGMA {esquema}.table_xinfo({tabla})").fetchall()
+            if not fila[1].endswith('_cent')]
+
+
+def _preparar_esquema_archivo(conexion, alias):
+    """
+    Crea (o completa) en el archivo las tablas archivadas con las mismas columnas
+    que las tablas calientes. Si el esquema principal ganó columnas desde que se
+    creó el archivo, se añaden con ALTER TABLE para que las copias sigan cuadrando.
+    """
+    conexion.execute(f"PRAGMA {alias}.journal_mode = WAL")
+    for tabla in TABLAS_ARCHIVADAS:
+        columnas = _columnas(conexion, 'main', tabla)
+        existentes = {nombre for nombre, _tipo in _columnas(conexion, alias, tabla)}
+        if not existentes:
+            definicion = ", ".join(f"{nombre} {tipo}" + (" PRIMARY KEY" if nombre == 'id' else "")
+                                   for nombre, tipo in columnas)
+            conexion.execute(f"CREATE TABLE {alias}.{tabla} ({definicion})")
+        else:
+            for nombre, tipo in columnas:
+                if nombre not in existentes:
+                    conexion.execute(f"ALTER TABLE {alias}.{tabla} ADD COLUMN {nombre} {tipo}")
+    conexion.execute(f"CREATE INDEX IF NOT EXISTS {alias}.idx_historial_partida ON apuestas_historial(partida_id)")
+    conexion.execute(f"CREATE INDEX IF NOT EXISTS {alias}.idx_historial_apostador_partida "
+                     f"ON apuestas_historial(apostador, partida_id)")
+
+
+def _partidas_para_archivar(casa, fecha_corte, formato, tamano_lote):
+    """Siguiente lote de (id, periodo) de partidas resueltas antes del corte; las sin fecha cuentan como antiguas."""
+    return casa.cursor.execute("""
+        SELECT id, COALESCE(strftime(?, fecha_resolucion), ?) AS periodo
+        FROM partidas
+        WHERE estado = 'Resuelta' AND (fecha_resolucion < ? OR fecha_resolucion IS NULL)
+        ORDER BY id
+        LIMIT ?
+    """, (formato, PERIODO_SIN_FECHA, fecha_corte, tamano_lote)).fetchall()
+
+
+def _alias_adjunto(conexion, ruta):
+    """Alias con el que la ruta ya está adjunta a la conexión, o None."""
+    for fila in conexion.execute("PRAGMA database_list").fetchall():
+        if fila[2] and os.path.realpath(fila[2]) == os.path.realpath(ruta):
+            return fila[1]
+    return None
+
+
+def _mover_lote(casa, ruta, ids):
+    """Copia y luego borra de las tablas calientes las partidas ids. Devuelve las apuestas movidas."""
+    conexion = casa.conexion
+    # Adjuntar dos veces el mismo archivo a una conexión hace que se bloquee a sí misma
+    alias = _alias_adjunto(conexion, ruta)
+    if alias is None:
+        conexion.execute("ATTACH DATABASE ? AS archivo_destino", (ruta,))
+    try:
+        destino = alias or 'archivo_destino'
+        _preparar_esquema_archivo(conexion, destino)
+        ids_json = json.dumps(ids)
+        seleccion = "SELECT value FROM json_each(?)"
+
+        def copiar():
+            for tabla, clave in (('partidas', 'id'), ('apuestas_historial', 'partida_id')):
+                columnas = ", ".join(nombre for nombre, _tipo in _columnas(conexion, 'main', tabla))
+                casa.cursor.execute(f"""
+                    INSERT OR IGNORE INTO {destino}.{tabla} ({columnas})
+                    SELECT {columnas} FROM main.{tabla} WHERE {clave} IN ({seleccion})
+                """, (ids_json,))
+
+        def borrar():
+            pendientes = casa.cursor.execute(f"""
+                SELECT COUNT(*) FROM main.historial h
+                WHERE h.partida_id IN ({seleccion})
+                  AND NOT EXISTS (SELECT 1 FROM {destino}.apuestas_historial a WHERE a.id = h.id)
+            """, (ids_json,)).fetchone()[0]
+            if pendientes:
+                raise RuntimeError(f"{pendientes} apuestas no llegaron al archivo {ruta}; no se borra nada.")
+            movidas = casa.cursor.execute(f"SELECT COUNT(*) FROM main.historial WHERE partida_id IN ({seleccion})",
+                                          (ids_json,)).fetchone()[0]
+            casa._actualizar_resumenes(seleccion, (ids_json,), -1)
+            casa.cursor.execute(f"DELETE FROM main.historial WHERE partida_id IN ({seleccion})", (ids_json,))
+            casa.cursor.execute(f"DELETE FROM main.partidas WHERE id IN ({seleccion})", (ids_json,))
+            casa._incrementar_version('historial')
+            return movidas
+
+        casa._escribir(copiar)
+        return casa._escribir(borrar)
+    finally:
+        if alias is None:
+            conexion.execute("DETACH DATABASE archivo_destino")
+
+
+def archivar_historial(casa, fecha_corte, directorio=None, periodo='anual', tamano_lote=200, pausa=0.01):
+    """
+    Archiva las partidas resueltas antes de fecha_corte ('YYYY-MM-DD', UTC) en lotes
+    de tamano_lote partidas, con una pausa entre lotes para dejar pasar a los escritores.
+    Devuelve {'partidas': n, 'apuestas': m, 'archivos': [rutas]}.
+    """
+    if periodo not in FORMATOS_PERIODO:
+        raise ValueError(f"Periodo '{periodo}' no válido. Opciones: {', '.join(FORMATOS_PERIODO)}.")
+    if tamano_lote <= 0:
+        raise ValueError("El tamaño de lote debe ser mayor a cero.")
+    directorio = directorio or directorio_por_defecto(casa.db_name)
+    os.makedirs(directorio, exist_ok=True)
+
+    resultado = {'partidas': 0, 'apuestas': 0, 'archivos': set()}
+    while True:
+        lote = _partidas_para_archivar(casa, fecha_corte, FORMATOS_PERIODO[periodo], tamano_lote)
+        if not lote:
+            break
+        por_periodo = {}
+        for fila in lote:
+            por_periodo.setdefault(fila['periodo'], []).append(fila['id'])
+        for nombre_periodo, ids in por_periodo.items():
+            ruta = ruta_archivo(directorio, nombre_periodo)
+            resultado['apuestas'] += _mover_lote(casa, ruta, ids)
+            resultado['partidas'] += len(ids)
+            resultado['archivos'].add(ruta)
+        time.sleep(pausa)
+
+    if resultado['partidas'] and casa.perfil['journal_mode'] == 'WAL':
+        casa.checkpoint('PASSIVE')
+    resultado['archivos'] = sorted(resultado['archivos'])
+    return resultado
+
+
+# --- CONSULTAS SOBRE DATOS CALIENTES + ARCHIVADOS ---
+
+def _alias(ruta):
+    return "arch_" + re.sub(r'\W', '_', os.path.basename(ruta)[len('historial_'):-len('.db')])
+
+
+def adjuntar_archivos(casa, directorio=None):
+    """
+    Adjunta a la conexión los archivos del directorio y (re)crea las vistas temporales
+    partidas_completas e historial_completo (calientes UNION ALL archivados).
+    Es barata si no hay archivos nuevos: se puede llamar en cada petición.
+    Devuelve la lista de rutas adjuntas.
+    """
+    directorio = directorio or directorio_por_defecto(casa.db_name)
+    rutas = sorted(glob.glob(os.path.join(directorio, 'historial_*.db')))
+    if len(rutas) > MAX_ARCHIVOS_ADJUNTOS:
+        raise ValueError(f"Hay {len(rutas)} archivos y SQLite solo adjunta {MAX_ARCHIVOS_ADJUNTOS}; "
+                         f"use periodos anuales o agrupe los archivos antiguos.")
+    if getattr(casa, '_archivos_adjuntos', None) == rutas:
+        return rutas
+
+    adjuntas = {fila[1] for fila in casa.conexion.execute("PRAGMA database_list").fetchall()}
+    for ruta in rutas:
+        if _alias(ruta) not in adjuntas:
+            casa.conexion.execute(f"ATTACH DATABASE ? AS {_alias(ruta)}", (ruta,))
+
+    for vista, tabla, clave in (('partidas_completas', 'partidas', 'id'),
+                                ('historial_completo', 'apuestas_historial', 'partida_id')):
+        columnas = ", ".join(nombre for nombre, _tipo in _columnas(casa.conexion, 'main', tabla))
+        # Una fila puede estar en los dos sitios entre la copia y el borrado de un lote:
+        # mientras la partida siga en la tabla caliente, manda la copia caliente.
+        partes = [f"SELECT {columnas} FROM main.{tabla}"] + [
+            f"SELECT {columnas} FROM {_alias(ruta)}.{tabla} WHERE {clave} NOT IN (SELECT id FROM main.partidas)"
+            for ruta in rutas]
+        casa.conexion.execute(f"DROP VIEW IF EXISTS temp.{vista}")
+        casa.conexion.execute(f"CREATE TEMP VIEW {vista} AS {' UNION ALL '.join(partes)}")
+    casa._archivos_adjuntos = rutas
+    return rutas
+
+
+if __name__ == "__main__":
+    import argparse
+    from casa_apuestas import CasaDeApuestas, inicializar_base_datos
+
+    parser = argparse.ArgumentParser(description="Archiva las partidas resueltas antes de una fecha.")
+    parser.add_argument('corte', help="Fecha de corte YYYY-MM-DD (UTC); se archiva lo resuelto antes.")
+    parser.add_argument('--db', default='casa_apuestas.db')
+    parser.add_argument('--directorio', default=None)
+    parser.add_argument('--periodo', choices=sorted(FORMATOS_PERIODO), default='anual')
+    parser.add_argument('--lote', type=int, default=200)
+    args = parser.parse_args()
+
+    inicializar_base_datos(args.db)
+    casa = CasaDeApuestas(args.db)
+    resultado = archivar_historial(casa, args.corte, args.directorio, args.periodo, args.lote)
+    print(f"Partidas archivadas: {resultado['partidas']} | Apuestas: {resultado['apuestas']}")
+    for ruta in resultado['archivos']:
+        print(f"  -> {ruta}")
+    casa.conexion.close()
@@ -0,0 +1 @@
+"""Benchmarks reproducibles de la Casa de Apuestas (ejecutar con ``python -m benchmarks.<nombre>``)."""
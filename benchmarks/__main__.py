@@ -0,0 +1,107 @@
+"""
+Suite completa: genera los datos (o reutiliza --db), corre los micro-benchmarks y
+el escenario de carga HTTP, y escribe un único JSON con el commit y el entorno.
+Con --comparar marca las métricas que empeoran más que --tolerancia respecto a
+una ejecución anterior (y termina con código 1 si hay alguna).
+
+    python -m benchmarks --escala mediana --salida resultados/$(git rev-parse --short HEAD).json
+    python -m benchmarks --db /tmp/casa_grande.db --comparar resultados/base.json
+"""
+import argparse
+import json
+import platform
+import sqlite3
+import subprocess
+import sys
+import time
+
+from benchmarks import carga_http, micro
+from benchmarks.comun import RAIZ, db_temporal
+from benchmarks.generador import agregar_argumentos, generar, parametros_escala
+
+
+def commit_actual():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=RAIZ, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _metricas(resultados, prefijo=''):
+    """{ruta.de.la.metrica: valor} de los números comparables (latencias *_ms y ritmos *_s)."""
+    planas = {}
+    for clave, valor in resultados.items():
+        ruta = f"{prefijo}{clave}"
+        if isinstance(valor, dict):
+            planas.update(_metricas(valor, f"{ruta}."))
+        elif isinstance(valor, (int, float)) and (clave.endswith('_ms') or clave.endswith('_s')):
+            planas[ruta] = valor
+    return planas
+
+
+def comparar(anterior, actual, tolerancia):
+    """Lista de regresiones: latencias (*_ms) que suben o ritmos (*_s) que bajan más que tolerancia."""
+    antes = _metricas(anterior)
+    regresiones = []
+    for ruta, valor in sorted(_metricas(actual).items()):
+        previo = antes.get(ruta)
+        if not previo:
+            continue
+        cambio = (valor - previo) / previo
+        peor = cambio > tolerancia if ruta.endswith('_ms') else cambio < -tolerancia
+        if peor:
+            regresiones.append({'metrica': ruta, 'antes': previo, 'ahora': valor, 'cambio_pct': round(cambio * 100, 1)})
+    return regresiones
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='python -m benchmarks', description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    agregar_argumentos(parser)
+    parser.add_argument('--db', help="base ya generada (no se modifica: cada parte usa una copia)")
+    parser.add_argument('--clientes', type=int, default=8)
+    parser.add_argument('--segundos', type=float, default=10.0)
+    parser.add_argument('--max-detallado', type=int, default=2000000)
+    parser.add_argument('--sin-excel', action='store_true')
+    parser.add_argument('--sin-http', action='store_true')
+    parser.add_argument('--salida', help="archivo JSON de resultados (además de la salida estándar)")
+    parser.add_argument('--comparar', help="JSON de una ejecución anterior")
+    parser.add_argument('--tolerancia', type=float, default=0.10, help="empeoramiento admitido (0.10 = 10%%)")
+    args = parser.parse_args()
+
+    informe = {
+        'commit': commit_actual(),
+        'fecha': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'plataforma': platform.platform(),
+    }
+    db_path = args.db
+    if db_path is None:
+        db_path = db_temporal()
+        informe['datos'] = {'escala': args.escala, **generar(db_path, **parametros_escala(args))}
+    else:
+        informe['datos'] = {'db': db_path}
+    informe['micro'] = micro.ejecutar(db_path, max_detallado=args.max_detallado, excel=not args.sin_excel,
+                                      seed=args.seed)
+    if not args.sin_http:
+        informe['http'] = carga_http.ejecutar(db_path, clientes=args.clientes, segundos=args.segundos, seed=args.seed)
+
+    codigo = 1 if informe.get('http', {}).get('errores') else 0
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as f:
+            anterior = json.load(f)
+        informe['regresiones'] = comparar(anterior, informe, args.tolerancia)
+        codigo = codigo or (1 if informe['regresiones'] else 0)
+
+    texto = json.dumps(informe, ensure_ascii=False, indent=2)
+    if args.salida:
+        with open(args.salida, 'w', encoding='utf-8') as f:
+            f.write(texto + "\n")
+    print(texto)
+    sys.exit(codigo)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,143 @@
+"""
+Latencia de las consultas calientes antes y después de archivar el historial
+antiguo, y espera máxima de una apuesta en vivo mientras corre el archivado.
+
+    python -m benchmarks.bench_archivo --partidas 20000 --apuestas-por-partida 10
+"""
+import argparse
+import os
+import random
+import threading
+import time
+
+from benchmarks.comun import db_temporal, imprimir_resultado, percentil
+from archivo import adjuntar_archivos, archivar_historial
+from casa_apuestas import CasaDeApuestas, inicializar_base_datos
+
+
+def preparar(db_path, partidas, apuestas_por_partida, dias=730):
+    """Historial repartido en 'dias' días hasta hoy (el 10% de las partidas sin fecha)."""
+    casa = CasaDeApuestas(db_path)
+    rnd = random.Random(14)
+    casa.cursor.executemany("INSERT INTO apostadores (id, nombre, saldo_cent) VALUES (?, ?, ?)",
+                            ((i + 1, f"apostador_{i}", 10 ** 11) for i in range(200)))
+    for partida_id in range(1, partidas + 1):
+        fecha = None if rnd.random() < 0.1 else f"-{dias - partida_id * dias // partidas} days"
+        casa.cursor.execute("""
+            INSERT INTO partidas (id, nombre_equipo1, nombre_equipo2, equipo_ganador, estado, ganancia_casa_cent, fecha_resolucion)
+            VALUES (?, 'Local', 'Visita', 1, 'Resuelta', 1000, datetime('now', ?))
+        """, (partida_id, fecha))
+        casa.cursor.executemany("""
+            INSERT INTO historial (partida_id, apostador_id, monto_apostado_cent, monto_cobrado_cent, equipo_apostado)
+            VALUES (?, ?, ?, ?, ?)
+        """, [(partida_id, rnd.randrange(200) + 1, 1000, rnd.choice((0, 1750)), rnd.choice((1, 2)))
+              for _ in range(apuestas_por_partida)])
+    casa.conexion.commit()
+    casa.reconstruir_resumenes()
+    casa.cursor.execute("VACUUM")
+    casa.checkpoint('TRUNCATE')
+    return casa
+
+
+def medir_ms(func, repeticiones):
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        func()
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    return {'p50_ms': round(percentil(tiempos, 50), 3), 'p95_ms': round(percentil(tiempos, 95), 3)}
+
+
+def consultas_calientes(casa):
+    """Las consultas del historial que hace la app en cada petición."""
+    return {
+        'detalle_pagina': lambda: casa.obtener_reporte_apuestas_pagina(50),
+        'detalle_apostador': lambda: casa.obtener_reporte_apuestas_pagina(50, apostador='apostador_7'),
+        'partidas_pagina_apostador': lambda: casa.obtener_reporte_partidas_pagina(50, apostador='apostador_7'),
+        'detalle_ultimo_mes': lambda: casa.obtener_reporte_apuestas_pagina(
+            50, desde=time.strftime('%Y-%m-%d', time.gmtime(time.time() - 30 * 86400))),
+        'conteo_historial': lambda: casa.cursor.execute("SELECT COUNT(*) FROM apuestas_historial").fetchone(),
+    }
+
+
+def medir_consultas(casa, repeticiones):
+    return {nombre: medir_ms(func, repeticiones) for nombre, func in consultas_calientes(casa).items()}
+
+
+def apuestas_en_vivo(db_path, parar, esperas):
+    """Registra apuestas sin parar y anota cuánto tarda cada una (incluida la espera al bloqueo)."""
+    casa = CasaDeApuestas(db_path)
+    partida_id = casa.crear_partida("En vivo A", "En vivo B")
+    while not parar.is_set():
+        inicio = time.perf_counter()
+        casa.registrar_apuesta(partida_id, 'apostador_0', 1, 1)
+        esperas.append((time.perf_counter() - inicio) * 1000)
+        time.sleep(0.001)
+    casa.cerrar_conexion()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--partidas', type=int, default=20000)
+    parser.add_argument('--apuestas-por-partida', type=int, default=10)
+    parser.add_argument('--dias-calientes', type=int, default=90, help="Se archiva lo anterior a hoy - N días.")
+    parser.add_argument('--lote', type=int, default=200)
+    parser.add_argument('--repeticiones', type=int, default=30)
+    args = parser.parse_args()
+
+    db_path = db_temporal()
+    inicializar_base_datos(db_path)
+    casa = preparar(db_path, args.partidas, args.apuestas_por_partida)
+    antes = medir_consultas(casa, args.repeticiones)
+    tamano_antes = os.path.getsize(db_path)
+
+    parar, esperas = threading.Event(), []
+    hilo = threading.Thread(target=apuestas_en_vivo, args=(db_path, parar, esperas))
+    hilo.start()
+    corte = time.strftime('%Y-%m-%d', time.gmtime(time.time() - args.dias_calientes * 86400))
+    inicio = time.perf_counter()
+    resultado = archivar_historial(casa, corte, os.path.join(os.path.dirname(db_path), 'archivo'),
+                                   tamano_lote=args.lote)
+    duracion = time.perf_counter() - inicio
+    parar.set()
+    hilo.join()
+
+    casa.cursor.execute("VACUUM")
+    casa.checkpoint('TRUNCATE')
+    despues = medir_consultas(casa, args.repeticiones)
+    adjuntar_archivos(casa, os.path.join(os.path.dirname(db_path), 'archivo'))
+    combinado = medir_ms(lambda: casa.obtener_reporte_apuestas_pagina(50, apostador='apostador_7',
+                                                                       incluir_archivo=True), args.repeticiones)
+
+    imprimir_resultado('archivo', {
+        'partidas': args.partidas,
+        'apuestas_historial': args.partidas * args.apuestas_por_partida,
+        'archivadas': {'partidas': resultado['partidas'], 'apuestas': resultado['apuestas'],
+                       'archivos': len(resultado['archivos']), 'segundos': round(duracion, 3)},
+        'apuesta_en_vivo_durante_archivado': {'apuestas': len(esperas),
+                                              'p95_ms': round(percentil(esperas, 95), 3),
+                                              'mas_de_50ms': sum(1 for e in esperas if e > 50),
+                                              'max_ms': round(max(esperas, default=0.0), 3)},
+        'referencia_borrado_masivo_ms': borrado_masivo_ms(args.partidas, args.apuestas_por_partida),
+        'tamano_db_mb': {'antes': round(tamano_antes / 2**20, 2), 'despues': round(os.path.getsize(db_path) / 2**20, 2)},
+        'consultas_antes': antes,
+        'consultas_despues': despues,
+        'detalle_apostador_con_archivo': combinado,
+    })
+    casa.cerrar_conexion()
+
+
+def borrado_masivo_ms(partidas, apuestas_por_partida):
+    """Lo que dura (con el bloqueo de escritura tomado) el borrado antiguo de todo el historial."""
+    db_path = db_temporal()
+    inicializar_base_datos(db_path)
+    casa = preparar(db_path, partidas, apuestas_por_partida)
+    inicio = time.perf_counter()
+    casa.borrar_partidas_resueltas()
+    duracion = (time.perf_counter() - inicio) * 1000
+    casa.cerrar_conexion()
+    return round(duracion, 3)
+
+
+if __name__ == '__main__':
+    main()
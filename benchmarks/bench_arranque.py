@@ -0,0 +1,152 @@
+"""
+Arranque en frío de app.py y main.py, cada medición en un proceso nuevo:
+
+- import: milisegundos de `import app` según python -X importtime, los imports
+  directos que más pesan y qué dependencias pesadas (openpyxl, NumPy) quedan
+  cargadas sin haber usado todavía las rutas que las necesitan;
+- primera respuesta en proceso: desde que arranca el script hasta el primer GET
+  con el test_client de Flask;
+- primera respuesta con gunicorn (si está instalado), con y sin preload_app
+  (ver gunicorn.conf.py): desde lanzar el proceso hasta el primer 200.
+
+Se toma la mejor de --repeticiones. Con --raiz se mide otra copia del repositorio
+(p. ej. un `git worktree` de un commit anterior) para comparar.
+
+    python -m benchmarks.bench_arranque --repeticiones 5
+    python -m benchmarks.bench_arranque --raiz /tmp/casa_anterior
+"""
+import argparse
+import http.client
+import importlib.util
+import os
+import socket
+import subprocess
+import sys
+import time
+
+from benchmarks.comun import RAIZ, db_temporal, imprimir_resultado
+from benchmarks.generador import generar
+
+# Módulo de cada servicio y la ruta que se pide como primera respuesta
+SERVICIOS = {'app': '/', 'main': '/balance'}
+# Dependencias que solo necesitan algunas rutas (exportar a Excel, riesgo, dados en lote)
+PESADOS = ('openpyxl', 'numpy')
+# Imports directos que se listan en el resultado (los de más peso acumulado)
+MAS_PESADOS = 8
+# Segundos máximos esperando la primera respuesta de gunicorn
+LIMITE_ESPERA = 60
+
+PRIMERA_RESPUESTA = """
+import time
+inicio = time.perf_counter()
+import {modulo}
+respuesta = {modulo}.app.test_client().get({ruta!r})
+assert respuesta.status_code == 200, respuesta.status_code
+print((time.perf_counter() - inicio) * 1000)
+"""
+
+
+def medir_import(raiz, modulo, entorno):
+    """(ms de `import modulo`, {import directo: ms acumulados}, paquetes de primer nivel cargados)."""
+    salida = subprocess.run([sys.executable, '-X', 'importtime', '-c', f"import {modulo}"], cwd=raiz, env=entorno,
+                            capture_output=True, text=True, check=True).stderr
+    total, directos, cargados = None, {}, set()
+    for linea in salida.splitlines():
+        if not linea.startswith('import time:') or 'cumulative' in linea:
+            continue
+        _propio, acumulado, nombre = linea[len('import time:'):].split('|')
+        # importtime sangra dos espacios por nivel de anidamiento
+        nivel = (len(nombre) - len(nombre.lstrip()) - 1) // 2
+        nombre = nombre.strip()
+        cargados.add(nombre.split('.')[0])
+        if nivel == 0 and nombre == modulo:
+            total = int(acumulado) / 1000
+        elif nivel == 1:
+            directos[nombre] = int(acumulado) / 1000
+    return total, directos, cargados
+
+
+def primera_respuesta_en_proceso(raiz, modulo, entorno):
+    """ms desde el inicio del script hasta el primer GET respondido por el test_client."""
+    script = PRIMERA_RESPUESTA.format(modulo=modulo, ruta=SERVICIOS[modulo])
+    salida = subprocess.run([sys.executable, '-c', script], cwd=raiz, env=entorno,
+                            capture_output=True, text=True, check=True).stdout
+    return float(salida.strip().splitlines()[-1])
+
+
+def _puerto_libre():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def primera_respuesta_gunicorn(raiz, modulo, entorno, workers):
+    """ms desde lanzar gunicorn hasta el primer 200 en la ruta del servicio."""
+    puerto = _puerto_libre()
+    inicio = time.perf_counter()
+    proceso = subprocess.Popen([sys.executable, '-m', 'gunicorn', '--workers', str(workers),
+                                '--bind', f"127.0.0.1:{puerto}", f"{modulo}:app"],
+                               cwd=raiz, env=entorno, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        while time.perf_counter() - inicio < LIMITE_ESPERA:
+            if proceso.poll() is not None:
+                raise RuntimeError(f"gunicorn terminó (código {proceso.returncode}) antes de responder")
+            conexion = http.client.HTTPConnection('127.0.0.1', puerto, timeout=LIMITE_ESPERA)
+            try:
+                conexion.request('GET', SERVICIOS[modulo])
+                estado = conexion.getresponse().status
+            except ConnectionRefusedError:
+                time.sleep(0.005)
+                continue
+            finally:
+                conexion.close()
+            if estado != 200:
+                raise RuntimeError(f"Primera respuesta de gunicorn con estado {estado}")
+            return (time.perf_counter() - inicio) * 1000
+        raise RuntimeError(f"gunicorn no respondió en {LIMITE_ESPERA} s")
+    finally:
+        proceso.terminate()
+        proceso.wait()
+
+
+def medir_servicio(raiz, modulo, entorno, repeticiones, workers):
+    # Una pasada previa deja los .pyc escritos y la base migrada, como en un despliegue ya hecho
+    primera_respuesta_en_proceso(raiz, modulo, entorno)
+    importaciones = [medir_import(raiz, modulo, entorno) for _ in range(repeticiones)]
+    total, directos, cargados = min(importaciones, key=lambda medida: medida[0])
+    resultado = {
+        'import_ms': round(total, 1),
+        'imports_mas_pesados_ms': {nombre: round(ms, 1) for nombre, ms in
+                                   sorted(directos.items(), key=lambda par: -par[1])[:MAS_PESADOS]},
+        'pesados_al_importar': sorted(cargados.intersection(PESADOS)),
+        'primera_respuesta_en_proceso_ms': round(min(
+            primera_respuesta_en_proceso(raiz, modulo, entorno) for _ in range(repeticiones)), 1),
+    }
+    if importlib.util.find_spec('gunicorn') is not None:
+        for preload in ('1', '0'):
+            entorno_gunicorn = {**entorno, 'CASA_PRELOAD': preload}
+            resultado[f"primera_respuesta_gunicorn_{'preload' if preload == '1' else 'sin_preload'}_ms"] = round(min(
+                primera_respuesta_gunicorn(raiz, modulo, entorno_gunicorn, workers)
+                for _ in range(repeticiones)), 1)
+    return resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--raiz', default=RAIZ, help="copia del repositorio a medir (por defecto esta)")
+    parser.add_argument('--repeticiones', type=int, default=5)
+    parser.add_argument('--workers', type=int, default=2, help="workers de gunicorn")
+    parser.add_argument('--servicios', nargs='+', choices=sorted(SERVICIOS), default=sorted(SERVICIOS))
+    args = parser.parse_args()
+
+    db_path = db_temporal()
+    generar(db_path, apostadores=200, partidas=100, historial=20000, partidas_abiertas=20, apuestas_abiertas=2000)
+    entorno = {**os.environ, 'CASA_DB_PATH': db_path, 'CASA_LOG_LEVEL': 'WARNING'}
+    resultados = {'raiz': os.path.abspath(args.raiz), 'gunicorn': importlib.util.find_spec('gunicorn') is not None}
+    for modulo in args.servicios:
+        resultados[modulo] = medir_servicio(args.raiz, modulo, entorno, args.repeticiones, args.workers)
+    imprimir_resultado('arranque', resultados)
+
+
+if __name__ == '__main__':
+    main()
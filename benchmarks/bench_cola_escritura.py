@@ -0,0 +1,102 @@
+"""
+Apuestas/segundo y latencia de registrar_apuesta con varios hilos (como los de un
+worker de gunicorn): commit por llamada, cada hilo con su conexión, frente a la
+cola de escritura con group commit (cola_escritura.py) con distintos parámetros.
+Se mide con synchronous=NORMAL (por defecto en WAL) y FULL (un fsync por commit).
+
+    python -m benchmarks.bench_cola_escritura --hilos 16 --apuestas 300
+"""
+import argparse
+import threading
+import time
+
+from benchmarks.comun import db_temporal, estadisticas, imprimir_resultado
+from casa_apuestas import CasaDeApuestas, inicializar_base_datos, perfil_almacenamiento
+from cola_escritura import ColaEscritura
+
+SINCRONIZACIONES = ('NORMAL', 'FULL')
+
+
+def preparar(perfil, hilos, partidas=20):
+    db_path = db_temporal()
+    inicializar_base_datos(db_path, perfil)
+    casa = CasaDeApuestas(db_path, perfil)
+    for i in range(hilos):
+        casa.registrar_apostador(f"apostador_{i}", 1e9)
+    for _ in range(partidas):
+        casa.crear_partida('Local', 'Visita')
+    casa.cerrar_conexion()
+    return db_path
+
+
+def correr(hilos, apuestas, apostar):
+    """apostar(hilo, i) en paralelo; devuelve las latencias (s) y la duración total."""
+    latencias = []
+
+    def trabajo(hilo):
+        propias = []
+        for i in range(apuestas):
+            inicio = time.perf_counter()
+            apostar(hilo, i)
+            propias.append(time.perf_counter() - inicio)
+        latencias.extend(propias)
+
+    ts = [threading.Thread(target=trabajo, args=(h,)) for h in range(hilos)]
+    inicio = time.perf_counter()
+    for t in ts:
+        t.start()
+    for t in ts:
+        t.join()
+    return latencias, time.perf_counter() - inicio
+
+
+def directo(perfil, hilos, apuestas):
+    db_path = preparar(perfil, hilos)
+    local = threading.local()
+
+    def apostar(hilo, i):
+        if not hasattr(local, 'casa'):
+            local.casa = CasaDeApuestas(db_path, perfil)
+        local.casa.registrar_apuesta(i % 20 + 1, f"apostador_{hilo}", 1.0, 1 + i % 2)
+
+    latencias, duracion = correr(hilos, apuestas, apostar)
+    return {'modo': 'commit_por_llamada', **estadisticas(latencias, duracion)}
+
+
+def con_cola(perfil, hilos, apuestas, max_lote, espera_ms):
+    db_path = preparar(perfil, hilos)
+    cola = ColaEscritura(db_path, perfil, max_lote=max_lote, espera_ms=espera_ms)
+
+    def apostar(hilo, i):
+        cola.ejecutar('registrar_apuesta', i % 20 + 1, f"apostador_{hilo}", 1.0, 1 + i % 2)
+
+    latencias, duracion = correr(hilos, apuestas, apostar)
+    cola.detener()
+    return {'modo': 'cola', 'max_lote': max_lote, 'espera_ms': espera_ms,
+            **estadisticas(latencias, duracion), **cola.estadisticas()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--hilos', type=int, default=16)
+    parser.add_argument('--apuestas', type=int, default=300, help="apuestas por hilo")
+    parser.add_argument('--configuraciones', nargs='+', default=['16:0', '64:0', '64:2'],
+                        help="pares max_lote:espera_ms de la cola")
+    args = parser.parse_args()
+
+    resultados = []
+    for synchronous in SINCRONIZACIONES:
+        perfil = perfil_almacenamiento(synchronous=synchronous)
+        base = directo(perfil, args.hilos, args.apuestas)
+        resultados.append({'synchronous': synchronous, **base})
+        for configuracion in args.configuraciones:
+            max_lote, espera_ms = configuracion.split(':')
+            medida = con_cola(perfil, args.hilos, args.apuestas, int(max_lote), float(espera_ms))
+            medida['aceleracion'] = round(medida['ops_s'] / base['ops_s'], 2)
+            resultados.append({'synchronous': synchronous, **medida})
+    imprimir_resultado('cola_escritura', {'hilos': args.hilos, 'apuestas_por_hilo': args.apuestas,
+                                          'resultados': resultados})
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+"""
+Compara peticiones/segundo del ciclo antiguo (conexión nueva + DDL por petición)
+frente al pool de conexiones por hilo.
+
+    python -m benchmarks.bench_conexiones --peticiones 2000 --hilos 4
+"""
+import argparse
+import threading
+import time
+
+from benchmarks.comun import db_temporal, imprimir_resultado
+from casa_apuestas import CasaDeApuestas, PoolConexiones, inicializar_base_datos
+from migraciones import _v1_esquema_inicial
+
+
+def ciclo_antiguo(db_path):
+    # Lo que hacía get_casa()/teardown_casa antes: conectar, crear tablas, consultar, cerrar.
+    casa = CasaDeApuestas(db_path)
+    _v1_esquema_inicial(casa.cursor)
+    casa.conexion.commit()
+    casa.obtener_apostadores()
+    casa.cerrar_conexion()
+
+
+def ciclo_pool(pool):
+    casa = pool.obtener()
+    casa.obtener_apostadores()
+    pool.liberar(casa)
+
+
+def medir(ciclo, peticiones, hilos):
+    por_hilo = peticiones // hilos
+
+    def trabajador():
+        for _ in range(por_hilo):
+            ciclo()
+
+    inicio = time.perf_counter()
+    lanzados = [threading.Thread(target=trabajador) for _ in range(hilos)]
+    for t in lanzados:
+        t.start()
+    for t in lanzados:
+        t.join()
+    return (por_hilo * hilos) / (time.perf_counter() - inicio)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--peticiones', type=int, default=2000)
+    parser.add_argument('--hilos', type=int, default=4)
+    args = parser.parse_args()
+
+    db_path = db_temporal()
+    inicializar_base_datos(db_path)
+    casa = CasaDeApuestas(db_path)
+    for i in range(50):
+        casa.registrar_apostador(f"apostador_{i}", 100.0)
+    casa.cerrar_conexion()
+
+    pool = PoolConexiones(db_path)
+    antes = medir(lambda: ciclo_antiguo(db_path), args.peticiones, args.hilos)
+    despues = medir(lambda: ciclo_pool(pool), args.peticiones, args.hilos)
+    pool.cerrar_todas()
+
+    imprimir_resultado('conexiones', {
+        'peticiones': args.peticiones,
+        'hilos': args.hilos,
+        'peticiones_por_segundo_antes': round(antes, 1),
+        'peticiones_por_segundo_despues': round(despues, 1),
+        'mejora': round(despues / antes, 2),
+    })
+
+
+if __name__ == '__main__':
+    main()
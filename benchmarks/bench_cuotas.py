@@ -0,0 +1,124 @@
+"""
+Caché de cuotas (cuotas.py): lecturas por segundo desde memoria frente a la
+consulta equivalente en SQLite y frente a la ruta HTTP /api/odds/<id>; y
+consistencia con la base tras varios procesos apostando, creando y resolviendo
+partidas mientras la caché sigue el bus de eventos. Sale con código 1 si al
+final la caché no cuadra con la base.
+
+    python -m benchmarks.bench_cuotas --partidas 200 --procesos 4 --segundos 5
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import sqlite3
+import sys
+import time
+
+from benchmarks.comun import cronometrar, db_temporal, imprimir_resultado
+from casa_apuestas import CasaDeApuestas, inicializar_base_datos
+from cuotas import CacheCuotas, verificar_consistencia
+from eventos import BusEventos
+
+
+def escritor(db_path, semilla, segundos, apostadores):
+    """Apuestas sueltas y en lote, y de vez en cuando una partida nueva o una resolución."""
+    casa = CasaDeApuestas(db_path)
+    rnd = random.Random(semilla)
+    fin = time.perf_counter() + segundos
+    while time.perf_counter() < fin:
+        abiertas = [fila[0] for fila in casa.cursor.execute("SELECT id FROM partidas WHERE estado = 'Abierta'")]
+        accion = rnd.random()
+        try:
+            if accion < 0.02 and len(abiertas) > 10:
+                casa.resolver_partida(rnd.choice(abiertas), rnd.choice((1, 2)))
+            elif accion < 0.04:
+                casa.crear_partida('Local', 'Visita')
+            elif accion < 0.2:
+                casa.registrar_apuestas_lote([{'partida_id': rnd.choice(abiertas), 'equipo': rnd.choice((1, 2)),
+                                               'nombre_apostador': rnd.choice(apostadores), 'monto': rnd.randint(1, 50)}
+                                              for _ in range(5)])
+            else:
+                casa.registrar_apuesta(rnd.choice(abiertas), rnd.choice(apostadores), float(rnd.randint(1, 50)),
+                                       rnd.choice((1, 2)))
+        except ValueError:
+            pass  # partida resuelta por otro proceso entre la lectura y la apuesta
+    casa.cerrar_conexion()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--partidas', type=int, default=200)
+    parser.add_argument('--lecturas', type=int, default=100000)
+    parser.add_argument('--procesos', type=int, default=4)
+    parser.add_argument('--segundos', type=float, default=5.0)
+    args = parser.parse_args()
+
+    db_path = db_temporal()
+    os.environ['CASA_DB_PATH'] = db_path
+    inicializar_base_datos(db_path)
+    casa = CasaDeApuestas(db_path)
+    apostadores = [f"apostador_{i}" for i in range(50)]
+    for nombre in apostadores:
+        casa.registrar_apostador(nombre, 1e9)
+    for _ in range(args.partidas):
+        casa.crear_partida('Local', 'Visita')
+    casa.cerrar_conexion()
+
+    # 1. Lecturas de una partida: memoria, SQLite y HTTP
+    bus = BusEventos(db_path, intervalo=0.05)
+    cache = CacheCuotas(db_path, bus, ttl=float('inf'))
+    ids = list(range(1, args.partidas + 1))
+    conexion = sqlite3.connect(db_path)
+
+    def leer_cache():
+        for i in range(args.lecturas):
+            cache.obtener(ids[i % len(ids)])
+
+    def leer_sqlite():
+        for i in range(args.lecturas):
+            conexion.execute("SELECT nombre_equipo1, nombre_equipo2, total_apostado_e1, total_apostado_e2 "
+                             "FROM partidas WHERE id = ? AND estado = 'Abierta'", (ids[i % len(ids)],)).fetchone()
+
+    import app as aplicacion
+    cliente = aplicacion.app.test_client()
+    lecturas_http = max(1, args.lecturas // 50)
+
+    def leer_http():
+        for i in range(lecturas_http):
+            cliente.get(f"/api/odds/{ids[i % len(ids)]}")
+
+    resultados = {
+        'partidas': args.partidas,
+        'cache_lecturas_s': round(args.lecturas / cronometrar(leer_cache, 3), 1),
+        'sqlite_lecturas_s': round(args.lecturas / cronometrar(leer_sqlite, 3), 1),
+        'http_lecturas_s': round(lecturas_http / cronometrar(leer_http, 3), 1),
+        'cache_lista_us': round(cronometrar(cache.obtener, 5) * 1e6, 2),
+    }
+    conexion.close()
+
+    # 2. Consistencia: varios procesos escriben mientras la caché sigue el bus
+    procesos = [multiprocessing.Process(target=escritor, args=(db_path, p, args.segundos, apostadores))
+                for p in range(args.procesos)]
+    for p in procesos:
+        p.start()
+    for p in procesos:
+        p.join()
+    fin_escrituras = time.perf_counter()
+    diferencias = verificar_consistencia(cache)
+    while diferencias and time.perf_counter() - fin_escrituras < 5:
+        time.sleep(0.01)
+        diferencias = verificar_consistencia(cache)
+    bus.detener()
+    resultados.update({
+        'eventos': sqlite3.connect(db_path).execute("SELECT MAX(id) FROM eventos").fetchone()[0],
+        'al_dia_tras_ms': round((time.perf_counter() - fin_escrituras) * 1000, 1),
+        'recargas': cache.recargas,
+        'diferencias': diferencias,
+    })
+    imprimir_resultado('cuotas', resultados)
+    sys.exit(1 if diferencias else 0)
+
+
+if __name__ == '__main__':
+    main()
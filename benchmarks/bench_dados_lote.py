@@ -0,0 +1,59 @@
+"""
+Rondas por segundo del servicio de dados: una petición por ronda (POST /bet)
+frente a POST /bet/batch con distintos tamaños de lote, y coste de la tirada
+sola (NumPy si está instalado, random si no).
+
+    python -m benchmarks.bench_dados_lote --rondas 2000 --lotes 10 100 1000
+"""
+import argparse
+import os
+import time
+
+from benchmarks.comun import cronometrar, db_temporal, imprimir_resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rondas', type=int, default=2000, help="rondas totales por escenario")
+    parser.add_argument('--lotes', type=int, nargs='+', default=[10, 100, 1000])
+    args = parser.parse_args()
+
+    # main.py lee CASA_DB_PATH al importarse: se apunta a una base temporal
+    os.environ['CASA_DB_PATH'] = db_temporal('dados.db')
+    import main as servicio
+    cliente = servicio.app.test_client()
+    apuesta = {'amount': 1, 'user_id': 'bench'}
+
+    def preparar():
+        casa = servicio.pool_conexiones.obtener()
+        casa.cursor.execute("INSERT OR REPLACE INTO usuarios_dados (user_id, balance_cent) VALUES ('bench', 100000000000000)")
+        casa.conexion.commit()
+
+    preparar()
+    inicio = time.perf_counter()
+    for _ in range(args.rondas):
+        cliente.post('/bet', json=apuesta)
+    individual = args.rondas / (time.perf_counter() - inicio)
+
+    resultados = {'numpy': servicio._numpy() is not None,
+                  'bet_individual_rondas_s': round(individual, 1), 'bet_batch': []}
+    for tamano in args.lotes:
+        peticiones = max(1, args.rondas // tamano)
+        preparar()
+        inicio = time.perf_counter()
+        for i in range(peticiones):
+            cliente.post('/bet/batch', json={**apuesta, 'rounds': tamano, 'seed': i})
+        por_segundo = peticiones * tamano / (time.perf_counter() - inicio)
+        tirada = cronometrar(lambda: servicio.tirar_dados(tamano, 1), repeticiones=20)
+        resultados['bet_batch'].append({
+            'tamano_lote': tamano,
+            'rondas_s': round(por_segundo, 1),
+            'aceleracion': round(por_segundo / individual, 1),
+            'tirada_us': round(tirada * 1e6, 1),
+        })
+
+    imprimir_resultado('dados_lote', resultados)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,178 @@
+"""
+Esquema compacto de la migración 8: tamaño en disco y tiempo de los reportes con
+el esquema anterior (nombres de texto repetidos en cada fila del historial, montos
+REAL) y con el actual (claves enteras, montos en céntimos).
+
+Genera los datos con el generador (esquema actual), arma con ellos una base en la
+versión 7, mide tamaño y consultas con el SQL de entonces, la migra (midiendo
+migración y VACUUM) y repite las mediciones con el SQL de ahora.
+
+    python -m benchmarks.bench_esquema_compacto --escala mediana
+"""
+import argparse
+import os
+import random
+import sqlite3
+import time
+
+from benchmarks.comun import cronometrar, db_temporal, imprimir_resultado
+from benchmarks.generador import agregar_argumentos, generar, nombre_apostador, parametros_escala
+from casa_apuestas import perfil_almacenamiento
+from migraciones import _recalcular_resumenes_v3, aplicar_migraciones, recalcular_resumenes
+
+# (SQL con el esquema 7, SQL con el esquema 8) de cada reporte; 'apostador' y 'partida'
+# se sustituyen por valores al azar en cada repetición.
+CONSULTAS = {
+    'balance': (
+        """SELECT a.nombre, a.saldo, COALESCE(r.total_apostado, 0.0), COALESCE(r.total_retornado, 0.0)
+           FROM apostadores a LEFT JOIN resumen_apostadores r ON r.apostador = a.nombre ORDER BY a.rowid""",
+        """SELECT a.nombre, a.saldo, COALESCE(r.total_apostado_cent / 100.0, 0.0),
+                  COALESCE(r.total_retornado_cent / 100.0, 0.0)
+           FROM apostadores a LEFT JOIN resumen_apostadores r ON r.apostador_id = a.id ORDER BY a.id""",
+    ),
+    'totales_por_apostador': (
+        "SELECT apostador, SUM(monto_apostado), SUM(monto_cobrado) FROM apuestas_historial GROUP BY apostador",
+        """SELECT apostador_id, SUM(monto_apostado_cent), SUM(monto_cobrado_cent)
+           FROM historial GROUP BY apostador_id""",
+    ),
+    'cobros_de_partida': (
+        "SELECT apostador, SUM(monto_cobrado) FROM apuestas_historial WHERE partida_id = :partida GROUP BY apostador",
+        """SELECT apostador_id, SUM(monto_cobrado_cent) FROM historial
+           WHERE partida_id = :partida GROUP BY apostador_id""",
+    ),
+    # Igual en los dos esquemas: en el 8 apuestas_historial es la vista
+    'pagina_apostador': (
+        """SELECT * FROM apuestas_historial WHERE apostador = :apostador
+           ORDER BY partida_id DESC, id DESC LIMIT 50""",
+        """SELECT * FROM apuestas_historial WHERE apostador = :apostador
+           ORDER BY partida_id DESC, id DESC LIMIT 50""",
+    ),
+    'detalle_completo': (
+        "SELECT * FROM apuestas_historial ORDER BY partida_id DESC, id DESC",
+        "SELECT * FROM apuestas_historial ORDER BY partida_id DESC, id DESC",
+    ),
+}
+# Las consultas que recorren todo el historial se repiten menos
+REPETICIONES = {'totales_por_apostador': 3, 'detalle_completo': 3}
+
+
+def crear_base_v7(origen, destino):
+    """Copia los datos de origen (esquema actual) a una base nueva en la versión 7 del esquema."""
+    con = sqlite3.connect(destino)
+    aplicar_migraciones(con, hasta=7)
+    con.execute("PRAGMA synchronous = OFF")
+    con.execute("ATTACH DATABASE ? AS nuevo", (origen,))
+    with con:
+        con.execute("INSERT INTO apostadores (nombre, saldo) SELECT nombre, saldo FROM nuevo.apostadores ORDER BY id")
+        con.execute("""
+            INSERT INTO partidas (id, nombre_equipo1, nombre_equipo2, total_apostado_e1, total_apostado_e2,
+                                  equipo_ganador, estado, ganancia_casa, fecha_resolucion)
+            SELECT id, nombre_equipo1, nombre_equipo2, total_apostado_e1, total_apostado_e2,
+                   equipo_ganador, estado, ganancia_casa, fecha_resolucion
+            FROM nuevo.partidas ORDER BY id
+        """)
+        con.execute("""
+            INSERT INTO apuestas (id, partida_id, nombre_apostador, monto, equipo_apostado)
+            SELECT ap.id, ap.partida_id, a.nombre, ap.monto, ap.equipo_apostado
+            FROM nuevo.apuestas ap JOIN nuevo.apostadores a ON a.id = ap.apostador_id ORDER BY ap.id
+        """)
+        con.execute("""
+            INSERT INTO apuestas_historial (id, partida_id, equipo1, equipo2, apostador, monto_apostado,
+                                            monto_cobrado, equipo_apostado, equipo_ganador, fecha)
+            SELECT id, partida_id, equipo1, equipo2, apostador, monto_apostado,
+                   monto_cobrado, equipo_apostado, equipo_ganador, fecha
+            FROM nuevo.apuestas_historial ORDER BY id
+        """)
+        _recalcular_resumenes_v3(con.cursor())
+    con.execute("DETACH DATABASE nuevo")
+    con.execute("VACUUM")
+    con.close()
+
+
+def tamano(db_path):
+    """MB del archivo y de cada tabla con sus índices (tabla virtual dbstat)."""
+    con = sqlite3.connect(db_path)
+    por_tabla = {}
+    for tabla, bytes_ in con.execute("""
+            SELECT m.tbl_name, SUM(s.pgsize) FROM dbstat s JOIN sqlite_master m ON m.name = s.name
+            GROUP BY m.tbl_name"""):
+        if tabla in ('apostadores', 'partidas', 'apuestas', 'apuestas_historial', 'historial',
+                     'resumen_apostadores'):
+            por_tabla[tabla] = round(bytes_ / 1e6, 2)
+    con.close()
+    return {'archivo_mb': round(os.path.getsize(db_path) / 1e6, 2), 'tablas_mb': por_tabla}
+
+
+def medir_consultas(db_path, version, apostadores, partidas, muestras):
+    """
+    Mejor tiempo (ms) de cada reporte con el SQL de la versión indicada (7 u 8), con la
+    caché y el mmap del perfil de la app: ahí se nota que el historial ocupe menos páginas.
+    """
+    con = sqlite3.connect(db_path)
+    perfil = perfil_almacenamiento()
+    for pragma in ('cache_size', 'mmap_size', 'temp_store'):
+        con.execute(f"PRAGMA {pragma} = {perfil[pragma]}")
+    rnd = random.Random(1)
+    tiempos = {}
+    for nombre, sqls in CONSULTAS.items():
+        sql = sqls[0] if version == 7 else sqls[1]
+        repeticiones = REPETICIONES.get(nombre, muestras)
+
+        def consulta():
+            parametros = {'apostador': nombre_apostador(rnd.randrange(apostadores)),
+                          'partida': rnd.choice(partidas)}
+            con.execute(sql, parametros).fetchall()
+
+        tiempos[nombre] = round(cronometrar(consulta, repeticiones) * 1000, 3)
+    # Reconstrucción completa de las tablas de resumen (recorre todo el historial)
+    cursor = con.cursor()
+    recalcular = _recalcular_resumenes_v3 if version == 7 else recalcular_resumenes
+    tiempos['recalcular_resumenes'] = round(cronometrar(lambda: (recalcular(cursor), con.commit())) * 1000, 1)
+    con.close()
+    return tiempos
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    agregar_argumentos(parser)
+    parser.add_argument('--muestras', type=int, default=200, help="repeticiones de las consultas puntuales")
+    args = parser.parse_args()
+
+    parametros = parametros_escala(args)
+    origen = db_temporal('generada.db')
+    generar(origen, **parametros)
+    db_path = db_temporal('esquema7.db')
+    crear_base_v7(origen, db_path)
+
+    con = sqlite3.connect(db_path)
+    resueltas = [fila[0] for fila in con.execute("SELECT id FROM partidas WHERE estado = 'Resuelta'")]
+    filas = con.execute("SELECT COUNT(*), SUM(monto_apostado), SUM(monto_cobrado) FROM apuestas_historial").fetchone()
+    con.close()
+
+    resultados = {'historial': filas[0]}
+    resultados['antes'] = {**tamano(db_path), 'consultas_ms': medir_consultas(
+        db_path, 7, parametros['apostadores'], resueltas, args.muestras)}
+
+    con = sqlite3.connect(db_path)
+    inicio = time.perf_counter()
+    aplicar_migraciones(con)
+    resultados['migracion_s'] = round(time.perf_counter() - inicio, 2)
+    resultados['tamano_sin_vacuum_mb'] = round(os.path.getsize(db_path) / 1e6, 2)
+    inicio = time.perf_counter()
+    con.execute("VACUUM")
+    resultados['vacuum_s'] = round(time.perf_counter() - inicio, 2)
+    # Los importes migrados cuadran con los de antes (redondeo a céntimos)
+    despues = con.execute("SELECT COUNT(*), SUM(monto_apostado), SUM(monto_cobrado) FROM apuestas_historial").fetchone()
+    con.close()
+    resultados['filas_migradas'] = despues[0]
+    resultados['diferencia_apostado'] = round(abs(despues[1] - filas[1]), 2)
+    resultados['diferencia_cobrado'] = round(abs(despues[2] - filas[2]), 2)
+
+    resultados['despues'] = {**tamano(db_path), 'consultas_ms': medir_consultas(
+        db_path, 8, parametros['apostadores'], resueltas, args.muestras)}
+    resultados['reduccion_archivo'] = round(resultados['antes']['archivo_mb'] / resultados['despues']['archivo_mb'], 2)
+    imprimir_resultado('esquema_compacto', resultados)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+"""
+Reparto de eventos SSE con cientos de suscriptores en un mismo worker: latencia
+desde el commit de una apuesta hasta que cada cliente recibe su evento.
+
+    python -m benchmarks.bench_eventos --suscriptores 100 500 --apuestas 200
+"""
+import argparse
+import threading
+import time
+
+from benchmarks.comun import db_temporal, imprimir_resultado, percentil
+from casa_apuestas import CasaDeApuestas, inicializar_base_datos
+from eventos import BusEventos
+
+
+def escenario(num_suscriptores, num_apuestas, intervalo, ritmo):
+    db_path = db_temporal()
+    inicializar_base_datos(db_path)
+    casa = CasaDeApuestas(db_path)
+    casa.registrar_apostador('apostador', 1e9)
+    partida_id = casa.crear_partida('Local', 'Visita')
+
+    bus = BusEventos(db_path, intervalo=intervalo, max_suscriptores=num_suscriptores)
+    confirmadas = {}
+    latencias = []
+    lock = threading.Lock()
+    listos = threading.Barrier(num_suscriptores + 1)
+
+    def cliente():
+        suscripcion = bus.suscribir()
+        listos.wait()
+        recibidas = 0
+        propias = []
+        for mensaje in bus.flujo(suscripcion):
+            if b"event: apuesta" not in mensaje:
+                continue
+            llegada = time.perf_counter()
+            recibidas += 1
+            propias.append((llegada - confirmadas[recibidas]) * 1000)
+            if recibidas == num_apuestas:
+                break
+        with lock:
+            latencias.extend(propias)
+
+    hilos = [threading.Thread(target=cliente, daemon=True) for _ in range(num_suscriptores)]
+    for hilo in hilos:
+        hilo.start()
+    listos.wait()
+    time.sleep(intervalo * 2)  # que el hilo del bus haya leído su posición inicial
+
+    inicio = time.perf_counter()
+    for i in range(1, num_apuestas + 1):
+        casa.registrar_apuesta(partida_id, 'apostador', 1, 1)
+        confirmadas[i] = time.perf_counter()
+        time.sleep(ritmo)
+    for hilo in hilos:
+        hilo.join(timeout=30)
+    duracion = time.perf_counter() - inicio
+    bus.detener()
+    casa.cerrar_conexion()
+
+    return {
+        'suscriptores': num_suscriptores,
+        'eventos_entregados': len(latencias),
+        'esperados': num_suscriptores * num_apuestas,
+        'entregas_por_segundo': round(len(latencias) / duracion, 1),
+        'latencia_p50_ms': round(percentil(latencias, 50), 2),
+        'latencia_p99_ms': round(percentil(latencias, 99), 2),
+        'latencia_max_ms': round(max(latencias, default=0.0), 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--suscriptores', type=int, nargs='+', default=[100, 500])
+    parser.add_argument('--apuestas', type=int, default=200)
+    parser.add_argument('--intervalo', type=float, default=0.2, help="segundos entre lecturas del bus")
+    parser.add_argument('--ritmo', type=float, default=0.01, help="segundos entre apuestas")
+    args = parser.parse_args()
+    imprimir_resultado('eventos', [escenario(n, args.apuestas, args.intervalo, args.ritmo)
+                                   for n in args.suscriptores])
+
+
+if __name__ == '__main__':
+    main()
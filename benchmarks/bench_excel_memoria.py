@@ -0,0 +1,59 @@
+"""
+Pico de memoria (tracemalloc) de la exportación a Excel según el número de
+filas del historial: con el modo write-only debe mantenerse plano.
+
+    python -m benchmarks.bench_excel_memoria --filas 10000 30000 100000
+"""
+import argparse
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks.comun import db_temporal, imprimir_resultado
+from casa_apuestas import CasaDeApuestas, inicializar_base_datos
+from exportaciones import escribir_excel
+
+
+def llenar_historial(casa, filas, por_partida=500):
+    """Inserta directamente filas de historial resuelto (sin pasar por resolver_partida)."""
+    casa.cursor.executemany("INSERT INTO apostadores (id, nombre, saldo_cent) VALUES (?, ?, 10000)",
+                            ((i + 1, f"apostador_{i}") for i in range(100)))
+    casa.cursor.executemany("""
+        INSERT INTO partidas (id, nombre_equipo1, nombre_equipo2, equipo_ganador, estado) VALUES (?, 'Local', 'Visita', 1, 'Resuelta')
+    """, ((p,) for p in range(1, (filas - 1) // por_partida + 2)))
+    casa.cursor.executemany("""
+        INSERT INTO historial (partida_id, apostador_id, monto_apostado_cent, monto_cobrado_cent, equipo_apostado)
+        VALUES (?, ?, 1000, ?, ?)
+    """, ((i // por_partida + 1, i % 100 + 1, 1750 if i % 2 else 0, 1 if i % 2 else 2) for i in range(filas)))
+    casa.conexion.commit()
+    casa.reconstruir_resumenes()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--filas', type=int, nargs='+', default=[10000, 30000, 100000])
+    args = parser.parse_args()
+
+    resultados = []
+    for filas in args.filas:
+        db_path = db_temporal()
+        inicializar_base_datos(db_path)
+        casa = CasaDeApuestas(db_path)
+        llenar_historial(casa, filas)
+        tracemalloc.start()
+        inicio = time.perf_counter()
+        with tempfile.TemporaryFile() as destino:
+            escribir_excel(casa, destino)
+            tamano = destino.tell()
+        duracion = time.perf_counter() - inicio
+        _, pico = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        casa.cerrar_conexion()
+        resultados.append({'filas': filas, 'pico_mb': round(pico / 1e6, 2),
+                           'segundos': round(duracion, 2), 'xlsx_mb': round(tamano / 1e6, 2)})
+
+    imprimir_resultado('exportar_excel_memoria', resultados)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,51 @@
+"""
+Filas/segundo de las exportaciones del historial: CSV y NDJSON en streaming
+frente al XLSX (write-only).
+
+    python -m benchmarks.bench_exportaciones --filas 50000
+"""
+import argparse
+import tempfile
+import time
+
+from benchmarks.bench_excel_memoria import llenar_historial
+from benchmarks.comun import db_temporal, imprimir_resultado
+from casa_apuestas import CasaDeApuestas, inicializar_base_datos
+from exportaciones import escribir_excel, generar_csv, generar_ndjson
+
+
+def consumir(generador):
+    """Recorre la respuesta como lo haría el servidor y devuelve los bytes generados."""
+    return sum(len(trozo.encode('utf-8')) for trozo in generador)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--filas', type=int, default=50000)
+    args = parser.parse_args()
+
+    db_path = db_temporal()
+    inicializar_base_datos(db_path)
+    casa = CasaDeApuestas(db_path)
+    llenar_historial(casa, args.filas)
+
+    resultados = {'filas': args.filas}
+    for nombre, generador in (('csv', generar_csv), ('ndjson', generar_ndjson)):
+        inicio = time.perf_counter()
+        tamano = consumir(generador(casa.iterar_historial()))
+        duracion = time.perf_counter() - inicio
+        resultados[nombre] = {'filas_por_segundo': round(args.filas / duracion, 1), 'mb': round(tamano / 1e6, 2)}
+
+    inicio = time.perf_counter()
+    with tempfile.TemporaryFile() as destino:
+        escribir_excel(casa, destino)
+        tamano = destino.tell()
+    duracion = time.perf_counter() - inicio
+    resultados['xlsx'] = {'filas_por_segundo': round(args.filas / duracion, 1), 'mb': round(tamano / 1e6, 2)}
+    casa.cerrar_conexion()
+
+    imprimir_resultado('exportaciones_historial', resultados)
+
+
+if __name__ == '__main__':
+    main()
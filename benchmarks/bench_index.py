@@ -0,0 +1,85 @@
+"""
+Latencia del index (GET /) según el número de partidas abiertas, y coste de
+la carga de datos antigua (una consulta por partida + todas las resueltas)
+frente a la nueva (una consulta agrupada + últimas resueltas).
+
+    python -m benchmarks.bench_index --partidas 10 100 500
+"""
+import argparse
+import os
+import random
+import time
+
+from benchmarks.comun import db_temporal, imprimir_resultado, percentil
+from casa_apuestas import CasaDeApuestas, inicializar_base_datos
+
+
+def preparar(db_path, partidas_abiertas, apuestas_por_partida=20, partidas_resueltas=2000):
+    casa = CasaDeApuestas(db_path)
+    rnd = random.Random(5)
+    casa.cursor.executemany("INSERT INTO apostadores (nombre, saldo_cent) VALUES (?, ?)",
+                            ((f"apostador_{i}", 10 ** 8) for i in range(50)))
+    casa.cursor.executemany("""INSERT INTO partidas (nombre_equipo1, nombre_equipo2, equipo_ganador, estado, ganancia_casa_cent)
+                               VALUES ('Local', 'Visita', 1, 'Resuelta', 1000)""", ([] for _ in range(partidas_resueltas)))
+    casa.conexion.commit()
+    for _ in range(partidas_abiertas):
+        partida_id = casa.crear_partida("Local", "Visita")
+        casa.registrar_apuestas_lote([{'partida_id': partida_id, 'nombre_apostador': f"apostador_{rnd.randrange(50)}",
+                                       'monto': 5, 'equipo': rnd.choice((1, 2))} for _ in range(apuestas_por_partida)])
+    return casa
+
+
+def carga_antigua(casa):
+    casa.obtener_apostadores()
+    abiertas = casa.obtener_partidas_abiertas()
+    casa.obtener_partidas_resueltas()
+    return {p['id']: casa.obtener_apuestas_partida(p['id']) for p in abiertas}
+
+
+def carga_nueva(casa):
+    casa.obtener_apostadores()
+    casa.obtener_partidas_abiertas()
+    casa.obtener_partidas_resueltas(limite=10)
+    return casa.obtener_apuestas_abiertas_por_partida()
+
+
+def medir_ms(func, repeticiones):
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        func()
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    return {'p50_ms': round(percentil(tiempos, 50), 3), 'p95_ms': round(percentil(tiempos, 95), 3)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--partidas', type=int, nargs='+', default=[10, 100, 500])
+    parser.add_argument('--repeticiones', type=int, default=30)
+    args = parser.parse_args()
+
+    # La app lee CASA_DB_PATH al importarse: se apunta a una base temporal
+    os.environ['CASA_DB_PATH'] = db_temporal('app.db')
+    import app as aplicacion
+    from casa_apuestas import PoolConexiones
+    cliente = aplicacion.app.test_client()
+
+    resultados = []
+    for num in args.partidas:
+        db_path = db_temporal()
+        inicializar_base_datos(db_path)
+        casa = preparar(db_path, num)
+        aplicacion.pool_conexiones = PoolConexiones(db_path)
+        resultados.append({
+            'partidas_abiertas': num,
+            'datos_antes': medir_ms(lambda: carga_antigua(casa), args.repeticiones),
+            'datos_despues': medir_ms(lambda: carga_nueva(casa), args.repeticiones),
+            'http_index': medir_ms(lambda: cliente.get('/'), args.repeticiones),
+        })
+        casa.cerrar_conexion()
+
+    imprimir_resultado('index', resultados)
+
+
+if __name__ == '__main__':
+    main()
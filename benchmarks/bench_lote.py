@@ -0,0 +1,60 @@
+"""
+Apuestas/segundo registrando un lote de 10k apuestas con registrar_apuestas_lote
+frente a 10k llamadas a registrar_apuesta (un commit por apuesta).
+
+    python -m benchmarks.bench_lote --apuestas 10000
+"""
+import argparse
+import random
+import time
+
+from benchmarks.comun import db_temporal, imprimir_resultado
+from casa_apuestas import CasaDeApuestas, inicializar_base_datos
+
+
+def preparar(num_apostadores=500, num_partidas=20):
+    db_path = db_temporal()
+    inicializar_base_datos(db_path)
+    casa = CasaDeApuestas(db_path)
+    for i in range(num_apostadores):
+        casa.registrar_apostador(f"apostador_{i}", 1e9)
+    partidas = [casa.crear_partida(f"Local {i}", f"Visita {i}") for i in range(num_partidas)]
+    return casa, partidas
+
+
+def generar_apuestas(partidas, cantidad, num_apostadores=500, semilla=1):
+    rnd = random.Random(semilla)
+    return [{'partida_id': rnd.choice(partidas), 'nombre_apostador': f"apostador_{rnd.randrange(num_apostadores)}",
+             'monto': round(rnd.uniform(1, 50), 2), 'equipo': rnd.choice((1, 2))} for _ in range(cantidad)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--apuestas', type=int, default=10000)
+    args = parser.parse_args()
+
+    casa, partidas = preparar()
+    apuestas = generar_apuestas(partidas, args.apuestas)
+    inicio = time.perf_counter()
+    for a in apuestas:
+        casa.registrar_apuesta(a['partida_id'], a['nombre_apostador'], a['monto'], a['equipo'])
+    individual = args.apuestas / (time.perf_counter() - inicio)
+    casa.cerrar_conexion()
+
+    casa, partidas = preparar()
+    apuestas = generar_apuestas(partidas, args.apuestas)
+    inicio = time.perf_counter()
+    casa.registrar_apuestas_lote(apuestas)
+    lote = args.apuestas / (time.perf_counter() - inicio)
+    casa.cerrar_conexion()
+
+    imprimir_resultado('registrar_apuestas_lote', {
+        'apuestas': args.apuestas,
+        'apuestas_por_segundo_individual': round(individual, 1),
+        'apuestas_por_segundo_lote': round(lote, 1),
+        'mejora': round(lote / individual, 2),
+    })
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+"""
+Coste de la instrumentación de metricas.py: sentencias SQL con conexión normal
+frente a ConexionInstrumentada, y peticiones Flask con y sin los hooks de métricas.
+
+    python -m benchmarks.bench_metricas --sentencias 50000 --peticiones 2000
+"""
+import argparse
+import sqlite3
+
+from flask import Flask
+
+from benchmarks.comun import cronometrar, imprimir_resultado
+import metricas
+
+
+def sentencias_por_segundo(factory, sentencias):
+    conexion = sqlite3.connect(':memory:', factory=factory)
+    conexion.execute("CREATE TABLE t (id INTEGER PRIMARY KEY, v REAL)")
+    conexion.executemany("INSERT INTO t (v) VALUES (?)", ((float(i),) for i in range(1000)))
+
+    def consultar():
+        for i in range(sentencias):
+            conexion.execute("SELECT v FROM t WHERE id = ?", (i % 1000 + 1,)).fetchone()
+
+    duracion = cronometrar(consultar, 3)
+    conexion.close()
+    return sentencias / duracion
+
+
+def peticiones_por_segundo(instrumentada, peticiones):
+    app = Flask(__name__)
+
+    @app.route('/api/partida/<int:partida_id>')
+    def partida(partida_id):
+        return {'id': partida_id}
+
+    if instrumentada:
+        metricas.instrumentar_app(app, 'bench')
+    cliente = app.test_client()
+
+    def pedir():
+        for i in range(peticiones):
+            cliente.get(f'/api/partida/{i}')
+
+    return peticiones / cronometrar(pedir, 3)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sentencias', type=int, default=50000)
+    parser.add_argument('--peticiones', type=int, default=2000)
+    args = parser.parse_args()
+
+    sql_normal = sentencias_por_segundo(sqlite3.Connection, args.sentencias)
+    sql_medida = sentencias_por_segundo(metricas.ConexionInstrumentada, args.sentencias)
+    http_normal = peticiones_por_segundo(False, args.peticiones)
+    http_medida = peticiones_por_segundo(True, args.peticiones)
+    imprimir_resultado('metricas', {
+        'sql_normal_s': round(sql_normal, 1),
+        'sql_instrumentada_s': round(sql_medida, 1),
+        'sql_coste_us': round((1 / sql_medida - 1 / sql_normal) * 1e6, 2),
+        'http_normal_s': round(http_normal, 1),
+        'http_instrumentada_s': round(http_medida, 1),
+        'http_coste_us': round((1 / http_medida - 1 / http_normal) * 1e6, 2),
+    })
+
+
+if __name__ == '__main__':
+    main()
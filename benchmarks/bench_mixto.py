@@ -0,0 +1,102 @@
+"""
+Carga mixta lectura/escritura: procesos lectores generando los reportes y
+procesos escritores registrando apuestas a la vez, durante unos segundos,
+con el perfil clásico (journal DELETE, synchronous FULL) y con el perfil WAL.
+
+    python -m benchmarks.bench_mixto --lectores 4 --escritores 2 --segundos 5
+"""
+import argparse
+import contextlib
+import io
+import multiprocessing
+import random
+import time
+
+from benchmarks.comun import db_temporal, imprimir_resultado
+from casa_apuestas import CasaDeApuestas, inicializar_base_datos, perfil_almacenamiento
+
+PERFILES = {
+    'clasico': dict(journal_mode='DELETE', synchronous='FULL', cache_size=-2000, mmap_size=0, temp_store='DEFAULT'),
+    'wal': {},
+}
+
+
+def preparar(perfil, num_apostadores=300, num_partidas=50, historial_por_partida=200):
+    db_path = db_temporal()
+    inicializar_base_datos(db_path, perfil)
+    casa = CasaDeApuestas(db_path, perfil)
+    rnd = random.Random(3)
+    for i in range(num_apostadores):
+        casa.registrar_apostador(f"apostador_{i}", 1e9)
+    for _ in range(num_partidas):
+        partida_id = casa.crear_partida("Local", "Visita")
+        casa.registrar_apuestas_lote([
+            {'partida_id': partida_id, 'nombre_apostador': f"apostador_{rnd.randrange(num_apostadores)}",
+             'monto': rnd.randint(1, 50), 'equipo': rnd.choice((1, 2))} for _ in range(historial_por_partida)])
+        with contextlib.redirect_stdout(io.StringIO()):  # silencia el aviso de montos desiguales
+            casa.resolver_partida(partida_id, rnd.choice((1, 2)))
+    abiertas = [casa.crear_partida("Local", "Visita") for _ in range(5)]
+    casa.cerrar_conexion()
+    return db_path, abiertas
+
+
+def lector(db_path, perfil, hasta, cola):
+    casa = CasaDeApuestas(db_path, perfil)
+    hechas = bloqueos = 0
+    while time.time() < hasta:
+        try:
+            casa.obtener_balance_apostadores()
+            casa.obtener_reporte_apuestas_detallado()
+            hechas += 1
+        except Exception:
+            bloqueos += 1
+    cola.put(('lector', hechas, bloqueos))
+
+
+def escritor(db_path, perfil, partidas, semilla, hasta, cola):
+    casa = CasaDeApuestas(db_path, perfil)
+    rnd = random.Random(semilla)
+    hechas = bloqueos = 0
+    while time.time() < hasta:
+        try:
+            casa.registrar_apuesta(rnd.choice(partidas), f"apostador_{rnd.randrange(300)}", 1.0, rnd.choice((1, 2)))
+            hechas += 1
+        except Exception:
+            bloqueos += 1
+    cola.put(('escritor', hechas, bloqueos))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--lectores', type=int, default=4)
+    parser.add_argument('--escritores', type=int, default=2)
+    parser.add_argument('--segundos', type=float, default=5.0)
+    args = parser.parse_args()
+
+    resultados = {}
+    for nombre, cambios in PERFILES.items():
+        perfil = perfil_almacenamiento(**cambios)
+        db_path, partidas = preparar(perfil)
+        cola = multiprocessing.Queue()
+        hasta = time.time() + args.segundos
+        procesos = [multiprocessing.Process(target=lector, args=(db_path, perfil, hasta, cola))
+                    for _ in range(args.lectores)]
+        procesos += [multiprocessing.Process(target=escritor, args=(db_path, perfil, partidas, i, hasta, cola))
+                     for i in range(args.escritores)]
+        for p in procesos:
+            p.start()
+        datos = [cola.get() for _ in procesos]
+        for p in procesos:
+            p.join()
+        resultados[nombre] = {
+            'reportes_por_segundo': round(sum(d[1] for d in datos if d[0] == 'lector') / args.segundos, 1),
+            'apuestas_por_segundo': round(sum(d[1] for d in datos if d[0] == 'escritor') / args.segundos, 1),
+            'errores_bloqueo': sum(d[2] for d in datos),
+        }
+
+    imprimir_resultado('carga_mixta', {'lectores': args.lectores, 'escritores': args.escritores,
+                                       'segundos': args.segundos, 'perfiles': resultados})
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+"""
+Latencia de las apuestas mientras se generan reportes grandes: sin reportes,
+con los reportes leyendo la base viva y con los reportes leyendo la copia de
+replica_reportes.py (rehecha cada --intervalo segundos por los propios lectores).
+También se mide el tamaño máximo del -wal de la base viva en cada fase: las
+lecturas largas sobre ella impiden que el checkpoint lo recicle.
+
+    python -m benchmarks.bench_replica_reportes --historial 300000 --lectores 3 --segundos 8
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import time
+
+from benchmarks.comun import copia_de_trabajo, db_temporal, estadisticas, imprimir_resultado
+from benchmarks.generador import generar
+from casa_apuestas import CasaDeApuestas
+from replica_reportes import ReplicaReportes
+
+
+def lector(db_path, modo, intervalo, hasta, cola):
+    """Reportes completos en bucle: balance, detalle y recorrido del historial (como los exports)."""
+    if modo == 'copia':
+        replica = ReplicaReportes(db_path, intervalo=intervalo, max_antiguedad=intervalo * 2)
+        replica.iniciar()
+    else:
+        casa = CasaDeApuestas(db_path)
+    hechos = 0
+    while time.time() < hasta:
+        if modo == 'copia':
+            casa = replica.obtener()
+        casa.obtener_balance_apostadores()
+        casa.obtener_reporte_apuestas_detallado()
+        for _ in casa.iterar_historial():
+            pass
+        hechos += 1
+    cola.put(('lector', hechos, replica.copias if modo == 'copia' else 0))
+
+
+def escritor(db_path, hasta, cola):
+    casa = CasaDeApuestas(db_path)
+    rnd = random.Random(1)
+    abiertas = [fila[0] for fila in casa.cursor.execute("SELECT id FROM partidas WHERE estado = 'Abierta'")]
+    con_saldo = [fila[0] for fila in casa.cursor.execute("SELECT nombre FROM apostadores WHERE saldo >= 1000")]
+    latencias = []
+    while time.time() < hasta:
+        inicio = time.perf_counter()
+        casa.registrar_apuesta(rnd.choice(abiertas), rnd.choice(con_saldo), 1.0, rnd.choice((1, 2)))
+        latencias.append(time.perf_counter() - inicio)
+        time.sleep(0.001)  # ritmo constante (~1000/s como máximo) para comparar latencias, no saturar
+    cola.put(('escritor', latencias, None))
+
+
+def fase(db_original, modo, lectores, segundos, intervalo):
+    db_path = copia_de_trabajo(db_original)
+    cola = multiprocessing.Queue()
+    hasta = time.time() + segundos
+    procesos = [multiprocessing.Process(target=escritor, args=(db_path, hasta, cola))]
+    if modo != 'sin_reportes':
+        procesos += [multiprocessing.Process(target=lector, args=(db_path, modo, intervalo, hasta, cola))
+                     for _ in range(lectores)]
+    for p in procesos:
+        p.start()
+    # Tamaño máximo del -wal durante la fase (al cerrar la última conexión SQLite lo vacía)
+    wal, wal_max = f"{db_path}-wal", 0
+    while time.time() < hasta:
+        if os.path.exists(wal):
+            wal_max = max(wal_max, os.path.getsize(wal))
+        time.sleep(0.05)
+    mensajes = [cola.get() for _ in procesos]
+    for p in procesos:
+        p.join()
+    latencias = next(m[1] for m in mensajes if m[0] == 'escritor')
+    return {
+        'apuestas': estadisticas(latencias, segundos),
+        'reportes_completos': sum(m[1] for m in mensajes if m[0] == 'lector'),
+        'copias': sum(m[2] for m in mensajes if m[0] == 'lector'),
+        'wal_max_mb': round(wal_max / 1e6, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--historial', type=int, default=300000)
+    parser.add_argument('--lectores', type=int, default=3)
+    parser.add_argument('--segundos', type=float, default=8.0)
+    parser.add_argument('--intervalo', type=float, default=2.0, help="segundos entre copias")
+    args = parser.parse_args()
+
+    db_path = db_temporal()
+    datos = generar(db_path, apostadores=5000, partidas=1000, historial=args.historial,
+                    partidas_abiertas=50, apuestas_abiertas=5000, seed=7)
+    resultados = {'datos': datos, 'lectores': args.lectores, 'intervalo_copia_s': args.intervalo}
+    for modo in ('sin_reportes', 'base_viva', 'copia'):
+        resultados[modo] = fase(db_path, modo, args.lectores, args.segundos, args.intervalo)
+    imprimir_resultado('replica_reportes', resultados)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+"""
+Tiempo de liquidación de resolver_partida con 1k, 10k y 100k apuestas,
+comparando la versión por conjuntos con la antigua (una sentencia por apuesta).
+
+    python -m benchmarks.bench_resolver --tamanos 1000 10000 100000
+"""
+import argparse
+import contextlib
+import io
+import random
+import time
+
+from benchmarks.comun import db_temporal, imprimir_resultado
+from casa_apuestas import CasaDeApuestas, a_centimos, inicializar_base_datos
+
+
+def resolver_por_filas(casa, partida_id, equipo_ganador):
+    """Réplica de la liquidación antigua: un UPDATE y un INSERT por apuesta."""
+    cur = casa.cursor
+    partida = cur.execute("SELECT * FROM partidas WHERE id = ?", (partida_id,)).fetchone()
+    total_ganador = partida[f'total_e{equipo_ganador}_cent']
+    equipo_perdedor = 2 if equipo_ganador == 1 else 1
+    total_perdedor = partida[f'total_e{equipo_perdedor}_cent']
+    ganancia_casa = round(total_perdedor * 0.25)
+    a_repartir = total_ganador + total_perdedor - ganancia_casa
+    insert = """INSERT INTO historial (partida_id, apostador_id, monto_apostado_cent, monto_cobrado_cent, equipo_apostado)
+                VALUES (?, ?, ?, ?, ?)"""
+    pagado = 0
+    for equipo in (equipo_ganador, equipo_perdedor):
+        apuestas = cur.execute("SELECT apostador_id, monto_cent FROM apuestas WHERE partida_id = ? AND equipo_apostado = ?",
+                               (partida_id, equipo)).fetchall()
+        for apuesta in apuestas:
+            pago = apuesta['monto_cent'] * a_repartir // total_ganador if equipo == equipo_ganador else 0
+            if pago:
+                cur.execute("UPDATE apostadores SET saldo_cent = saldo_cent + ? WHERE id = ?", (pago, apuesta['apostador_id']))
+                pagado += pago
+            cur.execute(insert, (partida_id, apuesta['apostador_id'], apuesta['monto_cent'], pago, equipo))
+    # Los céntimos que sobran al truncar los pagos son de la casa, como en resolver_partida
+    ganancia_casa += a_repartir - pagado
+    cur.execute("UPDATE partidas SET equipo_ganador = ?, estado = 'Resuelta', ganancia_casa_cent = ? WHERE id = ?",
+                (equipo_ganador, ganancia_casa, partida_id))
+    cur.execute("DELETE FROM apuestas WHERE partida_id = ?", (partida_id,))
+    casa.conexion.commit()
+
+
+def preparar_partida(casa, num_apuestas, num_apostadores=1000, semilla=42):
+    """Crea una partida con num_apuestas apuestas repartidas entre los apostadores."""
+    rnd = random.Random(semilla)
+    casa.cursor.executemany("INSERT OR IGNORE INTO apostadores (id, nombre, saldo_cent) VALUES (?, ?, ?)",
+                            ((i + 1, f"apostador_{i}", 10 ** 11) for i in range(num_apostadores)))
+    # crear_partida abre su propia transacción (BEGIN IMMEDIATE): no puede quedar una abierta
+    casa.conexion.commit()
+    partida_id = casa.crear_partida("Leones", "Tigres")
+    apuestas = [(partida_id, rnd.randrange(num_apostadores) + 1, a_centimos(round(rnd.uniform(1, 100), 2)), rnd.choice((1, 2)))
+                for _ in range(num_apuestas)]
+    casa.cursor.executemany("INSERT INTO apuestas (partida_id, apostador_id, monto_cent, equipo_apostado) VALUES (?, ?, ?, ?)",
+                            apuestas)
+    for equipo in (1, 2):
+        total = sum(a[2] for a in apuestas if a[3] == equipo)
+        casa.cursor.execute(f"UPDATE partidas SET total_e{equipo}_cent = ? WHERE id = ?", (total, partida_id))
+    casa.conexion.commit()
+    return partida_id
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--tamanos', type=int, nargs='+', default=[1000, 10000, 100000])
+    args = parser.parse_args()
+
+    resultados = []
+    for tamano in args.tamanos:
+        fila = {'apuestas': tamano}
+        for nombre, resolver in (('por_filas', resolver_por_filas),
+                                 ('por_conjuntos', lambda c, p, g: c.resolver_partida(p, g))):
+            db_path = db_temporal()
+            inicializar_base_datos(db_path)
+            casa = CasaDeApuestas(db_path)
+            partida_id = preparar_partida(casa, tamano)
+            inicio = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):  # silencia el aviso de montos desiguales
+                resolver(casa, partida_id, 1)
+            fila[f'segundos_{nombre}'] = round(time.perf_counter() - inicio, 4)
+            casa.cerrar_conexion()
+        fila['mejora'] = round(fila['segundos_por_filas'] / fila['segundos_por_conjuntos'], 2)
+        resultados.append(fila)
+
+    imprimir_resultado('resolver_partida', resultados)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+"""
+Tiempo del simulador de riesgo con muchas partidas abiertas (carga + cálculo).
+
+    python -m benchmarks.bench_riesgo --partidas 10000 --apuestas-por-partida 20 --simulaciones 10000
+"""
+import argparse
+import random
+
+from benchmarks.comun import cronometrar, db_temporal, imprimir_resultado
+from casa_apuestas import CasaDeApuestas, inicializar_base_datos
+import simulador_riesgo
+
+
+def preparar(db_path, partidas, apuestas_por_partida, apostadores=500):
+    casa = CasaDeApuestas(db_path)
+    rnd = random.Random(17)
+    casa.cursor.executemany("INSERT INTO apostadores (id, nombre, saldo_cent) VALUES (?, ?, ?)",
+                            ((i + 1, f"apostador_{i}", 10 ** 11) for i in range(apostadores)))
+    casa.cursor.executemany("INSERT INTO partidas (id, nombre_equipo1, nombre_equipo2) VALUES (?, 'Local', 'Visita')",
+                            ((i,) for i in range(1, partidas + 1)))
+    apuestas = [(pid, rnd.randrange(apostadores) + 1, rnd.randint(1, 100) * 100, rnd.choice((1, 2)))
+                for pid in range(1, partidas + 1) for _ in range(apuestas_por_partida)]
+    casa.cursor.executemany("INSERT INTO apuestas (partida_id, apostador_id, monto_cent, equipo_apostado) VALUES (?, ?, ?, ?)",
+                            apuestas)
+    casa.cursor.execute("""
+        UPDATE partidas SET
+            total_e1_cent = (SELECT COALESCE(SUM(monto_cent), 0) FROM apuestas WHERE partida_id = partidas.id AND equipo_apostado = 1),
+            total_e2_cent = (SELECT COALESCE(SUM(monto_cent), 0) FROM apuestas WHERE partida_id = partidas.id AND equipo_apostado = 2)
+    """)
+    casa.conexion.commit()
+    return casa
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--partidas', type=int, default=10000)
+    parser.add_argument('--apuestas-por-partida', type=int, default=20)
+    parser.add_argument('--simulaciones', type=int, default=10000)
+    args = parser.parse_args()
+
+    db_path = db_temporal()
+    inicializar_base_datos(db_path)
+    casa = preparar(db_path, args.partidas, args.apuestas_por_partida)
+
+    resultados = {'partidas': args.partidas, 'apuestas': args.partidas * args.apuestas_por_partida,
+                  'numpy': simulador_riesgo._numpy() is not None}
+    resultados['carga_s'] = round(cronometrar(lambda: simulador_riesgo.cargar_partidas_abiertas(casa), 3), 3)
+    metodos = ['normal'] + (['montecarlo'] if simulador_riesgo._numpy() is not None else [])
+    for metodo in metodos:
+        resultados[f'{metodo}_s'] = round(cronometrar(lambda: simulador_riesgo.simular_riesgo(
+            casa, args.simulaciones, metodo=metodo, seed=1), 3), 3)
+    casa.cerrar_conexion()
+    imprimir_resultado('riesgo', resultados)
+
+
+if __name__ == '__main__':
+    main()
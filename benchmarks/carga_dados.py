@@ -0,0 +1,113 @@
+"""
+Prueba de carga del servicio de dados (main.py) con varios procesos, como los
+workers de gunicorn, cada uno con varios hilos y su propio cliente de la app.
+
+Todos apuestan contra los mismos pocos usuarios. Al final se comprueba que ningún
+balance quedó negativo y que, por usuario, balance final = balance inicial + suma
+de los 'profit' de las apuestas aceptadas (ninguna actualización se perdió).
+
+    python -m benchmarks.carga_dados --procesos 4 --hilos 4 --apuestas 500
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import sys
+import threading
+import time
+
+from benchmarks.comun import db_temporal, imprimir_resultado, percentil
+
+
+def trabajador(db_path, semilla, num_hilos, apuestas_por_hilo, usuarios, cola):
+    os.environ['CASA_DB_PATH'] = db_path
+    import main  # cada proceso carga su propia app, como un worker
+
+    ganancias = {u: 0.0 for u in usuarios}
+    contadores = {'aceptadas': 0, 'rechazadas': 0, 'errores': 0}
+    latencias = []
+    lock = threading.Lock()
+
+    def hilo(indice):
+        rnd = random.Random(semilla * 1000 + indice)
+        cliente = main.app.test_client()
+        for _ in range(apuestas_por_hilo):
+            user_id = rnd.choice(usuarios)
+            inicio = time.perf_counter()
+            resp = cliente.post('/bet', json={'amount': rnd.randint(1, 5), 'user_id': user_id})
+            duracion = (time.perf_counter() - inicio) * 1000
+            with lock:
+                latencias.append(duracion)
+                if resp.status_code == 200:
+                    contadores['aceptadas'] += 1
+                    ganancias[user_id] += resp.get_json()['profit']
+                elif resp.status_code == 400:
+                    contadores['rechazadas'] += 1
+                else:
+                    contadores['errores'] += 1
+
+    hilos = [threading.Thread(target=hilo, args=(i,)) for i in range(num_hilos)]
+    for t in hilos:
+        t.start()
+    for t in hilos:
+        t.join()
+    cola.put((ganancias, contadores, latencias))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--procesos', type=int, default=4)
+    parser.add_argument('--hilos', type=int, default=4)
+    parser.add_argument('--apuestas', type=int, default=500, help="apuestas por hilo")
+    parser.add_argument('--usuarios', type=int, default=5)
+    parser.add_argument('--saldo', type=float, default=10000.0,
+                        help="balance inicial (la casa gana 7 de cada 9 tiradas: con 100 se agota enseguida)")
+    args = parser.parse_args()
+
+    db_path = db_temporal()
+    os.environ['CASA_DB_PATH'] = db_path
+    from casa_apuestas import CasaDeApuestas, a_centimos, inicializar_base_datos
+    inicializar_base_datos(db_path)
+    usuarios = [f"usuario_{i}" for i in range(args.usuarios)]
+    casa = CasaDeApuestas(db_path)
+    casa.cursor.executemany("INSERT INTO usuarios_dados (user_id, balance_cent) VALUES (?, ?)",
+                            [(u, a_centimos(args.saldo)) for u in usuarios])
+    casa.conexion.commit()
+    casa.cerrar_conexion()
+
+    cola = multiprocessing.Queue()
+    procesos = [multiprocessing.Process(target=trabajador,
+                                        args=(db_path, p, args.hilos, args.apuestas, usuarios, cola))
+                for p in range(args.procesos)]
+    inicio = time.perf_counter()
+    for p in procesos:
+        p.start()
+    resultados = [cola.get() for _ in procesos]
+    for p in procesos:
+        p.join()
+    duracion = time.perf_counter() - inicio
+
+    casa = CasaDeApuestas(db_path)
+    balances = {u: casa.obtener_balance_dados(u) for u in usuarios}
+    casa.cerrar_conexion()
+
+    contadores = {clave: sum(r[1][clave] for r in resultados) for clave in ('aceptadas', 'rechazadas', 'errores')}
+    latencias = [lat for r in resultados for lat in r[2]]
+    fallos = [f"balance negativo: {u} = {b}" for u, b in balances.items() if b < 0]
+    for u in usuarios:
+        esperado = args.saldo + sum(r[0][u] for r in resultados)
+        if abs(balances[u] - esperado) > 1e-6:
+            fallos.append(f"no cuadra {u}: {balances[u]} != {esperado}")
+
+    imprimir_resultado('carga_dados', {
+        'procesos': args.procesos, 'hilos_por_proceso': args.hilos,
+        'intentos': args.procesos * args.hilos * args.apuestas, **contadores,
+        'apuestas_por_segundo': round(sum(contadores.values()) / duracion, 1),
+        'p50_ms': round(percentil(latencias, 50), 3), 'p99_ms': round(percentil(latencias, 99), 3),
+        'balances': balances, 'fallos': fallos,
+    })
+    sys.exit(1 if fallos or contadores['errores'] else 0)
+
+
+if __name__ == '__main__':
+    main()
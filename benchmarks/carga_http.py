@@ -0,0 +1,194 @@
+"""
+Escenario de carga HTTP contra las rutas Flask de app.py: varios clientes con
+conexiones keep-alive lanzan durante unos segundos una mezcla ponderada de
+lecturas (index, reportes, resumen, exportación) y escrituras (apuestas
+sueltas y en lote, alguna resolución) sobre datos del generador.
+
+Sin --url levanta la app en este proceso (servidor de Werkzeug con hilos) sobre
+una copia de la base; con --url ataca un servidor ya arrancado (p. ej. gunicorn)
+que debe usar la misma base indicada con --db (de ahí se leen ids y apostadores).
+
+    python -m benchmarks.carga_http --escala mediana --clientes 8 --segundos 10
+    python -m benchmarks.carga_http --url http://127.0.0.1:8000 --db casa_apuestas.db
+"""
+import argparse
+import http.client
+import json
+import logging
+import os
+import random
+import sqlite3
+import sys
+import threading
+import time
+from urllib.parse import urlencode, urlsplit
+
+from benchmarks.comun import copia_de_trabajo, db_temporal, estadisticas, imprimir_resultado
+from benchmarks.generador import agregar_argumentos, generar, parametros_escala
+
+# (operación, peso): proporción aproximada de cada petición en la mezcla
+MEZCLA = [
+    ('index', 25),
+    ('reportes', 10),
+    ('resumen', 15),
+    ('exportar_csv_partida', 5),
+    ('registrar_apuesta', 35),
+    ('apuestas_lote', 8),
+    ('resolver_partida', 2),
+]
+
+
+class Escenario:
+    """Datos compartidos por los clientes: ids válidos y partidas aún por resolver."""
+
+    def __init__(self, db_path):
+        conexion = sqlite3.connect(db_path)
+        self.abiertas = [fila[0] for fila in conexion.execute(
+            "SELECT id FROM partidas WHERE estado = 'Abierta' ORDER BY id")]
+        self.resueltas = [fila[0] for fila in conexion.execute(
+            "SELECT id FROM partidas WHERE estado = 'Resuelta' ORDER BY id DESC LIMIT 1000")]
+        self.apostadores = [fila[0] for fila in conexion.execute(
+            "SELECT nombre FROM apostadores WHERE saldo >= 1000 ORDER BY nombre LIMIT 1000")]
+        conexion.close()
+        # La mitad de las abiertas se pueden resolver; el resto sigue recibiendo apuestas
+        self.por_resolver = self.abiertas[len(self.abiertas) // 2:]
+        self.abiertas = self.abiertas[:len(self.abiertas) // 2] or self.abiertas
+        self._lock = threading.Lock()
+
+    def tomar_para_resolver(self):
+        with self._lock:
+            return self.por_resolver.pop() if self.por_resolver else None
+
+    def peticion(self, operacion, rnd):
+        """(método, ruta, cuerpo, cabeceras) de una operación, o None si ya no es posible."""
+        if operacion == 'index':
+            return 'GET', '/', None, {}
+        if operacion == 'reportes':
+            return 'GET', '/reportes', None, {}
+        if operacion == 'resumen':
+            return 'GET', '/api/reportes/resumen', None, {}
+        if operacion == 'exportar_csv_partida':
+            if not self.resueltas:
+                return None
+            return 'GET', f"/exportar_csv?partida_id={rnd.choice(self.resueltas)}", None, {}
+        formulario = {'Content-Type': 'application/x-www-form-urlencoded'}
+        if operacion == 'registrar_apuesta':
+            if not (self.abiertas and self.apostadores):
+                return None
+            cuerpo = urlencode({'partida_id': rnd.choice(self.abiertas), 'nombre_apostador': rnd.choice(self.apostadores),
+                                'monto': rnd.randint(1, 10), 'equipo': rnd.choice((1, 2))})
+            return 'POST', '/registrar_apuesta', cuerpo, formulario
+        if operacion == 'apuestas_lote':
+            if not (self.abiertas and self.apostadores):
+                return None
+            apuestas = [{'partida_id': rnd.choice(self.abiertas), 'nombre_apostador': rnd.choice(self.apostadores),
+                         'monto': rnd.randint(1, 10), 'equipo': rnd.choice((1, 2))} for _ in range(10)]
+            return 'POST', '/api/apuestas/lote', json.dumps({'apuestas': apuestas}), {'Content-Type': 'application/json'}
+        if operacion == 'resolver_partida':
+            partida_id = self.tomar_para_resolver()
+            if partida_id is None:
+                return None
+            return 'POST', '/resolver_partida', urlencode({'partida_id': partida_id,
+                                                           'equipo_ganador': rnd.choice((1, 2))}), formulario
+        raise ValueError(f"Operación desconocida: {operacion}")
+
+
+def cliente(url, escenario, semilla, fin, registros):
+    rnd = random.Random(semilla)
+    operaciones = [op for op, _ in MEZCLA]
+    pesos = [peso for _, peso in MEZCLA]
+    destino = urlsplit(url)
+    conexion = http.client.HTTPConnection(destino.hostname, destino.port, timeout=60)
+    while time.perf_counter() < fin:
+        operacion = rnd.choices(operaciones, pesos)[0]
+        peticion = escenario.peticion(operacion, rnd)
+        if peticion is None:
+            continue
+        metodo, ruta, cuerpo, cabeceras = peticion
+        inicio = time.perf_counter()
+        try:
+            conexion.request(metodo, ruta, body=cuerpo, headers=cabeceras)
+            respuesta = conexion.getresponse()
+            respuesta.read()
+            estado = respuesta.status
+        except (OSError, http.client.HTTPException):
+            conexion.close()
+            conexion = http.client.HTTPConnection(destino.hostname, destino.port, timeout=60)
+            estado = 'conexion'
+        registros.append((operacion, estado, time.perf_counter() - inicio))
+    conexion.close()
+
+
+def _servidor_local(db_path):
+    """Arranca app.py sobre db_path en un hilo y devuelve (url, servidor)."""
+    # app.py lee CASA_DB_PATH al importarse
+    os.environ['CASA_DB_PATH'] = db_path
+    from werkzeug.serving import make_server
+    import app as aplicacion
+
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)  # sin una línea de log por petición
+    servidor = make_server('127.0.0.1', 0, aplicacion.app, threaded=True)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{servidor.server_port}", servidor
+
+
+def ejecutar(db_path, url=None, clientes=8, segundos=10.0, seed=0):
+    """Corre el escenario y devuelve peticiones/s, estadísticas por operación y errores (5xx o de conexión)."""
+    servidor = None
+    if url is None:
+        db_path = copia_de_trabajo(db_path)
+        url, servidor = _servidor_local(db_path)
+    escenario = Escenario(db_path)
+    registros = []  # list.append es atómico: los clientes comparten la lista
+    fin = time.perf_counter() + segundos
+    hilos = [threading.Thread(target=cliente, args=(url, escenario, seed * 1000 + i, fin, registros))
+             for i in range(clientes)]
+    inicio = time.perf_counter()
+    for t in hilos:
+        t.start()
+    for t in hilos:
+        t.join()
+    duracion = time.perf_counter() - inicio
+    if servidor is not None:
+        servidor.shutdown()
+
+    por_operacion = {}
+    for operacion, _ in MEZCLA:
+        latencias = [lat for op, _, lat in registros if op == operacion]
+        if latencias:
+            por_operacion[operacion] = estadisticas(latencias, duracion)
+    estados = {}
+    for _, estado, _ in registros:
+        estados[str(estado)] = estados.get(str(estado), 0) + 1
+    errores = sum(n for estado, n in estados.items() if estado == 'conexion' or estado.startswith('5'))
+    return {
+        'clientes': clientes, 'segundos': round(duracion, 2), 'peticiones': len(registros),
+        'peticiones_s': round(len(registros) / duracion, 1),
+        'todas': estadisticas([lat for _, _, lat in registros], duracion),
+        'operaciones': por_operacion, 'estados': estados, 'errores': errores,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    agregar_argumentos(parser)
+    parser.add_argument('--db', help="base ya generada (con --url, la misma que usa el servidor)")
+    parser.add_argument('--url', help="servidor ya arrancado; si falta se levanta app.py en este proceso")
+    parser.add_argument('--clientes', type=int, default=8)
+    parser.add_argument('--segundos', type=float, default=10.0)
+    args = parser.parse_args()
+    if args.url and not args.db:
+        parser.error("--url necesita --db (la base del servidor) para elegir partidas y apostadores")
+
+    datos = None
+    db_path = args.db
+    if db_path is None:
+        db_path = db_temporal()
+        datos = generar(db_path, **parametros_escala(args))
+    resultados = ejecutar(db_path, args.url, args.clientes, args.segundos, args.seed)
+    imprimir_resultado('carga_http', {'datos': datos or {'db': db_path}, **resultados})
+    sys.exit(1 if resultados['errores'] else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+"""Utilidades compartidas por los benchmarks."""
+import json
+import logging
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+# Permite ejecutar los benchmarks desde la raíz del repositorio sin instalar nada.
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if RAIZ not in sys.path:
+    sys.path.insert(0, RAIZ)
+
+# Los avisos de la app (consultas lentas en las cargas masivas, pozos desiguales al
+# resolver) son esperados en los benchmarks y ensucian la salida: solo errores
+logging.getLogger('casa_apuestas').setLevel(logging.ERROR)
+
+
+def db_temporal(nombre='bench.db'):
+    """Devuelve la ruta de una base de datos nueva en un directorio temporal."""
+    return os.path.join(tempfile.mkdtemp(prefix='casa_bench_'), nombre)
+
+
+def cronometrar(func, repeticiones=1):
+    """Ejecuta func() varias veces y devuelve el mejor tiempo en segundos."""
+    mejor = None
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        func()
+        duracion = time.perf_counter() - inicio
+        mejor = duracion if mejor is None else min(mejor, duracion)
+    return mejor
+
+
+def percentil(valores, pct):
+    """Percentil simple (nearest-rank) de una lista de números."""
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    indice = max(0, min(len(ordenados) - 1, int(round(pct / 100.0 * len(ordenados))) - 1))
+    return ordenados[indice]
+
+
+def estadisticas(latencias, segundos=None):
+    """Resumen de una lista de latencias en segundos: operaciones/s y percentiles en ms."""
+    total = segundos if segundos is not None else sum(latencias)
+    return {
+        'n': len(latencias),
+        'ops_s': round(len(latencias) / total, 1) if total else 0.0,
+        'p50_ms': round(percentil(latencias, 50) * 1000, 3),
+        'p95_ms': round(percentil(latencias, 95) * 1000, 3),
+        'p99_ms': round(percentil(latencias, 99) * 1000, 3),
+        'max_ms': round(max(latencias, default=0.0) * 1000, 3),
+    }
+
+
+def copia_de_trabajo(db_path):
+    """Copia db_path (API de backup de SQLite) a una base temporal para que el benchmark pueda modificarla."""
+    destino = db_temporal(os.path.basename(db_path))
+    with sqlite3.connect(db_path) as origen, sqlite3.connect(destino) as copia:
+        origen.backup(copia)
+    origen.close()
+    copia.close()
+    return destino
+
+
+def imprimir_resultado(nombre, resultados):
+    """Imprime el resultado como una línea JSON para poder compararlo entre commits."""
+    print(json.dumps({'benchmark': nombre, 'resultados': resultados}, ensure_ascii=False))
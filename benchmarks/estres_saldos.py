@@ -0,0 +1,117 @@
+"""
+Prueba de estrés multiproceso del débito de saldo en registrar_apuesta.
+
+Varios procesos (como los workers de gunicorn), cada uno con varios hilos,
+lanzan miles de apuestas simultáneas contra pocos apostadores con saldo
+limitado. Al final se comprueba que ningún saldo quedó negativo y que
+saldo inicial = saldo final + total apostado, tanto por apostador como por partida.
+
+    python -m benchmarks.estres_saldos --procesos 4 --hilos 4 --apuestas 500
+"""
+import argparse
+import multiprocessing
+import random
+import sys
+import threading
+import time
+
+from benchmarks.comun import db_temporal, imprimir_resultado
+from casa_apuestas import CasaDeApuestas, inicializar_base_datos
+
+SALDO_INICIAL = 20000.0
+
+
+def trabajador(db_path, semilla, num_hilos, apuestas_por_hilo, num_apostadores, partidas, cola):
+    aceptadas = rechazadas = errores = 0
+    lock = threading.Lock()
+
+    def hilo(indice):
+        nonlocal aceptadas, rechazadas, errores
+        rnd = random.Random(semilla * 1000 + indice)
+        casa = CasaDeApuestas(db_path)
+        for _ in range(apuestas_por_hilo):
+            try:
+                casa.registrar_apuesta(rnd.choice(partidas), f"apostador_{rnd.randrange(num_apostadores)}",
+                                       float(rnd.randint(1, 40)), rnd.choice((1, 2)))
+                with lock:
+                    aceptadas += 1
+            except ValueError:
+                with lock:
+                    rechazadas += 1
+            except Exception:
+                with lock:
+                    errores += 1
+        casa.cerrar_conexion()
+
+    hilos = [threading.Thread(target=hilo, args=(i,)) for i in range(num_hilos)]
+    for t in hilos:
+        t.start()
+    for t in hilos:
+        t.join()
+    cola.put((aceptadas, rechazadas, errores))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--procesos', type=int, default=4)
+    parser.add_argument('--hilos', type=int, default=4)
+    parser.add_argument('--apuestas', type=int, default=500, help="apuestas por hilo")
+    parser.add_argument('--apostadores', type=int, default=5)
+    parser.add_argument('--saldo', type=float, default=SALDO_INICIAL,
+                        help="saldo inicial de cada apostador (con poco saldo se prueban los rechazos)")
+    parser.add_argument('--db', help="ruta de la base (por defecto una temporal nueva)")
+    args = parser.parse_args(argv)
+
+    db_path = args.db or db_temporal()
+    inicializar_base_datos(db_path)
+    casa = CasaDeApuestas(db_path)
+    for i in range(args.apostadores):
+        casa.registrar_apostador(f"apostador_{i}", args.saldo)
+    partidas = [casa.crear_partida(f"Local {i}", f"Visita {i}") for i in range(3)]
+    casa.cerrar_conexion()
+
+    cola = multiprocessing.Queue()
+    procesos = [multiprocessing.Process(target=trabajador,
+                                        args=(db_path, p, args.hilos, args.apuestas, args.apostadores, partidas, cola))
+                for p in range(args.procesos)]
+    inicio = time.perf_counter()
+    for p in procesos:
+        p.start()
+    totales = [cola.get() for _ in procesos]
+    for p in procesos:
+        p.join()
+    duracion = time.perf_counter() - inicio
+
+    casa = CasaDeApuestas(db_path)
+    saldos = {f['nombre']: f['saldo'] for f in casa.obtener_apostadores()}
+    apostado = {f['nombre']: f['total'] for f in casa.cursor.execute(
+        "SELECT a.nombre, SUM(ap.monto) AS total FROM apuestas ap JOIN apostadores a ON a.id = ap.apostador_id "
+        "GROUP BY a.nombre").fetchall()}
+    pools = casa.cursor.execute("""
+        SELECT p.id, p.total_apostado_e1 + p.total_apostado_e2 AS pool, COALESCE(SUM(a.monto), 0) AS apostado
+        FROM partidas p LEFT JOIN apuestas a ON a.partida_id = p.id GROUP BY p.id
+    """).fetchall()
+    num_apuestas = casa.cursor.execute("SELECT COUNT(*) FROM apuestas").fetchone()[0]
+    casa.cerrar_conexion()
+
+    aceptadas = sum(t[0] for t in totales)
+    fallos = []
+    fallos += [f"saldo negativo: {n} = {s}" for n, s in saldos.items() if s < 0]
+    fallos += [f"no cuadra {n}: {s} + {apostado.get(n, 0)} != {args.saldo}"
+               for n, s in saldos.items() if abs(s + apostado.get(n, 0) - args.saldo) > 1e-6]
+    fallos += [f"pool de partida {p['id']} no cuadra: {p['pool']} != {p['apostado']}"
+               for p in pools if abs(p['pool'] - p['apostado']) > 1e-6]
+    if num_apuestas != aceptadas:
+        fallos.append(f"apuestas registradas {num_apuestas} != aceptadas {aceptadas}")
+
+    imprimir_resultado('estres_saldos', {
+        'procesos': args.procesos, 'hilos_por_proceso': args.hilos,
+        'intentos': args.procesos * args.hilos * args.apuestas,
+        'aceptadas': aceptadas, 'rechazadas': sum(t[1] for t in totales), 'errores': sum(t[2] for t in totales),
+        'segundos': round(duracion, 2), 'fallos': fallos,
+    })
+    sys.exit(1 if fallos or any(t[2] for t in totales) else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,221 @@
+"""
+Generador de datos sintéticos y reproducibles para los benchmarks.
+
+Llena una base nueva con apostadores, partidas resueltas con su historial y
+partidas abiertas con sus apuestas. Los números cuadran como si todo hubiera
+pasado por registrar_apuesta/resolver_partida: totales de cada pozo, pagos
+(comisión del 25% para la casa, 75% repartido entre los ganadores) y tablas
+de resumen. La misma semilla y la misma escala dan exactamente los mismos datos.
+
+    python -m benchmarks.generador --escala grande --db /tmp/casa_grande.db
+    python -m benchmarks.generador --apostadores 5000 --historial 200000 --db /tmp/casa.db
+"""
+import argparse
+import datetime
+import os
+import random
+import time
+
+from benchmarks.comun import db_temporal, imprimir_resultado
+from casa_apuestas import COMISION_CASA_PCT, CasaDeApuestas, a_centimos, inicializar_base_datos
+from migraciones import recalcular_resumenes
+
+# Escalas predefinidas; cualquier valor se puede sobrescribir desde la línea de comandos
+ESCALAS = {
+    'mini': dict(apostadores=200, partidas=100, historial=20000, partidas_abiertas=20, apuestas_abiertas=2000),
+    'mediana': dict(apostadores=10000, partidas=2000, historial=1000000, partidas_abiertas=100, apuestas_abiertas=20000),
+    'grande': dict(apostadores=100000, partidas=10000, historial=10000000, partidas_abiertas=500,
+                   apuestas_abiertas=100000),
+}
+
+EQUIPOS = ['Alianza Lima', 'Universitario', 'Sporting Cristal', 'Melgar', 'Cienciano', 'Sport Boys',
+           'Cusco FC', 'ADT', 'Alianza Atlético', 'Atlético Grau', 'Deportivo Garcilaso', 'Comerciantes Unidos',
+           'Los Chankas', 'UTC', 'Carlos A. Mannucci', 'Sport Huancayo', 'Unión Comercio', 'César Vallejo']
+
+# Las partidas resueltas se reparten entre esta fecha y FECHA_INICIO + DIAS_HISTORIAL
+FECHA_INICIO = datetime.datetime(2023, 1, 1)
+DIAS_HISTORIAL = 730
+# Filas por executemany (acota la memoria del generador)
+TAMANO_LOTE = 50000
+
+
+def nombre_apostador(indice):
+    return f"apostador_{indice}"
+
+
+def _elegir_apostador(rnd, apostadores):
+    """id del apostador (el de nombre_apostador(id - 1))."""
+    # Sesgado: unos pocos apostadores concentran muchas apuestas, como en la realidad
+    return int(apostadores * rnd.random() ** 2) + 1
+
+
+def _apuestas_partida(rnd, apostadores, num_apuestas):
+    """[(apostador_id, monto_cent, equipo)] con al menos una apuesta a cada equipo si num_apuestas >= 2."""
+    apuestas = []
+    for i in range(num_apuestas):
+        equipo = i + 1 if i < 2 else rnd.choice((1, 2))
+        apuestas.append((_elegir_apostador(rnd, apostadores), rnd.randint(1, 200) * 100, equipo))
+    return apuestas
+
+
+def _repartir(total, partes):
+    """Reparte total en partes enteras lo más iguales posible."""
+    base, resto = divmod(total, partes) if partes else (0, 0)
+    return [base + (1 if i < resto else 0) for i in range(partes)]
+
+
+def _equipos(rnd):
+    equipo1, equipo2 = rnd.sample(EQUIPOS, 2)
+    return equipo1, equipo2
+
+
+def _insertar_por_lotes(cursor, sql, filas):
+    lote = []
+    for fila in filas:
+        lote.append(fila)
+        if len(lote) >= TAMANO_LOTE:
+            cursor.executemany(sql, lote)
+            lote.clear()
+    if lote:
+        cursor.executemany(sql, lote)
+
+
+def _resueltas(rnd, apostadores, resueltas, historial, partidas_out):
+    """Genera las filas de historial de las partidas resueltas y va dejando las partidas en partidas_out."""
+    segundos_por_partida = DIAS_HISTORIAL * 86400 / max(resueltas, 1)
+    for indice, num_apuestas in enumerate(_repartir(historial, resueltas)):
+        partida_id = indice + 1
+        equipo1, equipo2 = _equipos(rnd)
+        apuestas = _apuestas_partida(rnd, apostadores, num_apuestas)
+        totales = {1: 0, 2: 0}
+        for _, monto, equipo in apuestas:
+            totales[equipo] += monto
+        ganador = rnd.choice((1, 2))
+        perdedor = 3 - ganador
+        # En céntimos y con el mismo redondeo que resolver_partida
+        ganancia_casa = round(totales[perdedor] * COMISION_CASA_PCT)
+        a_repartir = totales[ganador] + totales[perdedor] - ganancia_casa
+        fecha = (FECHA_INICIO + datetime.timedelta(seconds=int(indice * segundos_por_partida))).strftime('%Y-%m-%d %H:%M:%S')
+        # Mismo orden que resolver_partida: primero las ganadoras; sin nada al ganador no hay historial
+        filas = []
+        if totales[ganador] > 0:
+            for apostador, monto, equipo in sorted(apuestas, key=lambda a: a[2] != ganador):
+                cobrado = monto * a_repartir // totales[ganador] if equipo == ganador else 0
+                filas.append((partida_id, apostador, monto, cobrado, equipo))
+            # Los céntimos que sobran al truncar los pagos son de la casa
+            ganancia_casa += a_repartir - sum(fila[3] for fila in filas)
+        partidas_out.append((partida_id, equipo1, equipo2, totales[1], totales[2], ganador, 'Resuelta',
+                             ganancia_casa, fecha))
+        yield from filas
+
+
+def _abiertas(rnd, apostadores, primera_id, partidas_abiertas, apuestas_abiertas, partidas_out):
+    for indice, num_apuestas in enumerate(_repartir(apuestas_abiertas, partidas_abiertas)):
+        partida_id = primera_id + indice
+        equipo1, equipo2 = _equipos(rnd)
+        totales = {1: 0, 2: 0}
+        for apostador, monto, equipo in _apuestas_partida(rnd, apostadores, num_apuestas):
+            totales[equipo] += monto
+            yield (partida_id, apostador, monto, equipo)
+        partidas_out.append((partida_id, equipo1, equipo2, totales[1], totales[2], None, 'Abierta', 0, None))
+
+
+def _indices_historial(cursor):
+    """[(nombre, sql)] de los índices secundarios del historial (se recrean tras la carga masiva)."""
+    return cursor.execute("""
+        SELECT name, sql FROM sqlite_master
+        WHERE type = 'index' AND tbl_name = 'historial' AND sql IS NOT NULL
+    """).fetchall()
+
+
+def generar(db_path, apostadores, partidas, historial, partidas_abiertas=0, apuestas_abiertas=0, seed=0,
+            saldo_maximo=5000.0):
+    """
+    Crea (o completa, si está vacía) la base db_path con los datos sintéticos.
+    partidas es el total, de las cuales partidas_abiertas quedan abiertas.
+    Devuelve un resumen con los conteos, los segundos y el tamaño del archivo.
+    """
+    if partidas_abiertas > partidas:
+        raise ValueError("partidas_abiertas no puede superar a partidas.")
+    if historial and partidas == partidas_abiertas:
+        raise ValueError("Hace falta al menos una partida resuelta para generar historial.")
+    inicio = time.perf_counter()
+    inicializar_base_datos(db_path)
+    casa = CasaDeApuestas(db_path)
+    cursor = casa.cursor
+    if cursor.execute("SELECT EXISTS (SELECT 1 FROM partidas) OR EXISTS (SELECT 1 FROM apostadores)").fetchone()[0]:
+        casa.cerrar_conexion()
+        raise ValueError(f"La base '{db_path}' ya tiene datos; el generador necesita una base vacía.")
+
+    rnd = random.Random(seed)
+    # Carga masiva: sin fsync y con los índices del historial recreados al final (mucho más rápido)
+    cursor.execute("PRAGMA synchronous = OFF")
+    indices = _indices_historial(cursor)
+    for nombre, _ in indices:
+        cursor.execute(f"DROP INDEX {nombre}")
+
+    _insertar_por_lotes(cursor, "INSERT INTO apostadores (id, nombre, saldo_cent) VALUES (?, ?, ?)",
+                        ((i + 1, nombre_apostador(i), a_centimos(round(rnd.uniform(0, saldo_maximo), 2)))
+                         for i in range(apostadores)))
+    filas_partidas = []
+    resueltas = partidas - partidas_abiertas
+    _insertar_por_lotes(cursor, """
+        INSERT INTO historial (partida_id, apostador_id, monto_apostado_cent, monto_cobrado_cent, equipo_apostado)
+        VALUES (?, ?, ?, ?, ?)
+    """, _resueltas(rnd, apostadores, resueltas, historial, filas_partidas))
+    _insertar_por_lotes(cursor, "INSERT INTO apuestas (partida_id, apostador_id, monto_cent, equipo_apostado) VALUES (?, ?, ?, ?)",
+                        _abiertas(rnd, apostadores, resueltas + 1, partidas_abiertas, apuestas_abiertas, filas_partidas))
+    _insertar_por_lotes(cursor, """
+        INSERT INTO partidas (id, nombre_equipo1, nombre_equipo2, total_e1_cent, total_e2_cent,
+                              equipo_ganador, estado, ganancia_casa_cent, fecha_resolucion)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, filas_partidas)
+
+    for _, sql in indices:
+        cursor.execute(sql)
+    recalcular_resumenes(cursor)
+    cursor.execute("UPDATE versiones_datos SET version = version + 1")
+    casa.conexion.commit()
+    cursor.execute("ANALYZE")
+    casa.conexion.commit()
+    filas_historial = cursor.execute("SELECT COUNT(*) FROM historial").fetchone()[0]
+    casa.checkpoint('TRUNCATE')
+    casa.cerrar_conexion()
+    return {
+        'seed': seed, 'apostadores': apostadores, 'partidas': partidas, 'partidas_abiertas': partidas_abiertas,
+        'historial': filas_historial, 'apuestas_abiertas': apuestas_abiertas,
+        'segundos': round(time.perf_counter() - inicio, 2), 'mb': round(os.path.getsize(db_path) / 1e6, 1),
+    }
+
+
+def agregar_argumentos(parser):
+    """Opciones de escala compartidas por el generador y los benchmarks que lo usan."""
+    parser.add_argument('--escala', choices=sorted(ESCALAS), default='mini')
+    for campo in ESCALAS['mini']:
+        parser.add_argument(f"--{campo.replace('_', '-')}", type=int, help="sobrescribe el valor de la escala")
+    parser.add_argument('--seed', type=int, default=0)
+
+
+def parametros_escala(args):
+    """Parámetros de generar() a partir de los argumentos de agregar_argumentos()."""
+    parametros = dict(ESCALAS[args.escala])
+    for campo in parametros:
+        valor = getattr(args, campo)
+        if valor is not None:
+            parametros[campo] = valor
+    parametros['seed'] = args.seed
+    return parametros
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    agregar_argumentos(parser)
+    parser.add_argument('--db', help="ruta de la base a crear (por defecto una temporal)")
+    args = parser.parse_args()
+    db_path = args.db or db_temporal()
+    resumen = generar(db_path, **parametros_escala(args))
+    imprimir_resultado('generador', {'db': db_path, **resumen})
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+"""
+Micro-benchmarks de las operaciones principales de CasaDeApuestas sobre datos
+del generador: registrar_apuesta, resolver_partida, obtener_balance_apostadores,
+obtener_reporte_apuestas_detallado y la exportación a Excel.
+
+Se trabaja sobre una copia de la base, así que --db puede apuntar a una base ya
+generada (p. ej. la escala grande) y reutilizarse entre commits.
+
+    python -m benchmarks.micro --escala mediana
+    python -m benchmarks.micro --db /tmp/casa_grande.db --max-detallado 0
+"""
+import argparse
+import random
+import tempfile
+import time
+
+from benchmarks.comun import copia_de_trabajo, db_temporal, estadisticas, imprimir_resultado
+from benchmarks.generador import agregar_argumentos, generar, parametros_escala
+from casa_apuestas import CasaDeApuestas
+from exportaciones import escribir_excel
+
+
+def medir(func, repeticiones):
+    """Latencias (s) de repeticiones llamadas a func(i)."""
+    latencias = []
+    for i in range(repeticiones):
+        inicio = time.perf_counter()
+        func(i)
+        latencias.append(time.perf_counter() - inicio)
+    return latencias
+
+
+def ejecutar(db_path, apuestas=1000, resoluciones=10, repeticiones_reportes=5, max_detallado=2000000,
+             excel=True, seed=0):
+    """Corre los micro-benchmarks sobre una copia de db_path y devuelve {operación: estadísticas}."""
+    casa = CasaDeApuestas(copia_de_trabajo(db_path))
+    rnd = random.Random(seed)
+    historial = casa.cursor.execute("SELECT COUNT(*) FROM apuestas_historial").fetchone()[0]
+    resultados = {'historial': historial}
+
+    # Lecturas primero, sobre los datos tal como salieron del generador
+    resultados['obtener_balance_apostadores'] = estadisticas(
+        medir(lambda _: casa.obtener_balance_apostadores(), repeticiones_reportes))
+    if historial <= max_detallado:
+        resultados['obtener_reporte_apuestas_detallado'] = estadisticas(
+            medir(lambda _: casa.obtener_reporte_apuestas_detallado(), 1))
+    else:
+        resultados['obtener_reporte_apuestas_detallado'] = {'omitido': f"historial > --max-detallado ({max_detallado})"}
+    if excel:
+        def exportar(_):
+            with tempfile.TemporaryFile() as destino:
+                escribir_excel(casa, destino)
+        resultados['exportar_excel'] = estadisticas(medir(exportar, 1))
+        resultados['exportar_excel']['filas_s'] = round(historial / (resultados['exportar_excel']['p50_ms'] / 1000), 1)
+
+    # Escrituras: apuestas de apostadores con saldo en partidas abiertas
+    abiertas = [fila[0] for fila in casa.cursor.execute("SELECT id FROM partidas WHERE estado = 'Abierta' ORDER BY id")]
+    con_saldo = [fila[0] for fila in casa.cursor.execute(
+        "SELECT nombre FROM apostadores WHERE saldo >= 1000 ORDER BY nombre LIMIT 1000")]
+    if abiertas and con_saldo:
+        resultados['registrar_apuesta'] = estadisticas(medir(
+            lambda _: casa.registrar_apuesta(rnd.choice(abiertas), rnd.choice(con_saldo),
+                                             float(rnd.randint(1, 10)), rnd.choice((1, 2))), apuestas))
+    a_resolver = abiertas[:resoluciones]
+    if a_resolver:
+        resultados['resolver_partida'] = estadisticas(medir(
+            lambda i: casa.resolver_partida(a_resolver[i], rnd.choice((1, 2))), len(a_resolver)))
+    casa.cerrar_conexion()
+    return resultados
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    agregar_argumentos(parser)
+    parser.add_argument('--db', help="base ya generada (se usa una copia); si falta se genera con la escala")
+    parser.add_argument('--apuestas', type=int, default=1000)
+    parser.add_argument('--resoluciones', type=int, default=10)
+    parser.add_argument('--max-detallado', type=int, default=2000000,
+                        help="no medir el detalle completo (carga todo en memoria) por encima de estas filas")
+    parser.add_argument('--sin-excel', action='store_true')
+    args = parser.parse_args()
+
+    datos = None
+    db_path = args.db
+    if db_path is None:
+        db_path = db_temporal()
+        datos = generar(db_path, **parametros_escala(args))
+    resultados = ejecutar(db_path, args.apuestas, args.resoluciones, max_detallado=args.max_detallado,
+                          excel=not args.sin_excel, seed=args.seed)
+    imprimir_resultado('micro', {'datos': datos or {'db': db_path}, **resultados})
+
+
+if __name__ == '__main__':
+    main()
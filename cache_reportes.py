@@ -0,0 +1,52 @@
+"""
+Caché en proceso para los reportes, con expulsión LRU por tamaño.
+
+Las claves incluyen los contadores de versiones_datos (ver migraciones v5), que
+suben en la misma transacción que cada escritura relevante. Así una entrada
+nunca se invalida a mano: cuando los datos cambian, la clave cambia, y las
+entradas viejas terminan expulsadas por LRU. Como el contador vive en SQLite,
+todos los workers de gunicorn ven la misma versión.
+"""
+import os
+import threading
+from collections import OrderedDict
+
+
+class CacheReportes:
+
+    def __init__(self, max_entradas=None):
+        self.max_entradas = max_entradas or int(os.environ.get('CASA_CACHE_REPORTES_MAX', 64))
+        self._entradas = OrderedDict()
+        self._lock = threading.Lock()
+        self.aciertos = 0
+        self.fallos = 0
+
+    def obtener(self, clave, calcular):
+        """Devuelve el valor de clave o lo calcula con calcular() y lo guarda."""
+        with self._lock:
+            if clave in self._entradas:
+                self._entradas.move_to_end(clave)
+                self.aciertos += 1
+                return self._entradas[clave]
+            self.fallos += 1
+        # Se calcula fuera del lock para no bloquear a otros hilos con consultas lentas
+        valor = calcular()
+        with self._lock:
+            self._entradas[clave] = valor
+            self._entradas.move_to_end(clave)
+            while len(self._entradas) > self.max_entradas:
+                self._entradas.popitem(last=False)
+        return valor
+
+    def limpiar(self):
+        with self._lock:
+            self._entradas.clear()
+
+    def __len__(self):
+        return len(self._entradas)
+
+
+def etag_para(nombre, versiones):
+    """ETag de un reporte: cambia en cuanto cambia cualquier versión de datos."""
+    partes = '-'.join(f"{k}{versiones[k]}" for k in sorted(versiones))
+    return f"{nombre}-{partes}"
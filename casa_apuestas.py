@@ -1,142 +1,441 @@
 import sqlite3
 import os
+import json
+import logging
+import math
+import random
+import threading
+import time
+import urllib.parse
+import weakref
+
+from metricas import fabrica_conexion
+from migraciones import aplicar_migraciones, recalcular_resumenes
+
+log = logging.getLogger('casa_apuestas')
+
+# Reintentos de la transacción completa si tras el busy_timeout la base sigue bloqueada.
+INTENTOS_BLOQUEO = 5
+
+# Reparto parimutuel al resolver: la casa se queda con el 25% del pozo perdedor
+# y los ganadores se reparten su apuesta más el 75% restante (ver simulador_riesgo.py)
+COMISION_CASA_PCT = 0.25
+COMISION_GANADORES_PCT = 0.75
+
+# Eventos que se conservan en la tabla eventos (los suscriptores solo necesitan los recientes)
+RETENCION_EVENTOS = 10000
+
+# Saldo con el que empieza (y al que se reinicia) cada usuario del servicio de dados
+SALDO_INICIAL_DADOS = 100.00
+
+
+# Mayor entero que cabe en una columna INTEGER de SQLite
+MAX_CENTIMOS = 2 ** 63 - 1
+
+
+def a_centimos(monto):
+    """
+    Monto en soles a céntimos enteros (así se guardan desde la migración 8), redondeando al céntimo.
+    ValueError si no es un número finito o no cabe en un INTEGER de SQLite (inf, nan, 1e400).
+    """
+    monto = float(monto)
+    if not math.isfinite(monto) or abs(monto * 100) > MAX_CENTIMOS:
+        raise ValueError(f"Monto inválido: {monto}")
+    return int(round(monto * 100))
+
+# --- Perfil de almacenamiento SQLite ---
+# Valores por defecto pensados para varios workers de gunicorn: WAL deja leer
+# los reportes mientras se escribe, y synchronous=NORMAL es seguro en WAL.
+# Cada valor se puede cambiar con la variable de entorno CASA_DB_<CLAVE>,
+# p. ej. CASA_DB_JOURNAL_MODE=DELETE o CASA_DB_BUSY_TIMEOUT=10000.
+PERFIL_POR_DEFECTO = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,                # milisegundos
+    'cache_size': -16000,                # negativo = KiB (≈16 MB por conexión)
+    'mmap_size': 64 * 1024 * 1024,       # bytes
+    'temp_store': 'MEMORY',
+    'wal_autocheckpoint': 1000,          # páginas de WAL antes del checkpoint automático (PASSIVE)
+    'journal_size_limit': 64 * 1024 * 1024,  # bytes: tamaño al que se recorta el -wal tras un checkpoint
+}
+_VALORES_PERMITIDOS = {
+    'journal_mode': {'WAL', 'DELETE', 'TRUNCATE', 'PERSIST', 'MEMORY', 'OFF'},
+    'synchronous': {'OFF', 'NORMAL', 'FULL', 'EXTRA'},
+    'temp_store': {'DEFAULT', 'FILE', 'MEMORY'},
+}
+
+
+def perfil_almacenamiento(**cambios):
+    """Devuelve el perfil de PRAGMAs: valores por defecto < variables de entorno < cambios explícitos."""
+    perfil = {}
+    for clave, defecto in PERFIL_POR_DEFECTO.items():
+        valor = cambios.get(clave, os.environ.get(f'CASA_DB_{clave.upper()}', defecto))
+        if clave in _VALORES_PERMITIDOS:
+            valor = str(valor).upper()
+            if valor not in _VALORES_PERMITIDOS[clave]:
+                raise ValueError(f"Valor no válido para {clave}: {valor}")
+        else:
+            valor = int(valor)
+        perfil[clave] = valor
+    return perfil
+
+
+def inicializar_base_datos(db_name, perfil=None):
+    """Crea/migra el esquema una sola vez (al arrancar el proceso), no en cada conexión."""
+    perfil = perfil or perfil_almacenamiento()
+    casa = CasaDeApuestas(db_name, perfil)
+    try:
+        # El modo de journal queda guardado en el archivo: basta con fijarlo aquí.
+        casa.conexion.execute(f"PRAGMA journal_mode = {perfil['journal_mode']}")
+        casa.crear_tablas()
+    finally:
+        casa.cerrar_conexion()
+
 
 class CasaDeApuestas:
     
-    def __init__(self, db_name):
+    def __init__(self, db_name, perfil=None, solo_lectura=False):
         # Permite acceder a las columnas por nombre
-        self.conexion = sqlite3.connect(db_name) 
+        # El esquema NO se crea aquí: usar inicializar_base_datos() al arrancar.
+        self.perfil = perfil or perfil_almacenamiento()
+        self.db_name = db_name
+        # solo_lectura abre el archivo en modo ro (p. ej. la copia para reportes, ver
+        # replica_reportes.py); a diferencia de query_only, deja crear vistas TEMP y adjuntar.
+        destino = f"file:{urllib.parse.quote(os.path.abspath(db_name))}?mode=ro" if solo_lectura else db_name
+        # Con CASA_METRICAS activo, cada sentencia se mide (ver metricas.py)
+        self.conexion = sqlite3.connect(destino, timeout=self.perfil['busy_timeout'] / 1000.0,
+                                        factory=fabrica_conexion(), uri=solo_lectura)
         self.conexion.row_factory = sqlite3.Row 
         self.cursor = self.conexion.cursor()
-        self.crear_tablas() 
+        for pragma in ('synchronous', 'busy_timeout', 'cache_size', 'mmap_size', 'temp_store',
+                       'wal_autocheckpoint', 'journal_size_limit'):
+            self.cursor.execute(f"PRAGMA {pragma} = {self.perfil[pragma]}")
+        # True mientras escribir_en_grupo() tiene abierta la transacción compartida
+        self._en_grupo = False
+        # Checkpoint pedido dentro de un grupo, que se hace después de su COMMIT
+        self._checkpoint_pendiente = False
 
     def cerrar_conexion(self):
         """Cierra la conexión con la base de datos."""
         self.conexion.close()
         
+    def checkpoint(self, modo='PASSIVE'):
+        """
+        Vuelca el WAL al archivo principal. PASSIVE no bloquea a nadie; TRUNCATE espera a
+        los lectores y deja el archivo -wal a cero. Devuelve (busy, paginas_log, paginas_copiadas).
+        """
+        modo = str(modo).upper()
+        if modo not in ('PASSIVE', 'FULL', 'RESTART', 'TRUNCATE'):
+            raise ValueError(f"Modo de checkpoint no válido: {modo}")
+        return tuple(self.conexion.execute(f"PRAGMA wal_checkpoint({modo})").fetchone())
+
     def crear_tablas(self):
-        """Método para crear las tablas si no existen."""
-        
-        # 1. Tabla de Apostadores
-        self.cursor.execute("""
-            CREATE TABLE IF NOT EXISTS apostadores (
-                nombre TEXT PRIMARY KEY,
-                saldo REAL DEFAULT 0.0
-            )
-        """)
-        
-        # 2. Tabla de Partidas Abiertas
-        self.cursor.execute("""
-            CREATE TABLE IF NOT EXISTS partidas (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                nombre_equipo1 TEXT NOT NULL,
-                nombre_equipo2 TEXT NOT NULL,
-                total_apostado_e1 REAL DEFAULT 0.0,
-                total_apostado_e2 REAL DEFAULT 0.0,
-                equipo_ganador INTEGER, -- 1 o 2
-                estado TEXT DEFAULT 'Abierta', -- 'Abierta', 'Resuelta'
-                ganancia_casa REAL DEFAULT 0.0
-            )
-        """)
-        
-        # 3. Tabla de Apuestas Abiertas
-        self.cursor.execute("""
-            CREATE TABLE IF NOT EXISTS apuestas (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                partida_id INTEGER,
-                nombre_apostador TEXT,
-                monto REAL NOT NULL,
-                equipo_apostado INTEGER, -- 1 o 2
-                FOREIGN KEY(partida_id) REFERENCES partidas(id),
-                FOREIGN KEY(nombre_apostador) REFERENCES apostadores(nombre)
-            )
-        """)
-        
-        # 4. TABLA NUEVA: Historial de Apuestas RESUELTAS
-        self.cursor.execute("""
-            CREATE TABLE IF NOT EXISTS apuestas_historial (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                partida_id INTEGER,
-                equipo1 TEXT,
-                equipo2 TEXT,
-                apostador TEXT,
-                monto_apostado REAL NOT NULL,
-                monto_cobrado REAL DEFAULT 0.0, -- El pago total recibido (incluyendo la devolución de lo apostado)
-                equipo_apostado INTEGER,
-                equipo_ganador INTEGER -- 1 o 2
-            )
-        """)
+        """Crea o actualiza el esquema aplicando las migraciones pendientes (ver migraciones.py)."""
+        return aplicar_migraciones(self.conexion)
+
+    def _escribir(self, operacion, *args):
+        """
+        Ejecuta operacion(*args) dentro de BEGIN IMMEDIATE ... COMMIT.
+        BEGIN IMMEDIATE toma el bloqueo de escritura antes de leer, así que las
+        comprobaciones hechas dentro no pueden quedar obsoletas por otro worker.
+        Si la base sigue bloqueada tras el busy timeout, se reintenta la transacción completa.
+        Dentro de escribir_en_grupo() la operación va en un SAVEPOINT de la transacción
+        del grupo: si falla se deshace solo ella y el COMMIT lo hace el grupo.
+        """
+        if self._en_grupo:
+            self.cursor.execute("SAVEPOINT operacion")
+            try:
+                resultado = operacion(*args)
+            except BaseException:
+                self.cursor.execute("ROLLBACK TO operacion")
+                self.cursor.execute("RELEASE operacion")
+                raise
+            self.cursor.execute("RELEASE operacion")
+            return resultado
+        for intento in range(INTENTOS_BLOQUEO):
+            try:
+                self.cursor.execute("BEGIN IMMEDIATE")
+                resultado = operacion(*args)
+                self.conexion.commit()
+                return resultado
+            except BaseException as e:
+                if self.conexion.in_transaction:
+                    self.conexion.rollback()
+                bloqueada = isinstance(e, sqlite3.OperationalError) and ('locked' in str(e) or 'busy' in str(e))
+                if not bloqueada or intento == INTENTOS_BLOQUEO - 1:
+                    raise
+                # Espera exponencial con algo de azar para no reintentar todos a la vez
+                time.sleep(0.05 * (2 ** intento) * (1 + random.random()))
 
-        self.conexion.commit()
+    def escribir_en_grupo(self, comandos):
+        """
+        Aplica varias escrituras [(metodo, args)] en UNA transacción (group commit, ver
+        cola_escritura.py). Cada comando se aísla en un SAVEPOINT: los que fallan se
+        deshacen sin afectar a los demás. Devuelve [(True, resultado) o (False, excepción)]
+        en el mismo orden, ya confirmado. Si falla la transacción entera, lanza la excepción.
+        """
+        def aplicar():
+            resultados = []
+            self._en_grupo = True
+            try:
+                for metodo, args in comandos:
+                    try:
+                        resultados.append((True, getattr(self, metodo)(*args)))
+                    except Exception as e:
+                        if not self.conexion.in_transaction:
+                            raise  # SQLite abortó la transacción del grupo: fallan todos
+                        resultados.append((False, e))
+                    if not self.conexion.in_transaction:
+                        # Un método que confirma por su cuenta rompería la atomicidad del grupo
+                        raise sqlite3.OperationalError(f"{metodo} cerró la transacción del grupo")
+            finally:
+                self._en_grupo = False
+            return resultados
+
+        try:
+            return self._escribir(aplicar)
+        finally:
+            if self._checkpoint_pendiente:
+                self._checkpoint_pendiente = False
+                if self.perfil['journal_mode'] == 'WAL' and not self.conexion.in_transaction:
+                    self.checkpoint('PASSIVE')
 
     # --- MÉTODOS EXISTENTES ---
     
     def obtener_apostadores(self):
-        self.cursor.execute("SELECT * FROM apostadores")
+        self.cursor.execute("SELECT nombre, saldo FROM apostadores ORDER BY id")
         return self.cursor.fetchall()
         
     def registrar_apostador(self, nombre, saldo):
-        self.cursor.execute("INSERT INTO apostadores (nombre, saldo) VALUES (?, ?)", (nombre, saldo))
-        self.conexion.commit()
+        self._escribir(self._registrar_apostador, nombre, saldo)
+
+    def _registrar_apostador(self, nombre, saldo):
+        self.cursor.execute("INSERT INTO apostadores (nombre, saldo_cent) VALUES (?, ?)", (nombre, a_centimos(saldo)))
+        self._incrementar_version('saldos')
 
     def ajustar_saldo_apostador(self, nombre, monto):
-        self.cursor.execute("UPDATE apostadores SET saldo = saldo + ? WHERE nombre = ?", (monto, nombre))
+        self._escribir(self._ajustar_saldo_apostador, nombre, monto)
+
+    def _ajustar_saldo_apostador(self, nombre, monto):
+        self.cursor.execute("UPDATE apostadores SET saldo_cent = saldo_cent + ? WHERE nombre = ?",
+                            (a_centimos(monto), nombre))
         if self.cursor.rowcount == 0:
             raise ValueError(f"Apostador '{nombre}' no encontrado.")
-        self.conexion.commit()
+        self._incrementar_version('saldos')
     
     def crear_partida(self, equipo1, equipo2):
+        return self._escribir(self._crear_partida, equipo1, equipo2)
+
+    def _crear_partida(self, equipo1, equipo2):
         self.cursor.execute("INSERT INTO partidas (nombre_equipo1, nombre_equipo2) VALUES (?, ?)", (equipo1, equipo2))
-        self.conexion.commit()
-        return self.cursor.lastrowid # Devolvemos el ID de la partida
+        partida_id = self.cursor.lastrowid
+        self._emitir_eventos([('partida_creada', {'partida_id': partida_id, 'equipo1': equipo1, 'equipo2': equipo2})])
+        return partida_id # Devolvemos el ID de la partida
+
+    # Columnas de siempre de partidas (sin las *_cent que guardan los montos)
+    _COLUMNAS_PARTIDAS = ("id, nombre_equipo1, nombre_equipo2, total_apostado_e1, total_apostado_e2, "
+                          "equipo_ganador, estado, ganancia_casa, fecha_resolucion")
 
     def obtener_partidas_abiertas(self):
-        self.cursor.execute("SELECT * FROM partidas WHERE estado = 'Abierta'")
+        self.cursor.execute(f"SELECT {self._COLUMNAS_PARTIDAS} FROM partidas WHERE estado = 'Abierta'")
         return self.cursor.fetchall()
 
-    def obtener_partidas_resueltas(self):
+    def obtener_partidas_resueltas(self, limite=None):
         # Esta función ahora devuelve las partidas de la tabla principal
-        self.cursor.execute("SELECT * FROM partidas WHERE estado = 'Resuelta'")
+        if limite is None:
+            self.cursor.execute(f"SELECT {self._COLUMNAS_PARTIDAS} FROM partidas WHERE estado = 'Resuelta'")
+        else:
+            # Solo las más recientes (p. ej. el historial del index)
+            self.cursor.execute(f"SELECT {self._COLUMNAS_PARTIDAS} FROM partidas WHERE estado = 'Resuelta' "
+                                f"ORDER BY id DESC LIMIT ?", (limite,))
         return self.cursor.fetchall()
 
+    # Apuestas abiertas con las columnas de siempre (nombre_apostador incluido)
+    _SELECT_APUESTAS = """
+        SELECT ap.id, ap.partida_id, a.nombre AS nombre_apostador, ap.monto, ap.equipo_apostado
+        FROM apuestas ap JOIN apostadores a ON a.id = ap.apostador_id
+    """
+
     def obtener_apuestas_partida(self, partida_id):
-        self.cursor.execute("SELECT * FROM apuestas WHERE partida_id = ?", (partida_id,))
+        self.cursor.execute(f"{self._SELECT_APUESTAS} WHERE ap.partida_id = ?", (partida_id,))
         return self.cursor.fetchall()
 
+    def obtener_apuestas_abiertas_por_partida(self):
+        """
+        Devuelve {partida_id: [apuestas]} de todas las partidas abiertas con UNA consulta
+        (en lugar de llamar a obtener_apuestas_partida por cada partida).
+        """
+        self.cursor.execute(f"""
+            {self._SELECT_APUESTAS}
+            WHERE ap.partida_id IN (SELECT id FROM partidas WHERE estado = 'Abierta')
+            ORDER BY ap.partida_id, ap.id
+        """)
+        apuestas_por_partida = {}
+        for apuesta in self.cursor.fetchall():
+            apuestas_por_partida.setdefault(apuesta['partida_id'], []).append(apuesta)
+        return apuestas_por_partida
+
     def registrar_apuesta(self, partida_id, nombre_apostador, monto, equipo):
-        # 1. Verificar saldo
-        self.cursor.execute("SELECT saldo FROM apostadores WHERE nombre = ?", (nombre_apostador,))
-        apostador = self.cursor.fetchone()
+        if equipo not in (1, 2):
+            raise ValueError("El equipo debe ser 1 o 2.")
+        if a_centimos(monto) <= 0:
+            raise ValueError("El monto debe ser mayor que 0.")
+        self._escribir(self._registrar_apuesta, partida_id, nombre_apostador, a_centimos(monto), equipo)
+
+    def _registrar_apuesta(self, partida_id, nombre_apostador, monto_cent, equipo):
+        # 1. Descontar saldo SOLO si alcanza: comprobación y débito en una sentencia
+        apostador = self.cursor.execute("""
+            UPDATE apostadores SET saldo_cent = saldo_cent - ? WHERE nombre = ? AND saldo_cent >= ?
+            RETURNING id
+        """, (monto_cent, nombre_apostador, monto_cent)).fetchall()
         if not apostador:
-            raise ValueError(f"Apostador '{nombre_apostador}' no encontrado.")
-        if apostador['saldo'] < monto:
+            self.cursor.execute("SELECT saldo FROM apostadores WHERE nombre = ?", (nombre_apostador,))
+            apostador = self.cursor.fetchone()
+            if not apostador:
+                raise ValueError(f"Apostador '{nombre_apostador}' no encontrado.")
             raise ValueError(f"Saldo insuficiente para '{nombre_apostador}'. Saldo actual: S/{apostador['saldo']:.2f}")
 
-        # 2. Registrar apuesta
-        self.cursor.execute("INSERT INTO apuestas (partida_id, nombre_apostador, monto, equipo_apostado) VALUES (?, ?, ?, ?)", 
-                            (partida_id, nombre_apostador, monto, equipo))
-        
-        # 3. Restar saldo al apostador
-        self.cursor.execute("UPDATE apostadores SET saldo = saldo - ? WHERE nombre = ?", (monto, nombre_apostador))
-        
-        # 4. Actualizar total apostado en la partida
-        campo_total = f'total_apostado_e{equipo}'
-        self.cursor.execute(f"UPDATE partidas SET {campo_total} = {campo_total} + ? WHERE id = ?", (monto, partida_id))
-        
-        self.conexion.commit()
+        # 2. Actualizar total apostado en la partida (solo si sigue abierta)
+        campo_total = f'total_e{equipo}_cent'
+        pozo = self.cursor.execute(f"""
+            UPDATE partidas SET {campo_total} = {campo_total} + ? WHERE id = ? AND estado = 'Abierta'
+            RETURNING total_apostado_e1, total_apostado_e2
+        """, (monto_cent, partida_id)).fetchall()
+        if not pozo:
+            raise ValueError(f"Partida {partida_id} no encontrada o ya resuelta.")
+
+        # 3. Registrar apuesta
+        self.cursor.execute("INSERT INTO apuestas (partida_id, apostador_id, monto_cent, equipo_apostado) VALUES (?, ?, ?, ?)",
+                            (partida_id, apostador[0]['id'], monto_cent, equipo))
+        self._incrementar_version('saldos')
+        self._emitir_eventos([
+            ('apuesta', {'partida_id': partida_id, 'apostador': nombre_apostador, 'monto': monto_cent / 100,
+                         'equipo': equipo}),
+            ('pozo', {'partida_id': partida_id, 'total_e1': float(pozo[0]['total_apostado_e1']),
+                      'total_e2': float(pozo[0]['total_apostado_e2'])}),
+        ])
     
-    # El método borrar_partidas_resueltas ahora borra de ambas tablas (partidas y apuestas_historial)
+    def registrar_apuestas_lote(self, apuestas):
+        """
+        Registra un lote de apuestas en UNA transacción (todo o nada).
+        Cada apuesta es un dict con partida_id, nombre_apostador, monto y equipo.
+        Si alguna no es válida se lanza ValueError con el detalle y no se registra ninguna.
+        Devuelve el número de apuestas registradas.
+        """
+        apuestas = list(apuestas)
+        if not apuestas:
+            return 0
+
+        errores = []
+        filas = []
+        for i, apuesta in enumerate(apuestas):
+            try:
+                partida_id = int(apuesta['partida_id'])
+                nombre = str(apuesta['nombre_apostador'])
+                monto_cent = a_centimos(apuesta['monto'])
+                equipo = int(apuesta['equipo'])
+            except (KeyError, TypeError, ValueError):
+                errores.append(f"#{i}: datos incompletos o inválidos")
+                continue
+            if equipo not in (1, 2):
+                errores.append(f"#{i}: equipo debe ser 1 o 2")
+            elif monto_cent <= 0:
+                errores.append(f"#{i}: el monto debe ser mayor que 0")
+            else:
+                filas.append((partida_id, nombre, monto_cent, equipo))
+
+        # Totales pedidos (en céntimos) por apostador y por partida/equipo
+        demanda = {}
+        por_partida = {}
+        for partida_id, nombre, monto_cent, equipo in filas:
+            demanda[nombre] = demanda.get(nombre, 0) + monto_cent
+            totales = por_partida.setdefault(partida_id, [0, 0])
+            totales[equipo - 1] += monto_cent
+
+        if errores:
+            raise ValueError("Lote rechazado: " + "; ".join(errores))
+
+        self._escribir(self._registrar_apuestas_lote, filas, demanda, por_partida)
+        return len(filas)
+
+    def _registrar_apuestas_lote(self, filas, demanda, por_partida):
+        errores = []
+
+        # 1. Verificar saldos y partidas con una consulta cada una (ya con el bloqueo tomado)
+        saldos, ids = {}, {}
+        for fila in self.cursor.execute(
+                "SELECT id, nombre, saldo_cent FROM apostadores WHERE nombre IN (SELECT value FROM json_each(?))",
+                (json.dumps(list(demanda)),)).fetchall():
+            saldos[fila['nombre']], ids[fila['nombre']] = fila['saldo_cent'], fila['id']
+        abiertas = {fila['id'] for fila in self.cursor.execute(
+            "SELECT id FROM partidas WHERE estado = 'Abierta' AND id IN (SELECT value FROM json_each(?))",
+            (json.dumps(list(por_partida)),)).fetchall()}
+
+        for nombre, total in demanda.items():
+            if nombre not in saldos:
+                errores.append(f"Apostador '{nombre}' no encontrado.")
+            elif saldos[nombre] < total:
+                errores.append(f"Saldo insuficiente para '{nombre}'. Saldo actual: S/{saldos[nombre] / 100:.2f}, "
+                               f"lote: S/{total / 100:.2f}")
+        for partida_id in por_partida:
+            if partida_id not in abiertas:
+                errores.append(f"Partida {partida_id} no encontrada o ya resuelta.")
+
+        if errores:
+            raise ValueError("Lote rechazado: " + "; ".join(errores))
+
+        # 2. Registrar apuestas
+        self.cursor.executemany("INSERT INTO apuestas (partida_id, apostador_id, monto_cent, equipo_apostado) VALUES (?, ?, ?, ?)",
+                                [(partida_id, ids[nombre], monto_cent, equipo)
+                                 for partida_id, nombre, monto_cent, equipo in filas])
+        # 3. Restar saldo (una fila por apostador)
+        self.cursor.executemany("UPDATE apostadores SET saldo_cent = saldo_cent - ? WHERE id = ?",
+                                [(total, ids[nombre]) for nombre, total in demanda.items()])
+        # 4. Actualizar totales de cada partida
+        self.cursor.executemany("""
+            UPDATE partidas SET total_e1_cent = total_e1_cent + ?, total_e2_cent = total_e2_cent + ?
+            WHERE id = ?
+        """, [(e1, e2, partida_id) for partida_id, (e1, e2) in por_partida.items()])
+        self._incrementar_version('saldos')
+        pozos = self.cursor.execute(
+            "SELECT id, total_apostado_e1, total_apostado_e2 FROM partidas WHERE id IN (SELECT value FROM json_each(?))",
+            (json.dumps(list(por_partida)),)).fetchall()
+        self._emitir_eventos(
+            [('apuestas_lote', {'registradas': len(filas), 'partidas': sorted(por_partida)})] +
+            [('pozo', {'partida_id': p['id'], 'total_e1': p['total_apostado_e1'], 'total_e2': p['total_apostado_e2']})
+             for p in pozos])
+
+    # El método borrar_partidas_resueltas ahora borra de ambas tablas (partidas e historial)
     def borrar_partidas_resueltas(self):
         """Borra las partidas resueltas de la tabla principal y el historial de apuestas."""
-        self.cursor.execute("DELETE FROM apuestas_historial WHERE partida_id IN (SELECT id FROM partidas WHERE estado = 'Resuelta')")
+        self._escribir(self._borrar_partidas_resueltas)
+        # Un borrado masivo hace crecer el WAL: se vuelca ya, sin esperar a los lectores
+        # (journal_size_limit se encarga de recortar el archivo cuando se reinicie).
+        # Dentro de un grupo la transacción sigue abierta: lo hace escribir_en_grupo tras el COMMIT.
+        if self._en_grupo or self.conexion.in_transaction:
+            self._checkpoint_pendiente = True
+        elif self.perfil['journal_mode'] == 'WAL':
+            self.checkpoint('PASSIVE')
+
+    def _borrar_partidas_resueltas(self):
+        # Los resúmenes se descuentan en la misma transacción que el borrado
+        self._actualizar_resumenes("SELECT id FROM partidas WHERE estado = 'Resuelta'", (), -1)
+        self.cursor.execute("DELETE FROM historial WHERE partida_id IN (SELECT id FROM partidas WHERE estado = 'Resuelta')")
         self.cursor.execute("DELETE FROM partidas WHERE estado = 'Resuelta'")
-        self.conexion.commit()
+        self._incrementar_version('historial')
+        self._emitir_eventos([('historial_borrado', {})])
 
-    def calcular_rentabilidad_total(self):
-        """Suma todas las comisiones de partidas resueltas."""
-        self.cursor.execute("SELECT SUM(ganancia_casa) AS total_ganancia FROM partidas WHERE estado = 'Resuelta'")
+    def calcular_rentabilidad_total(self, incluir_archivo=False):
+        """
+        Suma todas las comisiones de partidas resueltas (leída de resumen_casa).
+        Con incluir_archivo suma también las archivadas (requiere archivo.adjuntar_archivos).
+        """
+        if incluir_archivo:
+            return self.cursor.execute("SELECT COALESCE(SUM(ganancia_casa), 0.0) FROM partidas_completas "
+                                       "WHERE estado = 'Resuelta'").fetchone()[0]
+        self.cursor.execute("SELECT ganancia_total_cent / 100.0 AS ganancia_total FROM resumen_casa WHERE id = 1")
         resultado = self.cursor.fetchone()
-        return resultado['total_ganancia'] if resultado and resultado['total_ganancia'] is not None else 0.0
+        return resultado['ganancia_total'] if resultado and resultado['ganancia_total'] is not None else 0.0
         
     def obtener_reporte_partidas(self):
         """Obtiene datos de partidas resueltas para el reporte (usando la tabla principal)."""
@@ -145,21 +444,35 @@ class CasaDeApuestas:
 
     # --- MÉTODOS DE RESOLUCIÓN (MODIFICADO para HISTORIAL) ---
     def resolver_partida(self, partida_id, equipo_ganador):
-        
-        self.cursor.execute("SELECT nombre_equipo1, nombre_equipo2, total_apostado_e1, total_apostado_e2 FROM partidas WHERE id = ?", (partida_id,))
+        """
+        Liquida la partida con sentencias por conjuntos (INSERT ... SELECT al historial
+        y un UPDATE ... FROM con los pagos agregados), sin bucles por apuesta.
+        Cada ganador cobra su parte truncada al céntimo; los céntimos sobrantes van a la
+        casa, de modo que lo pagado más la ganancia de la casa suma exactamente el pozo.
+        Devuelve la ganancia de la casa en soles.
+        """
+        return self._escribir(self._resolver_partida, partida_id, equipo_ganador)
+
+    def _resolver_partida(self, partida_id, equipo_ganador):
+        # Con el bloqueo ya tomado no se puede colar una apuesta entre la lectura de totales y el borrado
+        self.cursor.execute("SELECT nombre_equipo1, nombre_equipo2, total_e1_cent, total_e2_cent, estado FROM partidas WHERE id = ?", (partida_id,))
         partida = self.cursor.fetchone()
         
         if not partida:
             raise ValueError("Partida no encontrada.")
+        if partida['estado'] == 'Resuelta':
+            # Resolver dos veces duplicaría la comisión en resumen_casa
+            raise ValueError("La partida ya está resuelta.")
             
         nombre_e1 = partida['nombre_equipo1']
         nombre_e2 = partida['nombre_equipo2']
-        total_e1 = partida['total_apostado_e1']
-        total_e2 = partida['total_apostado_e2']
+        total_e1 = partida['total_e1_cent']
+        total_e2 = partida['total_e2_cent']
 
         # Verificación de montos desiguales
         if total_e1 != total_e2:
-             print(f"\n[AVISO] Partida {partida_id}: Montos desiguales. E1: S/{total_e1:.2f}, E2: S/{total_e2:.2f}. Calculando igual...")
+             log.warning("Partida %s: Montos desiguales. E1: S/%.2f, E2: S/%.2f. Calculando igual...",
+                         partida_id, total_e1 / 100, total_e2 / 100)
 
         if equipo_ganador == 1:
             total_apostado_perdedor = total_e2 
@@ -170,99 +483,289 @@ class CasaDeApuestas:
             total_apostado_ganador = total_e2
             equipo_perdedor = 1
 
-        COMISION_CASA_PCT = 0.25
-        ganancia_casa = total_apostado_perdedor * COMISION_CASA_PCT 
+        # Todo en céntimos: la comisión se redondea al céntimo y los ganadores se reparten el resto.
+        # Cada pago se trunca al céntimo y los céntimos que sobran del reparto también son
+        # de la casa, así que pagos + ganancia_casa = pozo exacto.
+        ganancia_casa = round(total_apostado_perdedor * COMISION_CASA_PCT)
         
-        COMISION_GANADORES_PCT = 0.75
-        ganancia_para_ganadores = total_apostado_perdedor * COMISION_GANADORES_PCT
+        ganancia_para_ganadores = total_apostado_perdedor - ganancia_casa
         monto_total_a_repartir = total_apostado_ganador + ganancia_para_ganadores
 
-        # 1. Procesar Apuestas Ganadoras
-        self.cursor.execute("SELECT nombre_apostador, monto FROM apuestas WHERE partida_id = ? AND equipo_apostado = ?", (partida_id, equipo_ganador))
-        apuestas_ganadoras = self.cursor.fetchall()
-        
+        # 1. Registrar en historial TODAS las apuestas con una sola sentencia:
+        #    ganadoras con su pago proporcional (truncado al céntimo), perdedoras con 0.
+        #    (Si no hay nada apostado al ganador no se reparte, igual que antes.)
+        self.cursor.execute("""
+            INSERT INTO historial (partida_id, apostador_id, monto_apostado_cent, monto_cobrado_cent, equipo_apostado)
+            SELECT partida_id, apostador_id, monto_cent,
+                   CASE WHEN equipo_apostado = ? THEN monto_cent * ? / ? ELSE 0 END,
+                   equipo_apostado
+            FROM apuestas
+            WHERE partida_id = ?
+              AND (equipo_apostado = ? OR (equipo_apostado = ? AND ? > 0))
+            ORDER BY equipo_apostado = ? DESC, id
+        """, (equipo_ganador, monto_total_a_repartir, total_apostado_ganador,
+              partida_id, equipo_perdedor, equipo_ganador, total_apostado_ganador, equipo_ganador))
+
+        # 2. Abonar los pagos: un UPDATE agregando por apostador lo que se acaba de anotar en el historial
         if total_apostado_ganador > 0:
-            for apuesta in apuestas_ganadoras:
-                proporcion = apuesta['monto'] / total_apostado_ganador
-                pago_total = proporcion * monto_total_a_repartir
-                
-                # Actualizar saldo del apostador
-                self.cursor.execute("UPDATE apostadores SET saldo = saldo + ? WHERE nombre = ?", (pago_total, apuesta['nombre_apostador']))
-                
-                # *** REGISTRAR EN HISTORIAL ***
-                self.cursor.execute("""
-                    INSERT INTO apuestas_historial (partida_id, equipo1, equipo2, apostador, monto_apostado, monto_cobrado, equipo_apostado, equipo_ganador)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                """, (partida_id, nombre_e1, nombre_e2, apuesta['nombre_apostador'], apuesta['monto'], pago_total, equipo_ganador, equipo_ganador))
-
-
-        # 2. Procesar Apuestas Perdedoras (monto_cobrado = 0)
-        self.cursor.execute("SELECT nombre_apostador, monto FROM apuestas WHERE partida_id = ? AND equipo_apostado = ?", (partida_id, equipo_perdedor))
-        apuestas_perdedoras = self.cursor.fetchall()
-
-        for apuesta in apuestas_perdedoras:
-            # *** REGISTRAR EN HISTORIAL ***
+            pagado = self.cursor.execute("SELECT SUM(monto_cobrado_cent) FROM historial WHERE partida_id = ?",
+                                         (partida_id,)).fetchone()[0] or 0
+            ganancia_casa += monto_total_a_repartir - pagado
             self.cursor.execute("""
-                INSERT INTO apuestas_historial (partida_id, equipo1, equipo2, apostador, monto_apostado, monto_cobrado, equipo_apostado, equipo_ganador)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-            """, (partida_id, nombre_e1, nombre_e2, apuesta['nombre_apostador'], apuesta['monto'], 0.0, equipo_perdedor, equipo_ganador))
-
+                UPDATE apostadores SET saldo_cent = saldo_cent + pagos.pago_total
+                FROM (
+                    SELECT apostador_id, SUM(monto_cobrado_cent) AS pago_total
+                    FROM historial
+                    WHERE partida_id = ? AND monto_cobrado_cent > 0
+                    GROUP BY apostador_id
+                ) AS pagos
+                WHERE apostadores.id = pagos.apostador_id
+            """, (partida_id,))
 
         # 3. Actualizar partida a "Resuelta"
         self.cursor.execute("""
             UPDATE partidas SET 
             equipo_ganador = ?, 
             estado = 'Resuelta', 
-            ganancia_casa = ?  
+            ganancia_casa_cent = ?,
+            fecha_resolucion = datetime('now')
             WHERE id = ?
         """, (equipo_ganador, ganancia_casa, partida_id))
 
         # 4. Limpiar apuestas abiertas
         self.cursor.execute("DELETE FROM apuestas WHERE partida_id = ?", (partida_id,))
+
+        # 5. Acumular en las tablas de resumen (misma transacción)
+        self._actualizar_resumenes("?", (partida_id,), 1)
+        self._incrementar_version('historial', 'saldos')
+        self._emitir_eventos([('partida_resuelta', {'partida_id': partida_id, 'equipo1': nombre_e1, 'equipo2': nombre_e2,
+                                                    'equipo_ganador': equipo_ganador, 'ganancia_casa': ganancia_casa / 100})])
         
-        self.conexion.commit() 
-        return ganancia_casa
+        return ganancia_casa / 100
     
+    # --- SALDOS DEL SERVICIO DE DADOS (main.py) ---
+
+    def obtener_balance_dados(self, user_id):
+        """Balance del usuario; los usuarios que aún no jugaron tienen el saldo inicial."""
+        return self._balance_dados_cent(user_id) / 100
+
+    def _balance_dados_cent(self, user_id):
+        fila = self.cursor.execute("SELECT balance_cent FROM usuarios_dados WHERE user_id = ?", (user_id,)).fetchone()
+        return fila['balance_cent'] if fila else a_centimos(SALDO_INICIAL_DADOS)
+
+    def reiniciar_balance_dados(self, user_id):
+        """Vuelve a dejar el balance del usuario en el saldo inicial y lo devuelve."""
+        return self._escribir(self._reiniciar_balance_dados, user_id)
+
+    def _reiniciar_balance_dados(self, user_id):
+        self.cursor.execute("""
+            INSERT INTO usuarios_dados (user_id, balance_cent) VALUES (?, ?)
+            ON CONFLICT(user_id) DO UPDATE SET balance_cent = excluded.balance_cent
+        """, (user_id, a_centimos(SALDO_INICIAL_DADOS)))
+        return SALDO_INICIAL_DADOS
+
+    def aplicar_apuesta_dados(self, user_id, monto, ganancia):
+        """
+        Aplica el resultado de una tirada (ganancia = +monto o -monto) si el usuario
+        tiene al menos monto de saldo, y devuelve el nuevo balance.
+        Comprobación y actualización van en una sola sentencia (UPDATE ... RETURNING),
+        así que dos apuestas simultáneas del mismo usuario nunca pisan su saldo.
+        """
+        monto_cent = a_centimos(monto)
+        if monto_cent <= 0:
+            raise ValueError("Apuesta inválida o saldo insuficiente.")
+        return self._escribir(self._aplicar_apuesta_dados, user_id, monto_cent, a_centimos(ganancia))
+
+    def _aplicar_apuesta_dados(self, user_id, monto_cent, ganancia_cent):
+        actualizar = """
+            UPDATE usuarios_dados SET balance_cent = balance_cent + ?
+            WHERE user_id = ? AND balance_cent >= ?
+            RETURNING balance_cent
+        """
+        filas = self.cursor.execute(actualizar, (ganancia_cent, user_id, monto_cent)).fetchall()
+        if not filas:
+            # Usuario nuevo (se crea con el saldo inicial) o saldo insuficiente
+            self.cursor.execute("INSERT OR IGNORE INTO usuarios_dados (user_id, balance_cent) VALUES (?, ?)",
+                                (user_id, a_centimos(SALDO_INICIAL_DADOS)))
+            if self.cursor.rowcount:
+                filas = self.cursor.execute(actualizar, (ganancia_cent, user_id, monto_cent)).fetchall()
+        if not filas:
+            raise ValueError("Apuesta inválida o saldo insuficiente.")
+        return filas[0]['balance_cent'] / 100
+
+    def aplicar_lote_dados(self, user_id, montos, ganadoras):
+        """
+        Aplica en orden una serie de tiradas ya resueltas (ganadoras[i] True/False) con un
+        solo bloqueo de escritura. Cada ronda se acepta solo si 0 < monto <= balance en ese
+        momento; las demás se rechazan sin cortar la serie. Devuelve (aceptadas, balance_final).
+        ValueError (sin tocar el saldo) si algún monto no es un número finito.
+        """
+        montos_cent = [a_centimos(monto) for monto in montos]
+        return self._escribir(self._aplicar_lote_dados, user_id, montos_cent, ganadoras)
+
+    def _aplicar_lote_dados(self, user_id, montos_cent, ganadoras):
+        balance_cent = self._balance_dados_cent(user_id)
+        aceptadas = []
+        for monto_cent, gana in zip(montos_cent, ganadoras):
+            if 0 < monto_cent <= balance_cent:
+                balance_cent += monto_cent if gana else -monto_cent
+                aceptadas.append(True)
+            else:
+                aceptadas.append(False)
+        self.cursor.execute("""
+            INSERT INTO usuarios_dados (user_id, balance_cent) VALUES (?, ?)
+            ON CONFLICT(user_id) DO UPDATE SET balance_cent = excluded.balance_cent
+        """, (user_id, balance_cent))
+        return aceptadas, balance_cent / 100
+
+    # --- VERSIONES DE DATOS (caché de reportes) ---
+
+    def _incrementar_version(self, *nombres):
+        """Sube los contadores indicados; se llama dentro de la transacción de la escritura."""
+        self.cursor.executemany("UPDATE versiones_datos SET version = version + 1 WHERE nombre = ?",
+                                [(nombre,) for nombre in nombres])
+
+    def obtener_versiones_datos(self):
+        """Devuelve {'historial': n, 'saldos': m}; una lectura mínima compartida por todos los workers."""
+        return {fila['nombre']: fila['version'] for fila in
+                self.cursor.execute("SELECT nombre, version FROM versiones_datos").fetchall()}
+
+    # --- EVENTOS (stream SSE, ver eventos.py) ---
+
+    def _emitir_eventos(self, eventos):
+        """
+        Guarda [(tipo, datos)] en la tabla eventos dentro de la transacción en curso:
+        solo se publican si la escritura se confirma. Recorta los más antiguos.
+        """
+        self.cursor.executemany("INSERT INTO eventos (tipo, datos) VALUES (?, ?)",
+                                [(tipo, json.dumps(datos, ensure_ascii=False)) for tipo, datos in eventos])
+        self.cursor.execute("DELETE FROM eventos WHERE id <= (SELECT MAX(id) FROM eventos) - ?", (RETENCION_EVENTOS,))
+
+    # --- TABLAS DE RESUMEN ---
+
+    def _actualizar_resumenes(self, partidas_sql, parametros, signo):
+        """
+        Suma (signo=1) o resta (signo=-1) en resumen_apostadores y resumen_casa la
+        actividad de las partidas resueltas indicadas por partidas_sql (un '?' o un SELECT de ids).
+        No hace commit: se llama dentro de la transacción de quien modifica el historial.
+        Al restar hay que llamarla antes de borrar el historial de esas partidas.
+        """
+        self.cursor.execute(f"""
+            INSERT INTO resumen_apostadores (apostador_id, total_apostado_cent, total_retornado_cent, num_apuestas)
+            SELECT apostador_id, ? * SUM(monto_apostado_cent), ? * SUM(monto_cobrado_cent), ? * COUNT(*)
+            FROM historial
+            WHERE partida_id IN ({partidas_sql})
+            GROUP BY apostador_id
+            ON CONFLICT(apostador_id) DO UPDATE SET
+                total_apostado_cent = total_apostado_cent + excluded.total_apostado_cent,
+                total_retornado_cent = total_retornado_cent + excluded.total_retornado_cent,
+                num_apuestas = num_apuestas + excluded.num_apuestas
+        """, (signo, signo, signo) + tuple(parametros))
+        if signo < 0:
+            # Solo los apostadores de estas partidas pueden quedar en 0 (y por la clave
+            # primaria, sin recorrer todo el resumen): hay que hacerlo antes de borrar su historial.
+            self.cursor.execute(f"""
+                DELETE FROM resumen_apostadores
+                WHERE num_apuestas <= 0
+                  AND apostador_id IN (SELECT apostador_id FROM historial WHERE partida_id IN ({partidas_sql}))
+            """, tuple(parametros))
+
+        self.cursor.execute(f"""
+            UPDATE resumen_casa SET
+                ganancia_total_cent = ganancia_total_cent + ? * (SELECT COALESCE(SUM(ganancia_casa_cent), 0) FROM partidas
+                                                                 WHERE id IN ({partidas_sql}) AND estado = 'Resuelta'),
+                partidas_resueltas = partidas_resueltas + ? * (SELECT COUNT(*) FROM partidas
+                                                               WHERE id IN ({partidas_sql}) AND estado = 'Resuelta')
+            WHERE id = 1
+        """, (signo,) + tuple(parametros) + (signo,) + tuple(parametros))
+
+    def reconstruir_resumenes(self, tolerancia=0.005):
+        """
+        Recalcula las tablas de resumen desde el historial y devuelve las diferencias
+        (drift) encontradas respecto a lo que estaba guardado. Lista vacía = todo cuadraba.
+        """
+        def leer():
+            # En soles, para comparar con la tolerancia y mostrar las diferencias como siempre
+            apostadores = {fila['apostador']: fila for fila in self.cursor.execute("""
+                SELECT a.nombre AS apostador, r.total_apostado_cent / 100.0 AS total_apostado,
+                       r.total_retornado_cent / 100.0 AS total_retornado, r.num_apuestas
+                FROM resumen_apostadores r JOIN apostadores a ON a.id = r.apostador_id
+            """).fetchall()}
+            casa = self.cursor.execute("""
+                SELECT ganancia_total_cent / 100.0 AS ganancia_total, partidas_resueltas FROM resumen_casa WHERE id = 1
+            """).fetchone()
+            return apostadores, casa
+
+        def recalcular():
+            antes = leer()
+            recalcular_resumenes(self.cursor)
+            self._incrementar_version('historial')
+            return antes, leer()
+
+        # Lectura, recálculo y comparación bajo el mismo bloqueo de escritura
+        (antes_apostadores, antes_casa), (despues_apostadores, despues_casa) = self._escribir(recalcular)
+
+        diferencias = []
+
+        def comparar(tabla, clave, campo, guardado, recalculado):
+            if abs((guardado or 0) - (recalculado or 0)) > tolerancia:
+                diferencias.append({'tabla': tabla, 'clave': clave, 'campo': campo,
+                                    'guardado': guardado, 'recalculado': recalculado})
+
+        for apostador in sorted(set(antes_apostadores) | set(despues_apostadores)):
+            antes = antes_apostadores.get(apostador)
+            despues = despues_apostadores.get(apostador)
+            for campo in ('total_apostado', 'total_retornado', 'num_apuestas'):
+                comparar('resumen_apostadores', apostador, campo,
+                         antes[campo] if antes else 0, despues[campo] if despues else 0)
+        for campo in ('ganancia_total', 'partidas_resueltas'):
+            comparar('resumen_casa', 1, campo,
+                     antes_casa[campo] if antes_casa else 0, despues_casa[campo] if despues_casa else 0)
+        return diferencias
+
     # --- MÉTODOS NUEVOS DE REPORTE ---
 
-    def obtener_balance_apostadores(self):
+    def obtener_balance_apostadores(self, incluir_archivo=False):
         """
         Calcula el saldo consolidado y la actividad (apostado, retornado, neto) por apostador.
         Alimenta el primer cuadro del reporte.
+        Lee los totales de resumen_apostadores: O(apostadores), no O(historial).
+        Con incluir_archivo agrega historial_completo (calientes + archivados), que sí es O(historial).
         """
         balance = []
         
-        # 1. Obtener la lista de todos los apostadores con su saldo actual
-        apostadores_db = self.cursor.execute('SELECT nombre, saldo FROM apostadores').fetchall()
+        # Saldo actual de cada apostador + actividad ya agregada en resumen_apostadores
+        if not incluir_archivo:
+            actividad = """(
+                SELECT apostador_id, total_apostado_cent / 100.0 AS total_apostado,
+                       total_retornado_cent / 100.0 AS total_retornado
+                FROM resumen_apostadores) r ON r.apostador_id = a.id"""
+        else:
+            # Los archivos guardan los nombres (ver archivo.py): aquí sí se agrupa y se une por nombre
+            actividad = """(
+                SELECT apostador, SUM(monto_apostado) AS total_apostado, SUM(monto_cobrado) AS total_retornado
+                FROM historial_completo GROUP BY apostador) r ON r.apostador = a.nombre"""
+        filas = self.cursor.execute(f"""
+            SELECT a.nombre, a.saldo,
+                   COALESCE(r.total_apostado, 0.0) AS total_apostado,
+                   COALESCE(r.total_retornado, 0.0) AS total_retornado
+            FROM apostadores a
+            LEFT JOIN {actividad}
+            ORDER BY a.id
+        """).fetchall()
         
-        for apostador in apostadores_db:
-            nombre = apostador['nombre']
-            saldo_final = apostador['saldo']
-            
-            # Calcular actividad desde apuestas_historial
-            
-            # Total Apostado (lo que él puso en las apuestas resueltas)
-            total_apostado_sql = self.cursor.execute(
-                "SELECT SUM(monto_apostado) FROM apuestas_historial WHERE apostador = ?",
-                (nombre,)
-            ).fetchone()[0] or 0.0
-            
-            # Total Retornado (lo que le pagó la casa por las apuestas resueltas)
-            total_retornado_sql = self.cursor.execute(
-                "SELECT SUM(monto_cobrado) FROM apuestas_historial WHERE apostador = ?",
-                (nombre,)
-            ).fetchone()[0] or 0.0
-            
-            # Ganancia/Pérdida Neta del jugador (Retornado - Apostado)
-            ganancia_neta = total_retornado_sql - total_apostado_sql
+        for fila in filas:
+            total_apostado = fila['total_apostado'] or 0.0
+            total_retornado = fila['total_retornado'] or 0.0
             
             balance.append({
-                'nombre': nombre,
+                'nombre': fila['nombre'],
                 # El saldo final ya está en la tabla de apostadores y es el valor actual
-                'saldo_final': saldo_final, 
-                'total_apostado': total_apostado_sql,
-                'total_ganado': total_retornado_sql, # Lo renombro a total_ganado para ser más claro
-                'ganancia_neta': ganancia_neta
+                'saldo_final': fila['saldo'], 
+                'total_apostado': total_apostado,
+                'total_ganado': total_retornado, # Lo renombro a total_ganado para ser más claro
+                # Ganancia/Pérdida Neta del jugador (Retornado - Apostado)
+                'ganancia_neta': total_retornado - total_apostado
             })
             
         return balance
@@ -270,54 +773,295 @@ class CasaDeApuestas:
     def obtener_reporte_apuestas_detallado(self):
         """
         Obtiene el detalle de cada apuesta resuelta desde apuestas_historial.
-        Alimenta el último cuadro del reporte y la exportación.
+        Alimenta el último cuadro del reporte.
         """
-        reporte = []
         try:
-            # Obtener el historial completo de apuestas resueltas
-            apuestas_db = self.cursor.execute(
-                "SELECT * FROM apuestas_historial ORDER BY partida_id DESC"
-            ).fetchall()
-            
-            for apuesta in apuestas_db:
-                monto_cobrado = apuesta['monto_cobrado'] or 0.0
-                monto_apostado = apuesta['monto_apostado'] or 0.0
-                ganancia_neta_apuesta = monto_cobrado - monto_apostado
-                
-                # Determinar el resultado en texto
-                if apuesta['equipo_apostado'] == apuesta['equipo_ganador']:
-                    resultado_texto = "Ganada"
-                else:
-                    resultado_texto = "Perdida"
-                
-                # Nombre de la partida
-                partida_nombre = f"{apuesta['equipo1']} vs {apuesta['equipo2']}"
-                
-                # Nombre del equipo apostado (más descriptivo)
-                equipo_apostado_nombre = apuesta['equipo1'] if apuesta['equipo_apostado'] == 1 else apuesta['equipo2']
-                
-                reporte.append({
-                    'partida_id': apuesta['partida_id'],
-                    'apostador': apuesta['apostador'],
-                    'partida_nombre': partida_nombre,
-                    'equipo_apostado_num': apuesta['equipo_apostado'],
-                    'equipo_apostado_nombre': equipo_apostado_nombre,
-                    'resultado_texto': resultado_texto,
-                    'monto_apostado': monto_apostado,
-                    'monto_cobrado': monto_cobrado,
-                    'ganancia_neta': ganancia_neta_apuesta
-                })
-                
+            return list(self.iterar_reporte_apuestas_detallado())
         except Exception as e:
-            print(f"Error en obtener_reporte_apuestas_detallado: {e}")
-            reporte = []
-            
-        return reporte
+            log.exception("Error en obtener_reporte_apuestas_detallado: %s", e)
+            return []
+
+    def obtener_reporte_apuestas_pagina(self, limite=50, despues_de=None, apostador=None, partida_id=None,
+                                        desde=None, hasta=None, incluir_archivo=False):
+        """
+        Una página del detalle de apuestas resueltas, ordenado por (partida_id, id) DESC.
+        Paginación keyset: despues_de es la tupla (partida_id, id) devuelta como cursor por
+        la página anterior. Los filtros (apostador, partida, rango de fechas 'YYYY-MM-DD'
+        inclusive) se resuelven en SQL. Devuelve (filas, cursor_siguiente o None).
+        Con incluir_archivo lee la vista historial_completo (ver archivo.adjuntar_archivos).
+        """
+        tabla = 'historial_completo' if incluir_archivo else 'apuestas_historial'
+        condiciones, parametros = self._filtros_historial(apostador, partida_id, desde, hasta,
+                                                          'partidas_completas' if incluir_archivo else 'partidas')
+        if despues_de is not None:
+            ultimo_partida_id, ultimo_id = despues_de
+            condiciones.append("partida_id <= ? AND (partida_id < ? OR id < ?)")
+            parametros += [ultimo_partida_id, ultimo_partida_id, ultimo_id]
+        where = f"WHERE {' AND '.join(condiciones)}" if condiciones else ""
+
+        filas = self.cursor.execute(f"""
+            SELECT * FROM {tabla} {where}
+            ORDER BY partida_id DESC, id DESC
+            LIMIT ?
+        """, parametros + [limite + 1]).fetchall()
+
+        siguiente = None
+        if len(filas) > limite:
+            filas = filas[:limite]
+            siguiente = (filas[-1]['partida_id'], filas[-1]['id'])
+        return [self._formatear_apuesta_historial(f) for f in filas], siguiente
+
+    def obtener_reporte_partidas_pagina(self, limite=50, despues_de=None, apostador=None, partida_id=None,
+                                        desde=None, hasta=None, incluir_archivo=False):
+        """
+        Una página de partidas resueltas (id DESC) con paginación keyset sobre id.
+        Con apostador, solo las partidas en las que apostó. Devuelve (filas, cursor_siguiente o None).
+        Con incluir_archivo lee las vistas partidas_completas / historial_completo.
+        """
+        tabla, historial = ('partidas_completas', 'historial_completo') if incluir_archivo else ('partidas', 'apuestas_historial')
+        condiciones, parametros = ["estado = 'Resuelta'"], []
+        if apostador:
+            condiciones.append(f"id IN (SELECT partida_id FROM {historial} WHERE apostador = ?)")
+            parametros.append(apostador)
+        if partida_id is not None:
+            condiciones.append("id = ?")
+            parametros.append(partida_id)
+        if desde:
+            condiciones.append("fecha_resolucion >= ?")
+            parametros.append(desde)
+        if hasta:
+            condiciones.append("fecha_resolucion < date(?, '+1 day')")
+            parametros.append(hasta)
+        if despues_de is not None:
+            condiciones.append("id < ?")
+            parametros.append(despues_de)
+
+        filas = self.cursor.execute(f"""
+            SELECT id, nombre_equipo1, nombre_equipo2, equipo_ganador, ganancia_casa, fecha_resolucion
+            FROM {tabla} WHERE {' AND '.join(condiciones)}
+            ORDER BY id DESC
+            LIMIT ?
+        """, parametros + [limite + 1]).fetchall()
+
+        siguiente = None
+        if len(filas) > limite:
+            filas = filas[:limite]
+            siguiente = filas[-1]['id']
+        return filas, siguiente
+
+    @staticmethod
+    def _filtros_historial(apostador=None, partida_id=None, desde=None, hasta=None, partidas='partidas'):
+        """Condiciones WHERE (y sus parámetros) comunes a las consultas paginadas del historial."""
+        condiciones, parametros = [], []
+        if desde or hasta:
+            # La fecha de una apuesta es la de resolución de su partida: se filtran las partidas
+            # (índice estado, fecha_resolucion) y el historial se recorre por partida_id
+            rango, parametros = ["estado = 'Resuelta'"], []
+            if desde:
+                rango.append("fecha_resolucion >= ?")
+                parametros.append(desde)
+            if hasta:
+                rango.append("fecha_resolucion < date(?, '+1 day')")
+                parametros.append(hasta)
+            condiciones.append(f"partida_id IN (SELECT id FROM {partidas} WHERE {' AND '.join(rango)})")
+        if apostador:
+            condiciones.append("apostador = ?")
+            parametros.append(apostador)
+        if partida_id is not None:
+            condiciones.append("partida_id = ?")
+            parametros.append(partida_id)
+        return condiciones, parametros
+
+    def obtener_resumen_reportes(self):
+        """Totales para los cuadros resumen del reporte, leídos solo de las tablas de resumen."""
+        casa = self.cursor.execute("""
+            SELECT ganancia_total_cent / 100.0 AS ganancia_total, partidas_resueltas FROM resumen_casa WHERE id = 1
+        """).fetchone()
+        apostadores = self.cursor.execute("""
+            SELECT COUNT(*) AS apostadores, COALESCE(SUM(total_apostado_cent), 0) / 100.0 AS total_apostado,
+                   COALESCE(SUM(total_retornado_cent), 0) / 100.0 AS total_retornado,
+                   COALESCE(SUM(num_apuestas), 0) AS num_apuestas
+            FROM resumen_apostadores
+        """).fetchone()
+        return {
+            'rentabilidad': casa['ganancia_total'] if casa else 0.0,
+            'partidas_resueltas': casa['partidas_resueltas'] if casa else 0,
+            'apostadores_con_historial': apostadores['apostadores'],
+            'apuestas_resueltas': apostadores['num_apuestas'],
+            'total_apostado': apostadores['total_apostado'],
+            'total_retornado': apostadores['total_retornado'],
+        }
+
+    def iterar_reporte_apuestas_detallado(self, tamano_lote=1000):
+        """
+        Igual que obtener_reporte_apuestas_detallado pero sin materializar la lista:
+        va leyendo el cursor de a tamano_lote filas (para exportaciones grandes).
+        Usa un cursor propio para no interferir con otras consultas de self.cursor.
+        """
+        cursor = self.conexion.cursor()
+        try:
+            # Historial completo de apuestas resueltas
+            cursor.execute("SELECT * FROM apuestas_historial ORDER BY partida_id DESC")
+            while True:
+                lote = cursor.fetchmany(tamano_lote)
+                if not lote:
+                    break
+                for apuesta in lote:
+                    yield self._formatear_apuesta_historial(apuesta)
+        finally:
+            cursor.close()
+
+    def iterar_historial(self, since_id=None, partida_id=None, tamano_lote=1000):
+        """
+        Recorre las filas crudas de apuestas_historial en orden de id, por lotes.
+        since_id devuelve solo filas con id > since_id (extracciones incrementales)
+        y partida_id limita a una partida. Cada fila se entrega como dict.
+        """
+        condiciones, parametros = [], []
+        if since_id is not None:
+            condiciones.append("id > ?")
+            parametros.append(since_id)
+        if partida_id is not None:
+            condiciones.append("partida_id = ?")
+            parametros.append(partida_id)
+        where = f"WHERE {' AND '.join(condiciones)}" if condiciones else ""
+
+        cursor = self.conexion.cursor()
+        try:
+            cursor.execute(f"SELECT * FROM apuestas_historial {where} ORDER BY id", parametros)
+            columnas = [d[0] for d in cursor.description]
+            while True:
+                lote = cursor.fetchmany(tamano_lote)
+                if not lote:
+                    break
+                for fila in lote:
+                    yield dict(zip(columnas, fila))
+        finally:
+            cursor.close()
+
+    @staticmethod
+    def _formatear_apuesta_historial(apuesta):
+        """Convierte una fila de apuestas_historial en el dict que usan reportes y exportaciones."""
+        monto_cobrado = apuesta['monto_cobrado'] or 0.0
+        monto_apostado = apuesta['monto_apostado'] or 0.0
+        ganancia_neta_apuesta = monto_cobrado - monto_apostado
+        
+        # Determinar el resultado en texto
+        if apuesta['equipo_apostado'] == apuesta['equipo_ganador']:
+            resultado_texto = "Ganada"
+        else:
+            resultado_texto = "Perdida"
+        
+        # Nombre de la partida
+        partida_nombre = f"{apuesta['equipo1']} vs {apuesta['equipo2']}"
+        
+        # Nombre del equipo apostado (más descriptivo)
+        equipo_apostado_nombre = apuesta['equipo1'] if apuesta['equipo_apostado'] == 1 else apuesta['equipo2']
+        
+        return {
+            'partida_id': apuesta['partida_id'],
+            'apostador': apuesta['apostador'],
+            'partida_nombre': partida_nombre,
+            'equipo_apostado_num': apuesta['equipo_apostado'],
+            'equipo_apostado_nombre': equipo_apostado_nombre,
+            'resultado_texto': resultado_texto,
+            'monto_apostado': monto_apostado,
+            'monto_cobrado': monto_cobrado,
+            'ganancia_neta': ganancia_neta_apuesta
+        }
+
+
+class _CasaDelHilo:
+    """Envoltorio guardado en el threading.local del pool: al terminar el hilo se libera y cierra la conexión."""
+
+    def __init__(self, casa):
+        self.casa = casa
+
+    def __del__(self):
+        try:
+            self.casa.cerrar_conexion()
+        except sqlite3.ProgrammingError:
+            # Liberado desde otro hilo: SQLite no deja cerrarla aquí; se cierra al destruirse el objeto.
+            pass
+
+
+class PoolConexiones:
+    """
+    Pool por proceso con una CasaDeApuestas (y su conexión) por hilo.
+    La conexión se abre la primera vez que el hilo la pide y se reutiliza
+    en las peticiones siguientes; liberar() solo descarta lo no confirmado.
+    Cuando el hilo termina (p. ej. el servidor de desarrollo de Flask, que usa
+    un hilo por petición) su conexión se cierra: no se acumulan conexiones.
+    """
+
+    def __init__(self, db_name, perfil=None):
+        self.db_name = db_name
+        self.perfil = perfil or perfil_almacenamiento()
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        # Solo las de hilos vivos: el conjunto débil se vacía solo al cerrarse cada una
+        self._abiertas = weakref.WeakSet()
+        self._pid = os.getpid()
+
+    def obtener(self):
+        """Devuelve la CasaDeApuestas del hilo actual, creándola si hace falta."""
+        self._reiniciar_si_fork()
+        propia = getattr(self._local, 'propia', None)
+        if propia is None:
+            propia = _CasaDelHilo(CasaDeApuestas(self.db_name, self.perfil))
+            self._local.propia = propia
+            with self._lock:
+                self._abiertas.add(propia.casa)
+        return propia.casa
+
+    def liberar(self, casa):
+        """Devuelve la conexión al pool deshaciendo cualquier transacción a medias."""
+        if casa.conexion.in_transaction:
+            casa.conexion.rollback()
+
+    def num_abiertas(self):
+        """Conexiones abiertas ahora mismo (una por hilo vivo que usó el pool)."""
+        with self._lock:
+            return len(self._abiertas)
+
+    def cerrar_todas(self):
+        """Cierra todas las conexiones abiertas por el pool (al apagar el worker)."""
+        with self._lock:
+            abiertas, self._abiertas = list(self._abiertas), weakref.WeakSet()
+        for casa in abiertas:
+            try:
+                casa.cerrar_conexion()
+            except sqlite3.ProgrammingError:
+                # Conexión creada en otro hilo: SQLite no permite cerrarla desde aquí.
+                pass
+        self._local = threading.local()
+
+    def _reiniciar_si_fork(self):
+        # Tras un fork (gunicorn --preload) las conexiones heredadas no se pueden usar.
+        if self._pid != os.getpid():
+            with self._lock:
+                self._abiertas = weakref.WeakSet()
+                self._local = threading.local()
+                self._pid = os.getpid()
+
 
 # --- SCRIPT DE PRUEBA Y DEMOSTRACIÓN ---
 if __name__ == "__main__":
+    import sys
     DB_NAME = 'casa_apuestas.db'
 
+    # Uso: python casa_apuestas.py reconstruir_resumenes [ruta.db]
+    if len(sys.argv) > 1 and sys.argv[1] == 'reconstruir_resumenes':
+        db = sys.argv[2] if len(sys.argv) > 2 else DB_NAME
+        inicializar_base_datos(db)
+        casa = CasaDeApuestas(db)
+        diferencias = casa.reconstruir_resumenes()
+        casa.cerrar_conexion()
+        for d in diferencias:
+            print(f"[DRIFT] {d['tabla']} {d['clave']} {d['campo']}: guardado={d['guardado']} recalculado={d['recalculado']}")
+        print(f"Resúmenes reconstruidos. Diferencias encontradas: {len(diferencias)}")
+        sys.exit(1 if diferencias else 0)
+
     # ----------------------------------------------------------------------
     # CORRECCIÓN: Comentamos la línea de borrado para que el archivo persista
     # entre ejecuciones. Si quieres un inicio limpio, descomenta esta línea.
@@ -330,6 +1074,7 @@ if __name__ == "__main__":
     
     try:
         # Inicializar la casa de apuestas
+        inicializar_base_datos(DB_NAME)
         casa = CasaDeApuestas(DB_NAME)
 
         # 1. Registrar Apostadores y cargar saldo
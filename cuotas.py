@@ -0,0 +1,185 @@
+"""
+Cuotas en vivo de las partidas abiertas, servidas desde memoria (GET /api/odds).
+
+Cada worker guarda los pozos de las partidas abiertas y el pago implícito por
+unidad apostada a cada equipo (reparto parimutuel de resolver_partida: si gana
+el equipo 1, cada sol apostado a él cobra 1 + 75% * pozo_e2 / pozo_e1). Leer la
+caché es una búsqueda en un dict bajo un lock: no toca SQLite.
+
+La caché se mantiene con los eventos que las escrituras guardan en la tabla
+eventos (ver eventos.py), así que ve las apuestas de TODOS los workers:
+  pozo              registrar_apuesta / lote: totales nuevos de la partida
+  partida_creada    alta con pozos a cero
+  partida_resuelta  se saca de la caché
+El retraso es el intervalo de sondeo del bus (CASA_EVENTOS_INTERVALO). Si falta
+algún evento (hueco en los ids) o pasan CASA_CUOTAS_TTL segundos, se recarga
+entera desde partidas.
+
+    python cuotas.py [ruta.db] [segundos]
+        sigue los eventos durante unos segundos (con la app recibiendo apuestas)
+        y compara la caché con la base
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from casa_apuestas import COMISION_GANADORES_PCT
+
+# Segundos tras los que la caché se recarga completa desde la base (red de seguridad)
+TTL_CUOTAS = float(os.environ.get('CASA_CUOTAS_TTL', 60))
+# Diferencia admitida al comparar pozos con la base
+TOLERANCIA = 1e-6
+
+
+def calcular_cuotas(total_e1, total_e2):
+    """
+    Pago por unidad apostada a cada equipo si la partida se resolviera ahora
+    (None si nadie apostó a ese equipo: no hay reparto posible).
+    """
+    cuota_e1 = 1 + COMISION_GANADORES_PCT * total_e2 / total_e1 if total_e1 > 0 else None
+    cuota_e2 = 1 + COMISION_GANADORES_PCT * total_e1 / total_e2 if total_e2 > 0 else None
+    return (round(cuota_e1, 4) if cuota_e1 is not None else None,
+            round(cuota_e2, 4) if cuota_e2 is not None else None)
+
+
+def _entrada(partida_id, equipo1, equipo2, total_e1, total_e2):
+    cuota_e1, cuota_e2 = calcular_cuotas(total_e1, total_e2)
+    return {'partida_id': partida_id, 'equipo1': equipo1, 'equipo2': equipo2,
+            'total_e1': float(total_e1), 'total_e2': float(total_e2),
+            'cuota_e1': cuota_e1, 'cuota_e2': cuota_e2}
+
+
+class CacheCuotas:
+    """Pozos y cuotas de las partidas abiertas de este worker, alimentados por el bus de eventos."""
+
+    def __init__(self, db_name, bus=None, ttl=None):
+        self.db_name = db_name
+        self.bus = bus
+        self.ttl = TTL_CUOTAS if ttl is None else ttl
+        self._partidas = {}
+        self._lista = None  # obtener() sin partida: lista ya ordenada, se rehace al cambiar algo
+        self._ultimo_evento = 0
+        self._cargada_en = None
+        self._lock = threading.Lock()
+        self.recargas = 0
+        if bus is not None:
+            bus.agregar_oyente(self.aplicar_eventos)
+
+    def obtener(self, partida_id=None):
+        """Cuotas de todas las partidas abiertas (lista por id), o de una (dict o None si no está abierta)."""
+        if self.bus is not None:
+            self.bus.iniciar()
+        with self._lock:
+            if self._cargada_en is None or time.monotonic() - self._cargada_en > self.ttl:
+                self._cargar()
+            if partida_id is not None:
+                return self._partidas.get(partida_id)
+            if self._lista is None:
+                self._lista = [self._partidas[pid] for pid in sorted(self._partidas)]
+            return self._lista
+
+    def aplicar_eventos(self, filas):
+        """Aplica [(id, tipo, datos_json)] en orden; ante un hueco en los ids recarga todo."""
+        with self._lock:
+            if self._cargada_en is None:
+                return  # todavía nadie la consultó: se cargará completa al primer obtener()
+            for id_evento, tipo, datos in filas:
+                if id_evento <= self._ultimo_evento:
+                    continue
+                if id_evento != self._ultimo_evento + 1:
+                    # Eventos perdidos (bus arrancado tarde, retención superada): mejor recargar
+                    self._cargar()
+                    continue
+                self._ultimo_evento = id_evento
+                self._aplicar(tipo, datos)
+
+    def invalidar(self):
+        with self._lock:
+            self._cargada_en = None
+
+    # --- Internos (con self._lock tomado) ---
+
+    def _aplicar(self, tipo, datos):
+        if tipo == 'pozo':
+            datos = json.loads(datos)
+            actual = self._partidas.get(datos['partida_id'])
+            if actual is not None:
+                self._partidas[datos['partida_id']] = _entrada(datos['partida_id'], actual['equipo1'], actual['equipo2'],
+                                                               datos['total_e1'], datos['total_e2'])
+                self._lista = None
+        elif tipo == 'partida_creada':
+            datos = json.loads(datos)
+            self._partidas[datos['partida_id']] = _entrada(datos['partida_id'], datos['equipo1'], datos['equipo2'], 0.0, 0.0)
+            self._lista = None
+        elif tipo == 'partida_resuelta':
+            if self._partidas.pop(json.loads(datos)['partida_id'], None) is not None:
+                self._lista = None
+
+    def _cargar(self):
+        conexion = sqlite3.connect(self.db_name, timeout=5.0)
+        try:
+            # Partidas y último evento en la misma transacción de lectura: la misma foto de la base
+            conexion.execute("BEGIN")
+            filas = conexion.execute("""
+                SELECT id, nombre_equipo1, nombre_equipo2, total_apostado_e1, total_apostado_e2
+                FROM partidas WHERE estado = 'Abierta'
+            """).fetchall()
+            ultimo = conexion.execute("SELECT COALESCE(MAX(id), 0) FROM eventos").fetchone()[0]
+            conexion.rollback()
+        finally:
+            conexion.close()
+        self._partidas = {fila[0]: _entrada(*fila) for fila in filas}
+        self._lista = None
+        self._ultimo_evento = ultimo
+        self._cargada_en = time.monotonic()
+        self.recargas += 1
+
+
+def verificar_consistencia(cache, db_name=None):
+    """
+    Compara las cuotas en memoria con la base y devuelve las diferencias
+    (lista vacía = todo cuadra). Pensado para después de aplicar los eventos pendientes.
+    """
+    conexion = sqlite3.connect(db_name or cache.db_name)
+    try:
+        en_base = {fila[0]: _entrada(*fila) for fila in conexion.execute("""
+            SELECT id, nombre_equipo1, nombre_equipo2, total_apostado_e1, total_apostado_e2
+            FROM partidas WHERE estado = 'Abierta'
+        """)}
+    finally:
+        conexion.close()
+    en_cache = {c['partida_id']: c for c in cache.obtener()}
+    diferencias = []
+    for partida_id in sorted(set(en_base) | set(en_cache)):
+        base, memoria = en_base.get(partida_id), en_cache.get(partida_id)
+        if base is None or memoria is None:
+            diferencias.append({'partida_id': partida_id, 'campo': 'existe',
+                                'base': base is not None, 'cache': memoria is not None})
+            continue
+        for campo in ('total_e1', 'total_e2'):
+            if abs(base[campo] - memoria[campo]) > TOLERANCIA:
+                diferencias.append({'partida_id': partida_id, 'campo': campo,
+                                    'base': base[campo], 'cache': memoria[campo]})
+    return diferencias
+
+
+if __name__ == "__main__":
+    import sys
+
+    from eventos import BusEventos
+
+    db = sys.argv[1] if len(sys.argv) > 1 else 'casa_apuestas.db'
+    segundos = float(sys.argv[2]) if len(sys.argv) > 2 else 5.0
+    bus = BusEventos(db)
+    cache = CacheCuotas(db, bus, ttl=float('inf'))
+    cache.obtener()
+    time.sleep(segundos)
+    # Que el bus lea lo último escrito antes de comparar
+    time.sleep(bus.intervalo * 2)
+    bus.detener()
+    diferencias = verificar_consistencia(cache)
+    for d in diferencias:
+        print(f"[DIFERENCIA] partida {d['partida_id']} {d['campo']}: base={d['base']} cache={d['cache']}")
+    print(f"Partidas abiertas: {len(cache.obtener())}. Recargas: {cache.recargas}. Diferencias: {len(diferencias)}")
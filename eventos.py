@@ -0,0 +1,221 @@
+"""
+Actualizaciones en tiempo real (Server-Sent Events) para el panel de la Casa de Apuestas.
+
+Las escrituras de CasaDeApuestas guardan sus eventos (apuesta, pozo, partida_creada,
+partida_resuelta, ...) en la tabla eventos dentro de su misma transacción, así que
+solo se publican las escrituras confirmadas. En cada worker, un único hilo lee los
+eventos nuevos (una consulta por intervalo, haya 1 o 500 clientes), los codifica una
+sola vez en formato SSE y reparte los mismos bytes a la cola de cada suscriptor.
+Como la fuente es SQLite, los clientes de cualquier worker ven las escrituras de todos.
+
+Un cliente que se reconecta manda Last-Event-ID y recibe lo que se perdió. Por eso
+cada stream se cierra tras CASA_EVENTOS_DURACION segundos: el navegador reconecta
+solo y no pierde nada, y un hilo del servidor nunca queda tomado indefinidamente.
+Dentro del proceso, otros componentes (p. ej. la caché de cuotas) pueden recibir
+las mismas filas con agregar_oyente().
+"""
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+log = logging.getLogger('casa_apuestas.eventos')
+
+# Segundos entre lecturas de la tabla eventos (latencia máxima añadida)
+INTERVALO_SONDEO = float(os.environ.get('CASA_EVENTOS_INTERVALO', 0.2))
+# Clientes SSE por worker; cada uno ocupa un hilo del servidor mientras está conectado
+MAX_SUSCRIPTORES = int(os.environ.get('CASA_EVENTOS_MAX_CLIENTES', 500))
+# Segundos que dura cada stream antes de cerrarse (el cliente reconecta con Last-Event-ID)
+DURACION_MAXIMA = float(os.environ.get('CASA_EVENTOS_DURACION', 300))
+# Eventos pendientes por cliente antes de darlo por lento y desconectarlo
+MAX_PENDIENTES = 1000
+# Segundos sin eventos tras los que se manda un comentario para mantener viva la conexión
+LATIDO = 15.0
+# Eventos leídos por consulta
+LOTE_LECTURA = 500
+
+
+def codificar_evento(id_evento, tipo, datos):
+    """Mensaje SSE listo para enviar (datos ya es JSON de una línea)."""
+    return f"id: {id_evento}\nevent: {tipo}\ndata: {datos}\n\n".encode('utf-8')
+
+
+class Suscripcion:
+
+    def __init__(self):
+        self.cola = queue.Queue(MAX_PENDIENTES)
+
+
+class BusEventos:
+    """Reparte los eventos de la tabla eventos a los clientes SSE conectados a este worker."""
+
+    def __init__(self, db_name, intervalo=None, max_suscriptores=None, duracion_maxima=None):
+        self.db_name = db_name
+        self.intervalo = INTERVALO_SONDEO if intervalo is None else intervalo
+        self.max_suscriptores = MAX_SUSCRIPTORES if max_suscriptores is None else max_suscriptores
+        self.duracion_maxima = DURACION_MAXIMA if duracion_maxima is None else duracion_maxima
+        self._suscriptores = set()
+        self._oyentes = []
+        self._lock = threading.Lock()
+        self._parar = threading.Event()
+        self._hilo = None
+        self._pid = os.getpid()
+
+    def suscribir(self):
+        """Nueva Suscripcion, o None si el worker ya tiene el máximo de clientes."""
+        self._arrancar()
+        suscripcion = Suscripcion()
+        with self._lock:
+            if len(self._suscriptores) >= self.max_suscriptores:
+                return None
+            self._suscriptores.add(suscripcion)
+        return suscripcion
+
+    def agregar_oyente(self, oyente):
+        """
+        oyente(filas) recibe cada lote de eventos nuevos como [(id, tipo, datos_json)]
+        desde el hilo del bus. Debe ser rápido y no bloquear. No arranca el hilo (ver iniciar()).
+        """
+        with self._lock:
+            self._oyentes.append(oyente)
+
+    def iniciar(self):
+        """Arranca el hilo del bus en este proceso si aún no está corriendo."""
+        self._arrancar()
+
+    def desuscribir(self, suscripcion):
+        with self._lock:
+            self._suscriptores.discard(suscripcion)
+
+    def num_suscriptores(self):
+        with self._lock:
+            return len(self._suscriptores)
+
+    def flujo(self, suscripcion, desde_id=None):
+        """
+        Generador con los mensajes SSE de una suscripción ya creada. Con desde_id
+        (Last-Event-ID) primero repite los eventos perdidos; los que lleguen por
+        las dos vías se descartan por id. Termina a los duracion_maxima segundos.
+        """
+        ultimo = 0
+        hasta = time.monotonic() + self.duracion_maxima
+        try:
+            yield f"retry: {int(max(self.intervalo, 1) * 1000)}\n\n".encode('utf-8')
+            if desde_id is not None:
+                perdidos = self._leer(desde_id, MAX_PENDIENTES + 1)
+                if len(perdidos) > MAX_PENDIENTES:
+                    # Demasiado atrás: que el cliente recargue la página entera
+                    yield codificar_evento(perdidos[-1][0], 'recargar', '{}')
+                    return
+                for id_evento, mensaje in perdidos:
+                    ultimo = id_evento
+                    yield mensaje
+            while True:
+                restante = hasta - time.monotonic()
+                if restante <= 0:
+                    return
+                try:
+                    id_evento, mensaje = suscripcion.cola.get(timeout=min(LATIDO, restante))
+                except queue.Empty:
+                    if time.monotonic() < hasta:
+                        yield b": latido\n\n"
+                    continue
+                if id_evento is None:
+                    # Cliente lento desconectado por el bus: al reconectar recupera con Last-Event-ID
+                    return
+                if id_evento <= ultimo:
+                    continue
+                ultimo = id_evento
+                yield mensaje
+        finally:
+            self.desuscribir(suscripcion)
+
+    def detener(self):
+        self._parar.set()
+        if self._hilo is not None:
+            self._hilo.join()
+        self._hilo = None
+
+    # --- Internos ---
+
+    def _conectar(self):
+        conexion = sqlite3.connect(self.db_name, timeout=5.0)
+        conexion.execute("PRAGMA query_only = ON")
+        return conexion
+
+    def _leer_filas(self, desde_id, limite, conexion=None):
+        propia = conexion is None
+        conexion = conexion or self._conectar()
+        try:
+            return conexion.execute("SELECT id, tipo, datos FROM eventos WHERE id > ? ORDER BY id LIMIT ?",
+                                    (desde_id, limite)).fetchall()
+        finally:
+            if propia:
+                conexion.close()
+
+    def _leer(self, desde_id, limite, conexion=None):
+        return [(id_evento, codificar_evento(id_evento, tipo, datos))
+                for id_evento, tipo, datos in self._leer_filas(desde_id, limite, conexion)]
+
+    def _arrancar(self):
+        with self._lock:
+            if self._pid != os.getpid():
+                # Tras un fork el hilo del padre no existe en el hijo
+                self._suscriptores, self._hilo, self._pid = set(), None, os.getpid()
+                self._parar = threading.Event()
+            if self._hilo is None:
+                # El punto de partida se lee aquí y no en el hilo: si el hilo tardara en arrancar,
+                # los eventos escritos mientras tanto se saltarían sin dejar hueco en los ids.
+                conexion = self._conectar()
+                try:
+                    ultimo = conexion.execute("SELECT COALESCE(MAX(id), 0) FROM eventos").fetchone()[0]
+                finally:
+                    conexion.close()
+                self._hilo = threading.Thread(target=self._sondear, args=(ultimo,), name='bus-eventos', daemon=True)
+                self._hilo.start()
+
+    def _sondear(self, ultimo):
+        conexion = self._conectar()
+        try:
+            while not self._parar.is_set():
+                try:
+                    filas = self._leer_filas(ultimo, LOTE_LECTURA, conexion)
+                except sqlite3.OperationalError as e:
+                    log.warning("Error leyendo eventos: %s", e)
+                    filas = []
+                if filas:
+                    ultimo = filas[-1][0]
+                    self._avisar_oyentes(filas)
+                    self._repartir([(id_evento, codificar_evento(id_evento, tipo, datos))
+                                    for id_evento, tipo, datos in filas])
+                    if len(filas) == LOTE_LECTURA:
+                        continue  # quedan más: seguir sin esperar
+                self._parar.wait(self.intervalo)
+        finally:
+            conexion.close()
+
+    def _avisar_oyentes(self, filas):
+        with self._lock:
+            oyentes = list(self._oyentes)
+        for oyente in oyentes:
+            try:
+                oyente(filas)
+            except Exception as e:
+                # Un oyente roto no debe parar el reparto a los clientes SSE
+                log.exception("Error en un oyente de eventos: %s", e)
+
+    def _repartir(self, mensajes):
+        with self._lock:
+            suscriptores = list(self._suscriptores)
+        for suscripcion in suscriptores:
+            try:
+                for mensaje in mensajes:
+                    suscripcion.cola.put_nowait(mensaje)
+            except queue.Full:
+                # Cliente que no consume: se le corta para no acumular memoria
+                self.desuscribir(suscripcion)
+                with suscripcion.cola.mutex:
+                    suscripcion.cola.queue.clear()
+                suscripcion.cola.put_nowait((None, None))
@@ -0,0 +1,95 @@
+"""
+Exportaciones de reportes que no cargan todo el historial en memoria.
+El Excel se escribe con openpyxl en modo write-only directamente a un archivo;
+CSV y NDJSON se generan por trozos para enviarlos como respuesta en streaming.
+openpyxl se importa en la primera exportación a Excel, no al cargar el módulo:
+es lo más pesado del arranque de app.py y solo lo usa /exportar_excel.
+"""
+import csv
+import json
+from io import StringIO
+
+EXCEL_MIMETYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+# Columnas de apuestas_historial en el orden en que se exportan
+COLUMNAS_HISTORIAL = ['id', 'partida_id', 'equipo1', 'equipo2', 'apostador', 'monto_apostado',
+                      'monto_cobrado', 'equipo_apostado', 'equipo_ganador']
+
+
+def _encabezado(ws, titulos):
+    """Fila de encabezado con el mismo estilo que tenía el reporte original."""
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Font, PatternFill, Alignment
+
+    header_font = Font(bold=True, color="FFFFFF")
+    header_fill = PatternFill(start_color="4472C4", end_color="4472C4", fill_type="solid")
+    header_align = Alignment(horizontal="center", vertical="center")
+    celdas = []
+    for titulo in titulos:
+        celda = WriteOnlyCell(ws, value=titulo)
+        celda.font, celda.fill, celda.alignment = header_font, header_fill, header_align
+        celdas.append(celda)
+    ws.append(celdas)
+
+
+def escribir_excel(casa, destino, tamano_lote=1000):
+    """
+    Escribe el reporte completo (3 hojas) en destino (ruta o archivo binario).
+    Las filas del detalle se leen del cursor por lotes y se vuelcan al disco
+    según se generan, así que la memoria no crece con el historial.
+    """
+    from openpyxl import Workbook
+
+    wb = Workbook(write_only=True)
+
+    # Hoja 1
+    ws1 = wb.create_sheet("Balance Consolidado")
+    _encabezado(ws1, ['Apostador', 'Saldo Final', 'Total Apostado', 'Total Retornado', 'Ganancia Neta'])
+    for a in casa.obtener_balance_apostadores():
+        ws1.append([a.get('nombre'), a.get('saldo_final'), a.get('total_apostado'), a.get('total_ganado'), a.get('ganancia_neta')])
+
+    # Hoja 2
+    ws2 = wb.create_sheet("Ganancias Casa")
+    _encabezado(ws2, ['Partida', 'Ganador', 'Comisión (S/)'])
+    for p in casa.obtener_reporte_partidas():
+        ganador = p['nombre_equipo1'] if p['equipo_ganador'] == 1 else p['nombre_equipo2']
+        ws2.append([f"{p['nombre_equipo1']} vs {p['nombre_equipo2']}", ganador, p['ganancia_casa']])
+    ws2.append(['TOTAL', '', casa.calcular_rentabilidad_total() or 0.0])
+
+    # Hoja 3
+    ws3 = wb.create_sheet("Detalle Apuestas")
+    _encabezado(ws3, ['Partida ID', 'Apostador', 'Partida', 'Equipo Apostado', 'Monto', 'Cobrado', 'Neto', 'Resultado'])
+    for ap in casa.iterar_reporte_apuestas_detallado(tamano_lote):
+        ws3.append([ap.get('partida_id'), ap.get('apostador'), ap.get('partida_nombre'), ap.get('equipo_apostado_nombre'),
+                    ap.get('monto_apostado'), ap.get('monto_cobrado'), ap.get('ganancia_neta'), ap.get('resultado_texto')])
+
+    wb.save(destino)
+
+
+def generar_csv(filas, filas_por_trozo=500):
+    """Genera el CSV (con encabezado) en trozos de texto de filas_por_trozo filas."""
+    buffer = StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(COLUMNAS_HISTORIAL)
+    pendientes = 0
+    for fila in filas:
+        writer.writerow([fila.get(c) for c in COLUMNAS_HISTORIAL])
+        pendientes += 1
+        if pendientes >= filas_por_trozo:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            pendientes = 0
+    yield buffer.getvalue()
+
+
+def generar_ndjson(filas, filas_por_trozo=500):
+    """Genera un objeto JSON por línea (NDJSON) en trozos de filas_por_trozo filas."""
+    trozo = []
+    for fila in filas:
+        trozo.append(json.dumps({c: fila.get(c) for c in COLUMNAS_HISTORIAL}, ensure_ascii=False))
+        if len(trozo) >= filas_por_trozo:
+            yield "\n".join(trozo) + "\n"
+            trozo = []
+    if trozo:
+        yield "\n".join(trozo) + "\n"
@@ -0,0 +1,56 @@
+"""
+Configuración de gunicorn. La lee sola al arrancar desde este directorio, tanto
+con `gunicorn app:app` (Procfile) como con `gunicorn main:app` (Dockerfile).
+
+Workers con hilos (gthread): el index abre un stream SSE (/eventos) que ocupa un
+hilo mientras está conectado, así que con el worker sync por defecto un solo
+navegador abierto bloquearía la app. Un hilo con un stream pasa casi todo el
+tiempo esperando su cola de eventos y no toma conexión SQLite, así que se usan
+muchos: 64 por worker (CASA_GUNICORN_HILOS). Los streams pueden ocupar todos
+menos CASA_HILOS_PETICIONES (8), que quedan para las demás rutas (ver calentar()
+en app.py): con la configuración por defecto caben 56 clientes de /eventos por
+worker, es decir 56 x workers en total; el siguiente recibe 503 y su index
+funciona sin actualizaciones en vivo. Para más clientes, subir los hilos o los
+workers (WEB_CONCURRENCY). Cada stream se cierra y reconecta cada
+CASA_EVENTOS_DURACION segundos. --threads/--worker-class en la línea de comandos
+tienen prioridad.
+
+Con preload_app el maestro importa la app una sola vez (esquema y migraciones
+incluidos) y cada worker nace por fork con ella ya cargada: arrancar o reponer un
+worker no vuelve a pagar los imports ni el DDL. El pool de conexiones, el bus de
+eventos, la cola de escritura y la copia de reportes detectan el fork y abren sus
+conexiones e hilos dentro del worker.
+
+Antes de aceptar peticiones cada worker se calienta: post_worker_init llama a
+calentar() de la app (plantillas compiladas, primera conexión abierta).
+
+CASA_PRELOAD=0 vuelve a cargar la app en cada worker (p. ej. para usar --reload).
+"""
+import os
+import sys
+
+worker_class = 'gthread'
+threads = int(os.environ.get('CASA_GUNICORN_HILOS', 64))
+preload_app = os.environ.get('CASA_PRELOAD', '1') != '0'
+
+# Workers asíncronos: un stream no bloquea un hilo, no hace falta limitarlos
+_ASINCRONOS = ('gevent', 'eventlet', 'tornado')
+
+
+def post_worker_init(worker):
+    """Justo después del fork y de cargar la app en el worker: calentar() si el módulo de la app la define."""
+    modulo = sys.modules.get(getattr(worker.wsgi, 'import_name', None))
+    calentar = getattr(modulo, 'calentar', None)
+    if calentar is None:
+        return
+    clase = str(worker.cfg.worker_class_str)
+    # El worker sync atiende una petición a la vez aunque threads diga otra cosa
+    if any(a in clase for a in _ASINCRONOS):
+        hilos = None
+    else:
+        hilos = 1 if clase == 'sync' or clase.endswith('SyncWorker') else worker.cfg.threads
+    try:
+        calentar(hilos)
+    except Exception:
+        # Sin calentar el worker funciona igual: la primera petición hace ese trabajo
+        worker.log.exception("No se pudo calentar el worker %s", worker.pid)
@@ -1,5 +1,10 @@
-from flask import Flask, jsonify, request
+from flask import Flask, jsonify, request, g
 from flask_cors import CORS
+from casa_apuestas import PoolConexiones, inicializar_base_datos, SALDO_INICIAL_DADOS
+from metricas import instrumentar_app
+import cola_escritura
+import functools
+import logging
 import os
 import random
 
@@ -9,15 +14,62 @@ app = Flask(__name__)
 # Permitir peticiones desde cualquier origen (necesario para el frontend)
 CORS(app)
 
-# Diccionario para almacenar el estado del balance de los usuarios.
-# Usamos un ID de usuario fijo ('user123') para simular un estado persistente
-# en esta aplicación de demostración.
+# Logs y métricas (latencia por ruta, SQL por petición y GET /metrics)
+logging.basicConfig(level=os.environ.get('CASA_LOG_LEVEL', 'INFO'),
+                    format="%(asctime)s %(levelname)s [%(name)s] %(message)s")
+instrumentar_app(app, 'dados')
+
+# Los balances se guardan en la misma base SQLite que la Casa de Apuestas
+# (tabla usuarios_dados), así todos los workers y hilos ven el mismo saldo
+# y sobrevive a los reinicios.
+DB_PATH = os.environ.get('CASA_DB_PATH') or 'casa_apuestas.db'
+inicializar_base_datos(DB_PATH)
+pool_conexiones = PoolConexiones(DB_PATH)
+# Con CASA_COLA_ESCRITURA=1 las apuestas se agrupan en transacciones (ver cola_escritura.py)
+cola = cola_escritura.ColaEscritura(DB_PATH) if cola_escritura.ACTIVA else None
+
+# Usuario por defecto cuando la petición no indica ninguno (compatibilidad con el frontend)
 USER_ID = 'user123'
-user_data = {
-    USER_ID: {
-        'balance': 100.00
-    }
-}
+MAX_LARGO_USER_ID = 64
+# Rondas máximas por petición en /bet/batch
+MAX_RONDAS_LOTE = 1000
+
+def get_casa():
+    if 'casa' not in g:
+        g.casa = pool_conexiones.obtener()
+    return g.casa
+
+def escribir(metodo, *args):
+    """casa.metodo(*args) con la conexión del hilo, o por la cola de group commit si está activa."""
+    if cola is not None:
+        return cola.ejecutar(metodo, *args)
+    return getattr(get_casa(), metodo)(*args)
+
+@app.teardown_appcontext
+def teardown_casa(exception):
+    casa = g.pop('casa', None)
+    if casa is not None:
+        pool_conexiones.liberar(casa)
+
+def calentar(hilos=None):
+    """
+    Abre la conexión de este hilo antes de la primera petición (lo llama gunicorn.conf.py tras el fork).
+    hilos no se usa: el servicio de dados no tiene peticiones de larga duración.
+    """
+    casa = pool_conexiones.obtener()
+    try:
+        casa.obtener_versiones_datos()
+    finally:
+        pool_conexiones.liberar(casa)
+
+def obtener_user_id(data=None):
+    """Id de usuario: ?user_id=, campo 'user_id' del JSON o cabecera X-User-Id; si no, USER_ID."""
+    user_id = (request.args.get('user_id') or (data or {}).get('user_id')
+               or request.headers.get('X-User-Id') or USER_ID)
+    user_id = str(user_id).strip()
+    if not user_id or len(user_id) > MAX_LARGO_USER_ID:
+        raise ValueError("Id de usuario inválido.")
+    return user_id
 
 # ----------------------------------------------------
 # 1. RUTA PARA OBTENER EL BALANCE (GET /balance)
@@ -25,7 +77,11 @@ user_data = {
 @app.route('/balance', methods=['GET'])
 def get_balance():
     """Devuelve el balance actual del usuario."""
-    current_balance = user_data[USER_ID]['balance']
+    try:
+        user_id = obtener_user_id()
+    except ValueError as e:
+        return jsonify({"status": "error", "error": str(e)}), 400
+    current_balance = get_casa().obtener_balance_dados(user_id)
     return jsonify({
         "status": "success",
         "balance": current_balance
@@ -36,12 +92,15 @@ def get_balance():
 # ----------------------------------------------------
 @app.route('/reset', methods=['POST'])
 def reset_balance():
-    """Reinicia el balance del usuario a 100.00."""
-    user_data[USER_ID]['balance'] = 100.00
+    """Reinicia el balance del usuario al saldo inicial (100.00)."""
+    try:
+        user_id = obtener_user_id(request.get_json(silent=True))
+    except ValueError as e:
+        return jsonify({"status": "error", "error": str(e)}), 400
     return jsonify({
         "status": "success",
-        "new_balance": user_data[USER_ID]['balance'],
-        "message": "¡Balance reiniciado a $100.00! Que corran los dados."
+        "new_balance": escribir('reiniciar_balance_dados', user_id),
+        "message": f"¡Balance reiniciado a ${SALDO_INICIAL_DADOS:.2f}! Que corran los dados."
     })
 
 # ----------------------------------------------------
@@ -56,9 +115,12 @@ def handle_bet():
     except Exception:
         return jsonify({"status": "error", "error": "Monto de apuesta inválido."}), 400
 
-    current_balance = user_data[USER_ID]['balance']
+    try:
+        user_id = obtener_user_id(data)
+    except ValueError as e:
+        return jsonify({"status": "error", "error": str(e)}), 400
 
-    if amount <= 0 or amount > current_balance:
+    if amount <= 0:
         return jsonify({"status": "error", "error": "Apuesta inválida o saldo insuficiente."}), 400
 
     # Lógica del juego de dados: Gana si la suma es 7 u 11
@@ -70,15 +132,16 @@ def handle_bet():
     
     if is_winner:
         profit = amount  # Ganancia igual a la apuesta (paga 1:1)
-        new_balance = current_balance + profit
         result = "WIN"
     else:
         profit = -amount # Pérdida igual a la apuesta
-        new_balance = current_balance + profit
         result = "LOSS"
 
-    # Actualizar el balance
-    user_data[USER_ID]['balance'] = new_balance
+    # Actualizar el balance: comprobación de saldo y suma en una sola sentencia atómica
+    try:
+        new_balance = escribir('aplicar_apuesta_dados', user_id, amount, profit)
+    except ValueError as e:
+        return jsonify({"status": "error", "error": str(e)}), 400
 
     return jsonify({
         "status": "success",
@@ -90,6 +153,86 @@ def handle_bet():
         "profit": profit
     })
 
+# ----------------------------------------------------
+# 4. RUTA PARA APUESTAS EN LOTE (POST /bet/batch)
+# ----------------------------------------------------
+@functools.lru_cache(maxsize=None)
+def _numpy():
+    """NumPy, importado en el primer /bet/batch (no al arrancar el worker), o None si no está instalado."""
+    try:
+        import numpy
+    except ImportError:  # NumPy es opcional: sin él las tiradas en lote usan random
+        return None
+    return numpy
+
+def tirar_dados(rondas, seed=None):
+    """
+    Tira los dos dados de todas las rondas de una vez y devuelve (dados1, dados2) como listas.
+    Con la misma seed se repiten las tiradas (la secuencia de NumPy y la de random son distintas).
+    """
+    np = _numpy()
+    if np is not None:
+        tiradas = np.random.default_rng(seed).integers(1, 7, size=(2, rondas))
+        return tiradas[0].tolist(), tiradas[1].tolist()
+    caras = random.Random(seed).choices(range(1, 7), k=2 * rondas)
+    return caras[:rondas], caras[rondas:]
+
+@app.route('/bet/batch', methods=['POST'])
+def handle_bet_batch():
+    """
+    Procesa N apuestas seguidas: {"amounts": [...]} o {"amount": x, "rounds": n}, y opcionalmente "seed".
+    Las rondas se aplican en orden; la que supera el balance de ese momento se rechaza ('R')
+    y la serie sigue. Resultado compacto: una letra por ronda (W/L/R) y el balance final.
+    """
+    error_rondas = f"El lote debe tener entre 1 y {MAX_RONDAS_LOTE} rondas."
+    try:
+        data = request.get_json()
+        # El tamaño se comprueba antes de construir la lista (rounds enorme = memoria enorme)
+        if 'amounts' in data:
+            if not isinstance(data['amounts'], list) or not 1 <= len(data['amounts']) <= MAX_RONDAS_LOTE:
+                return jsonify({"status": "error", "error": error_rondas}), 400
+            amounts = [float(a) for a in data['amounts']]
+        else:
+            rounds = int(data.get('rounds', 1))
+            if not 1 <= rounds <= MAX_RONDAS_LOTE:
+                return jsonify({"status": "error", "error": error_rondas}), 400
+            amounts = [float(data.get('amount', 0))] * rounds
+        seed = data.get('seed')
+        seed = None if seed is None else int(seed)
+    except Exception:
+        return jsonify({"status": "error", "error": "Lote de apuestas inválido."}), 400
+
+    try:
+        user_id = obtener_user_id(data)
+    except ValueError as e:
+        return jsonify({"status": "error", "error": str(e)}), 400
+
+    if any(amount <= 0 for amount in amounts):
+        return jsonify({"status": "error", "error": "Apuesta inválida o saldo insuficiente."}), 400
+
+    # Misma regla que /bet: gana si la suma es 7 u 11 (paga 1:1)
+    dice1, dice2 = tirar_dados(len(amounts), seed)
+    winners = [d1 + d2 in (7, 11) for d1, d2 in zip(dice1, dice2)]
+
+    try:
+        accepted, new_balance = escribir('aplicar_lote_dados', user_id, amounts, winners)
+    except ValueError as e:
+        return jsonify({"status": "error", "error": str(e)}), 400
+
+    results = "".join(("W" if win else "L") if ok else "R" for ok, win in zip(accepted, winners))
+    # Redondeado al céntimo, como se guarda el balance
+    profit = round(sum((amount if win else -amount) for amount, win, ok in zip(amounts, winners, accepted) if ok), 2)
+    return jsonify({
+        "status": "success",
+        "new_balance": new_balance,
+        "rounds": len(amounts),
+        "accepted": sum(accepted),
+        "profit": profit,
+        "dice1": dice1,
+        "dice2": dice2,
+        "results": results
+    })
+
 # ----------------------------------------------------
 # RUTAS DE DIAGNÓSTICO
 # ----------------------------------------------------
@@ -101,7 +244,7 @@ def home():
         "status": "success",
         "service": app_name,
         "message": message,
-        "routes": ["/balance", "/reset", "/bet"]
+        "routes": ["/balance", "/reset", "/bet", "/bet/batch", "/metrics"]
     }
     return jsonify(response)
 
@@ -0,0 +1,210 @@
+"""
+Instrumentación de la Casa de Apuestas: latencia por ruta, conteo y latencia por
+sentencia SQL, consultas por petición (para ver patrones N+1), log de consultas
+lentas y perfilado cProfile opcional por petición. Todo se publica en /metrics
+en el formato de texto de Prometheus, sin dependencias externas.
+
+Pensado para dejarlo activo en producción: medir una sentencia cuesta dos
+perf_counter() y una suma bajo un lock (ver benchmarks/bench_metricas.py).
+
+Variables de entorno:
+  CASA_METRICAS=0          desactiva la instrumentación del cursor SQL
+  CASA_SQL_LENTA_MS=100    umbral del log de consultas lentas (logger 'casa_apuestas.sql')
+  CASA_PERFILAR=1          permite ?perfilar=1 para volcar un .prof de esa petición
+  CASA_PERFIL_DIR=perfiles carpeta de los .prof
+
+Las métricas son por proceso: con varios workers cada uno expone las suyas
+(la serie casa_proceso_info lleva el pid para distinguirlas).
+"""
+import cProfile
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+ACTIVAS = os.environ.get('CASA_METRICAS', '1') != '0'
+UMBRAL_SQL_LENTA = float(os.environ.get('CASA_SQL_LENTA_MS', 100)) / 1000.0
+PERFILADO_PERMITIDO = os.environ.get('CASA_PERFILAR') == '1'
+DIRECTORIO_PERFILES = os.environ.get('CASA_PERFIL_DIR', 'perfiles')
+
+# Límites de los buckets en segundos (peticiones y SQL) y en número de consultas
+BUCKETS_SEGUNDOS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+BUCKETS_CONSULTAS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+# Largo máximo de la etiqueta de una sentencia SQL (las sentencias usan '?' como parámetros)
+LARGO_ETIQUETA_SQL = 120
+
+log_sql = logging.getLogger('casa_apuestas.sql')
+log = logging.getLogger('casa_apuestas.metricas')
+
+
+def _escapar(valor):
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class Histograma:
+    """Histograma acumulativo con etiquetas, al estilo Prometheus. Seguro entre hilos."""
+
+    def __init__(self, nombre, ayuda, etiquetas, buckets=BUCKETS_SEGUNDOS):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiquetas = tuple(etiquetas)
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observar(self, valor, *valores_etiquetas):
+        with self._lock:
+            serie = self._series.get(valores_etiquetas)
+            if serie is None:
+                serie = self._series[valores_etiquetas] = [[0] * len(self.buckets), 0.0, 0]
+            for i, limite in enumerate(self.buckets):
+                if valor <= limite:
+                    serie[0][i] += 1
+                    break
+            serie[1] += valor
+            serie[2] += 1
+
+    def series(self):
+        """{valores_etiquetas: (conteo, suma)} (copia)."""
+        with self._lock:
+            return {clave: (serie[2], serie[1]) for clave, serie in self._series.items()}
+
+    def limpiar(self):
+        with self._lock:
+            self._series.clear()
+
+    def exponer(self):
+        with self._lock:
+            series = {clave: ([*serie[0]], serie[1], serie[2]) for clave, serie in self._series.items()}
+        lineas = [f"# HELP {self.nombre} {self.ayuda}", f"# TYPE {self.nombre} histogram"]
+        for valores, (conteos, suma, total) in sorted(series.items()):
+            base = ",".join(f'{k}="{_escapar(v)}"' for k, v in zip(self.etiquetas, valores))
+            separador = "," if base else ""
+            acumulado = 0
+            for limite, conteo in zip(self.buckets, conteos):
+                acumulado += conteo
+                lineas.append(f'{self.nombre}_bucket{{{base}{separador}le="{limite}"}} {acumulado}')
+            lineas.append(f'{self.nombre}_bucket{{{base}{separador}le="+Inf"}} {total}')
+            lineas.append(f'{self.nombre}_sum{{{base}}} {suma}')
+            lineas.append(f'{self.nombre}_count{{{base}}} {total}')
+        return "\n".join(lineas)
+
+
+duracion_peticiones = Histograma('casa_http_duracion_segundos', "Duración de las peticiones HTTP por ruta.",
+                                 ('servicio', 'metodo', 'ruta', 'estado'))
+duracion_sql = Histograma('casa_sql_duracion_segundos', "Duración de cada sentencia SQL (execute).",
+                          ('sentencia',))
+consultas_por_peticion = Histograma('casa_sql_consultas_por_peticion', "Sentencias SQL ejecutadas por petición.",
+                                    ('servicio', 'ruta'), BUCKETS_CONSULTAS)
+HISTOGRAMAS = (duracion_peticiones, duracion_sql, consultas_por_peticion)
+
+# Contador de sentencias de la petición en curso (por hilo)
+_peticion = threading.local()
+_etiquetas_sql = {}
+
+
+def etiqueta_sql(sql):
+    """Sentencia normalizada (espacios colapsados, recortada) para usar como etiqueta."""
+    etiqueta = _etiquetas_sql.get(sql)
+    if etiqueta is None:
+        etiqueta = " ".join(sql.split())[:LARGO_ETIQUETA_SQL]
+        if len(_etiquetas_sql) < 2048:
+            _etiquetas_sql[sql] = etiqueta
+    return etiqueta
+
+
+def registrar_sql(sql, duracion):
+    etiqueta = etiqueta_sql(sql)
+    duracion_sql.observar(duracion, etiqueta)
+    if getattr(_peticion, 'consultas', None) is not None:
+        _peticion.consultas += 1
+    if duracion >= UMBRAL_SQL_LENTA:
+        log_sql.warning("Consulta lenta (%.1f ms): %s", duracion * 1000, etiqueta)
+
+
+class CursorInstrumentado(sqlite3.Cursor):
+    """Cursor que mide cada execute/executemany (la primera fila incluida, no el resto del fetch)."""
+
+    def execute(self, sql, parametros=()):
+        inicio = time.perf_counter()
+        try:
+            return super().execute(sql, parametros)
+        finally:
+            registrar_sql(sql, time.perf_counter() - inicio)
+
+    def executemany(self, sql, secuencia):
+        inicio = time.perf_counter()
+        try:
+            return super().executemany(sql, secuencia)
+        finally:
+            registrar_sql(sql, time.perf_counter() - inicio)
+
+
+class ConexionInstrumentada(sqlite3.Connection):
+    """Conexión cuyos cursores (y conexion.execute) son CursorInstrumentado."""
+
+    def cursor(self, factory=CursorInstrumentado):
+        return super().cursor(factory)
+
+    def execute(self, sql, parametros=()):
+        return self.cursor().execute(sql, parametros)
+
+    def executemany(self, sql, secuencia):
+        return self.cursor().executemany(sql, secuencia)
+
+
+def fabrica_conexion():
+    """Clase de conexión para sqlite3.connect(factory=...) según CASA_METRICAS."""
+    return ConexionInstrumentada if ACTIVAS else sqlite3.Connection
+
+
+def exponer():
+    """Texto de /metrics (formato de exposición de Prometheus 0.0.4)."""
+    partes = [h.exponer() for h in HISTOGRAMAS]
+    partes.append("# HELP casa_proceso_info Proceso (worker) que atendió el scrape.\n"
+                  "# TYPE casa_proceso_info gauge\n"
+                  f'casa_proceso_info{{pid="{os.getpid()}"}} 1')
+    return "\n".join(partes) + "\n"
+
+
+def instrumentar_app(app, servicio):
+    """
+    Mide todas las rutas de una app Flask y añade GET /metrics.
+    La ruta se etiqueta con su patrón (/api/x/<id>), no con la URL, para acotar las series.
+    """
+    from flask import Response, g, request
+
+    @app.before_request
+    def _iniciar_medicion():
+        g._metricas_inicio = time.perf_counter()
+        _peticion.consultas = 0
+        if PERFILADO_PERMITIDO and request.args.get('perfilar') == '1':
+            g._metricas_perfil = cProfile.Profile()
+            g._metricas_perfil.enable()
+
+    @app.after_request
+    def _registrar_medicion(respuesta):
+        inicio = g.pop('_metricas_inicio', None)
+        if inicio is None:
+            return respuesta
+        ruta = request.url_rule.rule if request.url_rule is not None else 'sin_ruta'
+        duracion_peticiones.observar(time.perf_counter() - inicio, servicio, request.method, ruta,
+                                     str(respuesta.status_code))
+        consultas_por_peticion.observar(getattr(_peticion, 'consultas', 0) or 0, servicio, ruta)
+        _peticion.consultas = None
+        perfil = g.pop('_metricas_perfil', None)
+        if perfil is not None:
+            perfil.disable()
+            os.makedirs(DIRECTORIO_PERFILES, exist_ok=True)
+            destino = os.path.join(DIRECTORIO_PERFILES,
+                                   f"{servicio}_{ruta.strip('/').replace('/', '_') or 'raiz'}_{time.time_ns()}.prof")
+            perfil.dump_stats(destino)
+            log.info("Perfil de %s %s guardado en %s", request.method, request.path, destino)
+        return respuesta
+
+    @app.route('/metrics')
+    def metrics():
+        return Response(exponer(), mimetype='text/plain; version=0.0.4; charset=utf-8')
+
+    return app
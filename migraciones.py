@@ -0,0 +1,471 @@
+"""
+Migraciones versionadas del esquema de la Casa de Apuestas.
+
+La versión aplicada se guarda en ``PRAGMA user_version``. Cada paso se ejecuta
+una sola vez, en orden y dentro de su propia transacción, y todos son
+idempotentes (IF NOT EXISTS) para que una base creada con versiones antiguas
+del código se pueda migrar sin problemas. La 8 y la 9 reescriben tablas y no
+lo son: se apoyan en que la transacción las aplica enteras o no las aplica.
+"""
+import os
+import sqlite3
+
+
+def _v1_esquema_inicial(cursor):
+    # 1. Tabla de Apostadores
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS apostadores (
+            nombre TEXT PRIMARY KEY,
+            saldo REAL DEFAULT 0.0
+        )
+    """)
+
+    # 2. Tabla de Partidas Abiertas
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS partidas (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            nombre_equipo1 TEXT NOT NULL,
+            nombre_equipo2 TEXT NOT NULL,
+            total_apostado_e1 REAL DEFAULT 0.0,
+            total_apostado_e2 REAL DEFAULT 0.0,
+            equipo_ganador INTEGER, -- 1 o 2
+            estado TEXT DEFAULT 'Abierta', -- 'Abierta', 'Resuelta'
+            ganancia_casa REAL DEFAULT 0.0
+        )
+    """)
+
+    # 3. Tabla de Apuestas Abiertas
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS apuestas (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            partida_id INTEGER,
+            nombre_apostador TEXT,
+            monto REAL NOT NULL,
+            equipo_apostado INTEGER, -- 1 o 2
+            FOREIGN KEY(partida_id) REFERENCES partidas(id),
+            FOREIGN KEY(nombre_apostador) REFERENCES apostadores(nombre)
+        )
+    """)
+
+    # 4. Historial de Apuestas RESUELTAS
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS apuestas_historial (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            partida_id INTEGER,
+            equipo1 TEXT,
+            equipo2 TEXT,
+            apostador TEXT,
+            monto_apostado REAL NOT NULL,
+            monto_cobrado REAL DEFAULT 0.0, -- El pago total recibido (incluyendo la devolución de lo apostado)
+            equipo_apostado INTEGER,
+            equipo_ganador INTEGER -- 1 o 2
+        )
+    """)
+
+
+def _v2_indices_secundarios(cursor):
+    # Apuestas abiertas por partida y por equipo (index y resolver_partida)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_apuestas_partida_equipo ON apuestas(partida_id, equipo_apostado)")
+    # Totales por apostador en los reportes
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_historial_apostador ON apuestas_historial(apostador)")
+    # Borrado y detalle del historial por partida
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_historial_partida ON apuestas_historial(partida_id)")
+    # Filtros estado = 'Abierta' / 'Resuelta'
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_partidas_estado ON partidas(estado)")
+
+
+def _v3_tablas_resumen(cursor):
+    # Totales por apostador mantenidos de forma incremental (resolver/borrar)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS resumen_apostadores (
+            apostador TEXT PRIMARY KEY,
+            total_apostado REAL NOT NULL DEFAULT 0.0,
+            total_retornado REAL NOT NULL DEFAULT 0.0,
+            num_apuestas INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+    # Acumulado de la casa (una sola fila)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS resumen_casa (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            ganancia_total REAL NOT NULL DEFAULT 0.0,
+            partidas_resueltas INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+    _recalcular_resumenes_v3(cursor)
+
+
+def _recalcular_resumenes_v3(cursor):
+    # Versión congelada para el esquema de la migración 3 (nombres y montos REAL);
+    # la actual es recalcular_resumenes, más abajo.
+    cursor.execute("DELETE FROM resumen_apostadores")
+    cursor.execute("""
+        INSERT INTO resumen_apostadores (apostador, total_apostado, total_retornado, num_apuestas)
+        SELECT apostador, COALESCE(SUM(monto_apostado), 0.0), COALESCE(SUM(monto_cobrado), 0.0), COUNT(*)
+        FROM apuestas_historial
+        GROUP BY apostador
+    """)
+    cursor.execute("""
+        INSERT OR REPLACE INTO resumen_casa (id, ganancia_total, partidas_resueltas)
+        SELECT 1, COALESCE(SUM(ganancia_casa), 0.0), COUNT(*)
+        FROM partidas WHERE estado = 'Resuelta'
+    """)
+
+
+def _agregar_columna(cursor, tabla, columna, definicion):
+    """ALTER TABLE ... ADD COLUMN solo si la columna no existe (ADD COLUMN no admite IF NOT EXISTS)."""
+    columnas = {fila[1] for fila in cursor.execute(f"PRAGMA table_info({tabla})").fetchall()}
+    if columna not in columnas:
+        cursor.execute(f"ALTER TABLE {tabla} ADD COLUMN {columna} {definicion}")
+
+
+def _v4_fechas_y_paginacion(cursor):
+    # Fecha de resolución (UTC, 'YYYY-MM-DD HH:MM:SS') para filtrar reportes por rango.
+    # Las filas anteriores a esta migración quedan con NULL.
+    _agregar_columna(cursor, 'partidas', 'fecha_resolucion', 'TEXT')
+    _agregar_columna(cursor, 'apuestas_historial', 'fecha', 'TEXT')
+    # Paginación keyset del detalle: (partida_id, id) global y por apostador
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_historial_apostador_partida ON apuestas_historial(apostador, partida_id)")
+    cursor.execute("DROP INDEX IF EXISTS idx_historial_apostador")  # cubierto por el anterior
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_historial_fecha ON apuestas_historial(fecha)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_partidas_estado_fecha ON partidas(estado, fecha_resolucion)")
+
+
+def _v5_versiones_datos(cursor):
+    # Contadores que suben con cada escritura que cambia los reportes; sirven de
+    # clave para la caché de reportes y los ETag (compartidos entre workers).
+    #   historial: resolver/borrar/archivar partidas   saldos: cualquier cambio de saldo
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS versiones_datos (
+            nombre TEXT PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+    cursor.execute("INSERT OR IGNORE INTO versiones_datos (nombre, version) VALUES ('historial', 0), ('saldos', 0)")
+
+
+def _v6_saldos_dados(cursor):
+    # Saldos del servicio de dados (main.py) por usuario, compartidos entre workers
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS usuarios_dados (
+            user_id TEXT PRIMARY KEY,
+            balance REAL NOT NULL DEFAULT 100.0
+        )
+    """)
+
+
+def _v7_eventos(cursor):
+    # Bandeja de eventos para el stream SSE (/eventos): se escribe en la misma
+    # transacción que la operación y cada worker la lee por id creciente.
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS eventos (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            tipo TEXT NOT NULL,
+            datos TEXT NOT NULL,
+            fecha TEXT NOT NULL DEFAULT (datetime('now'))
+        )
+    """)
+
+
+def _centimos(expresion):
+    return f"CAST(ROUND(COALESCE({expresion}, 0) * 100) AS INTEGER)"
+
+
+def _secuencia(cursor, tabla):
+    fila = cursor.execute("SELECT seq FROM sqlite_sequence WHERE name = ?", (tabla,)).fetchone()
+    return fila[0] if fila else 0
+
+
+def _fijar_secuencia(cursor, tabla, minimo):
+    """Deja el AUTOINCREMENT de tabla en al menos minimo: los ids borrados o archivados no se reutilizan."""
+    cursor.execute("UPDATE sqlite_sequence SET seq = MAX(seq, ?) WHERE name = ?", (minimo, tabla))
+    if cursor.rowcount == 0 and minimo:
+        cursor.execute("INSERT INTO sqlite_sequence (name, seq) VALUES (?, ?)", (tabla, minimo))
+
+
+def _v8_claves_enteras_y_centimos(cursor):
+    # Montos en céntimos (INTEGER) y apostadores con id entero. El historial guarda
+    # solo enteros: apostador_id y partida_id (equipos, ganador y fecha salen de la
+    # partida, que se archiva y se borra junto con su historial). Las columnas REAL
+    # de antes quedan como columnas generadas VIRTUAL (no ocupan espacio) y
+    # apuestas_historial pasa a ser una vista con las columnas de siempre, así que
+    # las lecturas no cambian; las escrituras van a las columnas *_cent y a historial.
+    # Las páginas de las tablas viejas quedan libres en el archivo: se reutilizan, o
+    # se devuelven al disco con VACUUM (python migraciones.py ruta.db --compactar).
+    huerfanas = cursor.execute("""
+        SELECT COUNT(*) FROM apuestas_historial h WHERE NOT EXISTS (SELECT 1 FROM partidas p WHERE p.id = h.partida_id)
+    """).fetchone()[0]
+    if huerfanas:
+        raise sqlite3.IntegrityError(f"{huerfanas} filas de apuestas_historial sin su partida; "
+                                     f"no se pueden migrar sin perder los nombres de los equipos.")
+
+    cursor.execute("""
+        CREATE TABLE apostadores_nueva (
+            id INTEGER PRIMARY KEY,
+            nombre TEXT NOT NULL UNIQUE,
+            saldo REAL GENERATED ALWAYS AS (saldo_cent / 100.0) VIRTUAL,
+            saldo_cent INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+    cursor.execute(f"INSERT INTO apostadores_nueva (nombre, saldo_cent) SELECT nombre, {_centimos('saldo')} "
+                   f"FROM apostadores ORDER BY rowid")
+    # Apuestas de nombres que no están en apostadores (no debería haberlas): se les da alta con saldo 0
+    cursor.execute("""
+        INSERT OR IGNORE INTO apostadores_nueva (nombre)
+        SELECT nombre_apostador FROM apuestas UNION SELECT apostador FROM apuestas_historial
+    """)
+
+    cursor.execute("""
+        CREATE TABLE partidas_nueva (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            nombre_equipo1 TEXT NOT NULL,
+            nombre_equipo2 TEXT NOT NULL,
+            total_apostado_e1 REAL GENERATED ALWAYS AS (total_e1_cent / 100.0) VIRTUAL,
+            total_apostado_e2 REAL GENERATED ALWAYS AS (total_e2_cent / 100.0) VIRTUAL,
+            equipo_ganador INTEGER, -- 1 o 2
+            estado TEXT DEFAULT 'Abierta', -- 'Abierta', 'Resuelta'
+            ganancia_casa REAL GENERATED ALWAYS AS (ganancia_casa_cent / 100.0) VIRTUAL,
+            fecha_resolucion TEXT,
+            total_e1_cent INTEGER NOT NULL DEFAULT 0,
+            total_e2_cent INTEGER NOT NULL DEFAULT 0,
+            ganancia_casa_cent INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+    cursor.execute(f"""
+        INSERT INTO partidas_nueva (id, nombre_equipo1, nombre_equipo2, equipo_ganador, estado, fecha_resolucion,
+                                    total_e1_cent, total_e2_cent, ganancia_casa_cent)
+        SELECT id, nombre_equipo1, nombre_equipo2, equipo_ganador, estado, fecha_resolucion,
+               {_centimos('total_apostado_e1')}, {_centimos('total_apostado_e2')}, {_centimos('ganancia_casa')}
+        FROM partidas
+    """)
+
+    cursor.execute("""
+        CREATE TABLE apuestas_nueva (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            partida_id INTEGER,
+            apostador_id INTEGER,
+            monto REAL GENERATED ALWAYS AS (monto_cent / 100.0) VIRTUAL,
+            equipo_apostado INTEGER, -- 1 o 2
+            monto_cent INTEGER NOT NULL,
+            FOREIGN KEY(partida_id) REFERENCES partidas(id),
+            FOREIGN KEY(apostador_id) REFERENCES apostadores(id)
+        )
+    """)
+    cursor.execute(f"""
+        INSERT INTO apuestas_nueva (id, partida_id, apostador_id, equipo_apostado, monto_cent)
+        SELECT ap.id, ap.partida_id, a.id, ap.equipo_apostado, {_centimos('ap.monto')}
+        FROM apuestas ap JOIN apostadores_nueva a ON a.nombre = ap.nombre_apostador
+    """)
+
+    cursor.execute("""
+        CREATE TABLE historial (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            partida_id INTEGER NOT NULL,
+            apostador_id INTEGER NOT NULL,
+            monto_apostado_cent INTEGER NOT NULL,
+            monto_cobrado_cent INTEGER NOT NULL DEFAULT 0, -- pago total (incluye la devolución de lo apostado)
+            equipo_apostado INTEGER,
+            FOREIGN KEY(partida_id) REFERENCES partidas(id),
+            FOREIGN KEY(apostador_id) REFERENCES apostadores(id)
+        )
+    """)
+    cursor.execute(f"""
+        INSERT INTO historial (id, partida_id, apostador_id, monto_apostado_cent, monto_cobrado_cent, equipo_apostado)
+        SELECT h.id, h.partida_id, a.id, {_centimos('h.monto_apostado')}, {_centimos('h.monto_cobrado')}, h.equipo_apostado
+        FROM apuestas_historial h JOIN apostadores_nueva a ON a.nombre = h.apostador
+        ORDER BY h.id
+    """)
+
+    secuencias = {tabla: _secuencia(cursor, tabla) for tabla in ('partidas', 'apuestas', 'apuestas_historial')}
+    for tabla in ('apuestas_historial', 'apuestas', 'partidas', 'apostadores', 'resumen_apostadores', 'resumen_casa'):
+        cursor.execute(f"DROP TABLE {tabla}")
+    for tabla in ('apostadores', 'partidas', 'apuestas'):
+        cursor.execute(f"ALTER TABLE {tabla}_nueva RENAME TO {tabla}")
+    _fijar_secuencia(cursor, 'partidas', secuencias['partidas'])
+    _fijar_secuencia(cursor, 'apuestas', secuencias['apuestas'])
+    _fijar_secuencia(cursor, 'historial', secuencias['apuestas_historial'])
+
+    cursor.execute("CREATE INDEX idx_apuestas_partida_equipo ON apuestas(partida_id, equipo_apostado)")
+    cursor.execute("CREATE INDEX idx_partidas_estado ON partidas(estado)")
+    cursor.execute("CREATE INDEX idx_partidas_estado_fecha ON partidas(estado, fecha_resolucion)")
+    cursor.execute("CREATE INDEX idx_historial_partida ON historial(partida_id)")
+    cursor.execute("CREATE INDEX idx_historial_apostador_partida ON historial(apostador_id, partida_id)")
+
+    # Mismas columnas (y orden) que la antigua tabla apuestas_historial
+    cursor.execute("""
+        CREATE VIEW apuestas_historial AS
+        SELECT h.id, h.partida_id, p.nombre_equipo1 AS equipo1, p.nombre_equipo2 AS equipo2, a.nombre AS apostador,
+               h.monto_apostado_cent / 100.0 AS monto_apostado, h.monto_cobrado_cent / 100.0 AS monto_cobrado,
+               h.equipo_apostado, p.equipo_ganador, p.fecha_resolucion AS fecha
+        FROM historial h
+        JOIN partidas p ON p.id = h.partida_id
+        JOIN apostadores a ON a.id = h.apostador_id
+    """)
+
+    cursor.execute("""
+        CREATE TABLE resumen_apostadores (
+            apostador_id INTEGER PRIMARY KEY,
+            total_apostado_cent INTEGER NOT NULL DEFAULT 0,
+            total_retornado_cent INTEGER NOT NULL DEFAULT 0,
+            num_apuestas INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE resumen_casa (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            ganancia_total_cent INTEGER NOT NULL DEFAULT 0,
+            partidas_resueltas INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+    recalcular_resumenes(cursor)
+    cursor.execute("UPDATE versiones_datos SET version = version + 1")
+
+
+def _v9_saldos_dados_centimos(cursor):
+    # Los saldos del servicio de dados también pasan a céntimos; balance queda como
+    # columna generada VIRTUAL para las lecturas, como saldo en apostadores.
+    cursor.execute("""
+        CREATE TABLE usuarios_dados_nueva (
+            user_id TEXT PRIMARY KEY,
+            balance REAL GENERATED ALWAYS AS (balance_cent / 100.0) VIRTUAL,
+            balance_cent INTEGER NOT NULL DEFAULT 10000
+        )
+    """)
+    cursor.execute(f"INSERT INTO usuarios_dados_nueva (user_id, balance_cent) "
+                   f"SELECT user_id, {_centimos('balance')} FROM usuarios_dados")
+    cursor.execute("DROP TABLE usuarios_dados")
+    cursor.execute("ALTER TABLE usuarios_dados_nueva RENAME TO usuarios_dados")
+
+
+def recalcular_resumenes(cursor):
+    """Rellena las tablas de resumen desde cero a partir del historial y las partidas resueltas."""
+    cursor.execute("DELETE FROM resumen_apostadores")
+    cursor.execute("""
+        INSERT INTO resumen_apostadores (apostador_id, total_apostado_cent, total_retornado_cent, num_apuestas)
+        SELECT apostador_id, SUM(monto_apostado_cent), SUM(monto_cobrado_cent), COUNT(*)
+        FROM historial
+        GROUP BY apostador_id
+    """)
+    cursor.execute("""
+        INSERT OR REPLACE INTO resumen_casa (id, ganancia_total_cent, partidas_resueltas)
+        SELECT 1, COALESCE(SUM(ganancia_casa_cent), 0), COUNT(*)
+        FROM partidas WHERE estado = 'Resuelta'
+    """)
+
+
+# Lista ORDENADA de (versión, descripción, función). Nunca reordenar ni borrar
+# pasos ya publicados: los cambios nuevos se añaden siempre al final.
+MIGRACIONES = [
+    (1, "Esquema inicial", _v1_esquema_inicial),
+    (2, "Índices secundarios", _v2_indices_secundarios),
+    (3, "Tablas de resumen por apostador y de la casa", _v3_tablas_resumen),
+    (4, "Fechas de resolución e índices para paginar reportes", _v4_fechas_y_paginacion),
+    (5, "Contadores de versión de datos para la caché de reportes", _v5_versiones_datos),
+    (6, "Saldos por usuario del servicio de dados", _v6_saldos_dados),
+    (7, "Bandeja de eventos para las actualizaciones en tiempo real", _v7_eventos),
+    (8, "Claves enteras de apostadores, historial compacto y montos en céntimos", _v8_claves_enteras_y_centimos),
+    (9, "Saldos del servicio de dados en céntimos", _v9_saldos_dados_centimos),
+]
+
+VERSION_ACTUAL = MIGRACIONES[-1][0]
+
+
+def obtener_version(conexion):
+    """Devuelve la versión del esquema guardada en PRAGMA user_version."""
+    return conexion.execute("PRAGMA user_version").fetchone()[0]
+
+
+def aplicar_migraciones(conexion, hasta=None):
+    """
+    Aplica en orden las migraciones pendientes (hasta la versión indicada, por defecto
+    todas) y devuelve la lista de versiones aplicadas.
+    Es seguro llamarla desde varios procesos a la vez: cada paso toma el bloqueo
+    de escritura (BEGIN IMMEDIATE) y vuelve a comprobar la versión antes de ejecutarse.
+    """
+    aplicadas = []
+    if conexion.in_transaction:
+        conexion.commit()
+    for version, _descripcion, paso in MIGRACIONES:
+        if hasta is not None and version > hasta:
+            break
+        if obtener_version(conexion) >= version:
+            continue
+        cursor = conexion.cursor()
+        cursor.execute("BEGIN IMMEDIATE")
+        try:
+            if obtener_version(conexion) >= version:
+                conexion.rollback()
+                continue
+            paso(cursor)
+            cursor.execute(f"PRAGMA user_version = {int(version)}")
+            conexion.commit()
+        except sqlite3.Error:
+            conexion.rollback()
+            raise
+        aplicadas.append(version)
+    return aplicadas
+
+
+# --- VERIFICACIÓN DE PLANES DE CONSULTA ---
+
+# Consultas calientes que nunca deberían recorrer una tabla completa.
+CONSULTAS_CRITICAS = {
+    'apuestas_partida': ("SELECT * FROM apuestas WHERE partida_id = ?", (1,)),
+    'apuestas_partida_equipo': (
+        "SELECT apostador_id, monto_cent FROM apuestas WHERE partida_id = ? AND equipo_apostado = ?", (1, 1)),
+    'historial_por_apostador': (
+        "SELECT SUM(monto_apostado) FROM apuestas_historial WHERE apostador = ?", ('x',)),
+    'historial_por_partida': ("SELECT * FROM apuestas_historial WHERE partida_id = ?", (1,)),
+    'resumen_por_partida': (
+        "SELECT apostador_id, SUM(monto_cobrado_cent) FROM historial WHERE partida_id = ? GROUP BY apostador_id", (1,)),
+    'partidas_resueltas': ("SELECT * FROM partidas WHERE estado = 'Resuelta'", ()),
+    'partidas_abiertas': ("SELECT * FROM partidas WHERE estado = 'Abierta'", ()),
+    'detalle_pagina_keyset': (
+        "SELECT * FROM apuestas_historial WHERE partida_id <= ? AND (partida_id < ? OR id < ?) "
+        "ORDER BY partida_id DESC, id DESC LIMIT 50", (1, 1, 1)),
+    'detalle_pagina_apostador': (
+        "SELECT * FROM apuestas_historial WHERE apostador = ? AND partida_id <= ? AND (partida_id < ? OR id < ?) "
+        "ORDER BY partida_id DESC, id DESC LIMIT 50", ('x', 1, 1, 1)),
+}
+
+
+def plan_consulta(conexion, sql, parametros=()):
+    """Devuelve las líneas de EXPLAIN QUERY PLAN de una consulta."""
+    filas = conexion.execute(f"EXPLAIN QUERY PLAN {sql}", parametros).fetchall()
+    return [fila[3] for fila in filas]
+
+
+def consultas_con_escaneo(conexion, consultas=None):
+    """
+    Devuelve {nombre: plan} con las consultas cuyo plan hace un SCAN (recorrido completo).
+    Un diccionario vacío significa que todas usan índices.
+    """
+    consultas = CONSULTAS_CRITICAS if consultas is None else consultas
+    con_escaneo = {}
+    for nombre, (sql, parametros) in consultas.items():
+        plan = plan_consulta(conexion, sql, parametros)
+        if any(linea.startswith('SCAN') for linea in plan):
+            con_escaneo[nombre] = plan
+    return con_escaneo
+
+
+if __name__ == "__main__":
+    import sys
+
+    # Uso: python migraciones.py [ruta.db] [--compactar]
+    argumentos = [a for a in sys.argv[1:] if a != '--compactar']
+    db = argumentos[0] if argumentos else 'casa_apuestas.db'
+    con = sqlite3.connect(db)
+    print(f"Versión antes: {obtener_version(con)}")
+    print(f"Migraciones aplicadas: {aplicar_migraciones(con) or 'ninguna'}")
+    print(f"Versión actual: {obtener_version(con)}")
+    if '--compactar' in sys.argv:
+        # Devuelve al disco las páginas libres (p. ej. las de las tablas reescritas por la migración 8).
+        # Reescribe el archivo entero y bloquea a los escritores mientras dura.
+        antes = os.path.getsize(db)
+        con.execute("VACUUM")
+        print(f"Compactada: {antes / 1e6:.1f} MB -> {os.path.getsize(db) / 1e6:.1f} MB")
+    escaneos = consultas_con_escaneo(con)
+    for nombre, plan in escaneos.items():
+        print(f"[AVISO] {nombre} hace un recorrido completo: {plan}")
+    con.close()
@@ -0,0 +1,205 @@
+"""
+Copia de la base para los reportes pesados (opcional, CASA_REPLICA_REPORTES=1).
+
+/reportes y las exportaciones recorren el historial completo. Con la copia activa
+leen de un archivo aparte (por defecto <base>_reportes.db) que un hilo de fondo
+rehace cada CASA_REPLICA_INTERVALO segundos con la API de backup de SQLite: una
+sola transacción de lectura sobre la base viva (en WAL no frena a los escritores)
+copiada a un temporal que luego sustituye al anterior con os.replace. Así las
+lecturas largas de los reportes no compiten con las apuestas ni retienen el
+checkpoint del WAL de la base viva.
+
+La copia nunca se usa con más de CASA_REPLICA_MAX_ANTIGUEDAD segundos: si el
+hilo de fondo se retrasa, la petición la rehace antes de leer. Con varios workers,
+un archivo de bloqueo evita que copien todos a la vez (el primero copia y el
+resto ve la copia recién hecha). La fecha de la copia es la fecha de
+modificación del archivo y se muestra en /reportes.
+
+    python replica_reportes.py [ruta.db] [--destino copia.db] [--cada SEGUNDOS]
+"""
+import contextlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+from casa_apuestas import CasaDeApuestas
+
+try:
+    import fcntl
+except ImportError:  # Windows (app de escritorio, un solo proceso): basta el lock entre hilos
+    fcntl = None
+
+log = logging.getLogger('casa_apuestas.replica')
+
+ACTIVA = os.environ.get('CASA_REPLICA_REPORTES') == '1'
+# Cada cuántos segundos se rehace la copia en segundo plano
+INTERVALO = float(os.environ.get('CASA_REPLICA_INTERVALO', 60))
+# Antigüedad máxima admitida al leer; por encima se rehace en la propia petición
+MAX_ANTIGUEDAD = float(os.environ.get('CASA_REPLICA_MAX_ANTIGUEDAD', 300))
+
+
+def ruta_por_defecto(db_name):
+    """CASA_REPLICA_RUTA o <base>_reportes.db junto a la base viva."""
+    raiz, extension = os.path.splitext(db_name)
+    return os.environ.get('CASA_REPLICA_RUTA') or f"{raiz}_reportes{extension or '.db'}"
+
+
+def copiar_instantanea(db_name, destino):
+    """
+    Copia consistente de db_name en destino (reemplazo atómico). Devuelve la hora
+    (time.time()) de la foto, que queda también como fecha de modificación del archivo.
+    """
+    temporal = f"{destino}.tmp-{os.getpid()}-{threading.get_ident()}"
+    inicio = time.time()
+    try:
+        origen = sqlite3.connect(db_name, timeout=30.0)
+        copia = sqlite3.connect(temporal)
+        try:
+            # pages=-1: todo en un paso, es decir, una única foto de la base viva
+            origen.backup(copia)
+            # La copia solo se lee: journal clásico, sin -wal/-shm que arrastrar
+            copia.execute("PRAGMA journal_mode = DELETE")
+        finally:
+            copia.close()
+            origen.close()
+        os.utime(temporal, (inicio, inicio))
+        os.replace(temporal, destino)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.remove(temporal)
+        raise
+    return inicio
+
+
+class ReplicaReportes:
+    """Copia de solo lectura para los reportes, con una CasaDeApuestas por hilo sobre ella."""
+
+    def __init__(self, db_name, ruta=None, intervalo=None, max_antiguedad=None, perfil=None):
+        self.db_name = db_name
+        self.ruta = ruta or ruta_por_defecto(db_name)
+        self.intervalo = INTERVALO if intervalo is None else intervalo
+        self.max_antiguedad = MAX_ANTIGUEDAD if max_antiguedad is None else max_antiguedad
+        if self.max_antiguedad < self.intervalo:
+            raise ValueError("La antigüedad máxima no puede ser menor que el intervalo de copia.")
+        self.perfil = perfil
+        self.copias = 0
+        self.ultima_duracion = None
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._parar = threading.Event()
+        self._hilo = None
+        self._pid = os.getpid()
+
+    def copiada_en(self):
+        """time.time() de la copia actual, o None si aún no hay copia."""
+        try:
+            return os.stat(self.ruta).st_mtime
+        except FileNotFoundError:
+            return None
+
+    def antiguedad(self):
+        copiada = self.copiada_en()
+        return None if copiada is None else max(0.0, time.time() - copiada)
+
+    def refrescar(self, forzar=False, antiguedad_minima=None):
+        """
+        Rehace la copia si tiene al menos antiguedad_minima segundos (por defecto el
+        intervalo) o si forzar. Devuelve True si copió este proceso.
+        """
+        antiguedad_minima = self.intervalo if antiguedad_minima is None else antiguedad_minima
+        with self._lock, self._bloqueo_entre_procesos():
+            # Otro worker pudo rehacerla mientras se esperaba el bloqueo
+            antiguedad = self.antiguedad()
+            if not forzar and antiguedad is not None and antiguedad < antiguedad_minima:
+                return False
+            inicio = time.perf_counter()
+            copiar_instantanea(self.db_name, self.ruta)
+            self.ultima_duracion = time.perf_counter() - inicio
+            self.copias += 1
+            log.info("Copia para reportes rehecha en %.2f s (%s)", self.ultima_duracion, self.ruta)
+            return True
+
+    def obtener(self):
+        """
+        CasaDeApuestas de solo lectura sobre la copia vigente para este hilo.
+        Rehace antes la copia si falta o supera la antigüedad máxima; si falla y hay
+        una copia anterior, se usa esa (queda en el log).
+        """
+        antiguedad = self.antiguedad()
+        if antiguedad is None or antiguedad > self.max_antiguedad:
+            try:
+                self.refrescar(antiguedad_minima=self.max_antiguedad)
+            except (sqlite3.Error, OSError) as e:
+                if self.copiada_en() is None:
+                    raise
+                log.exception("No se pudo rehacer la copia para reportes; se usa la anterior: %s", e)
+        inodo = os.stat(self.ruta).st_ino
+        actual = getattr(self._local, 'casa', None)
+        if actual is not None and self._local.inodo == inodo:
+            return actual
+        if actual is not None:
+            # La copia se reemplazó: la conexión vieja sigue leyendo el archivo anterior
+            actual.cerrar_conexion()
+        self._local.casa = CasaDeApuestas(self.ruta, self.perfil, solo_lectura=True)
+        self._local.inodo = inodo
+        return self._local.casa
+
+    def iniciar(self):
+        """Arranca (una vez por proceso) el hilo que rehace la copia cada intervalo."""
+        with self._lock:
+            if self._pid != os.getpid():
+                # Tras un fork el hilo del padre no existe en el hijo
+                self._hilo, self._pid, self._local = None, os.getpid(), threading.local()
+                self._parar = threading.Event()
+            if self._hilo is None:
+                self._hilo = threading.Thread(target=self._ciclo, name='replica-reportes', daemon=True)
+                self._hilo.start()
+
+    def detener(self):
+        self._parar.set()
+        if self._hilo is not None:
+            self._hilo.join()
+        self._hilo = None
+
+    # --- Internos ---
+
+    @contextlib.contextmanager
+    def _bloqueo_entre_procesos(self):
+        if fcntl is None:
+            yield
+            return
+        with open(f"{self.ruta}.lock", 'a') as archivo:
+            fcntl.flock(archivo, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(archivo, fcntl.LOCK_UN)
+
+    def _ciclo(self):
+        while not self._parar.is_set():
+            try:
+                self.refrescar()
+            except (sqlite3.Error, OSError) as e:
+                log.exception("Error rehaciendo la copia para reportes: %s", e)
+            antiguedad = self.antiguedad() or 0.0
+            self._parar.wait(max(0.5, self.intervalo - antiguedad))
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Rehace la copia de la base para los reportes.")
+    parser.add_argument('db', nargs='?', default='casa_apuestas.db')
+    parser.add_argument('--destino', help="archivo de la copia (por defecto <base>_reportes.db)")
+    parser.add_argument('--cada', type=float, help="repetir cada tantos segundos (si falta, una sola copia)")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s [%(name)s] %(message)s")
+
+    replica = ReplicaReportes(args.db, args.destino, intervalo=args.cada or 0.0,
+                              max_antiguedad=max(args.cada or 0.0, MAX_ANTIGUEDAD))
+    replica.refrescar(forzar=True)
+    while args.cada:
+        time.sleep(max(0.5, args.cada - (replica.antiguedad() or 0.0)))
+        replica.refrescar()
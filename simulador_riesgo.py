@@ -0,0 +1,230 @@
+"""
+Simulador de riesgo de las partidas abiertas.
+
+Proyecta, antes de resolverlas, lo que pasaría con las partidas abiertas según
+el reparto parimutuel de resolver_partida: la casa se queda con el 25% del pozo
+perdedor y los ganadores se reparten su apuesta más el 75% restante.
+
+Cada partida tiene solo dos resultados, así que casi todo sale en forma cerrada:
+ganancia esperada de la casa, varianza, mínimo/máximo posibles y, por apostador,
+neto esperado, peor y mejor caso. Los percentiles de la ganancia de la casa y de
+los pagos totales salen de un Monte Carlo vectorizado con NumPy (por bloques, con
+memoria acotada); sin NumPy se usa la aproximación normal (suma de miles de
+partidas independientes).
+
+    python simulador_riesgo.py casa_apuestas.db --simulaciones 20000 --modelo pozo
+"""
+import functools
+import math
+from statistics import NormalDist
+
+from casa_apuestas import COMISION_CASA_PCT, COMISION_GANADORES_PCT
+
+# 'pozo': probabilidad implícita del mercado (pozo del equipo / pozo total); 'uniforme': 50%
+MODELOS_PROBABILIDAD = ('pozo', 'uniforme')
+METODOS = ('auto', 'montecarlo', 'normal')
+PERCENTILES = (1, 5, 50, 95, 99)
+# Tamaño máximo (partidas x simulaciones) de cada bloque del Monte Carlo
+ELEMENTOS_POR_BLOQUE = 2_000_000
+
+
+@functools.lru_cache(maxsize=None)
+def _numpy():
+    """NumPy, importado en la primera simulación (no al arrancar la app), o None si no está instalado."""
+    try:
+        import numpy
+    except ImportError:  # NumPy es opcional: sin él los percentiles salen de la aproximación normal
+        return None
+    return numpy
+
+
+def cargar_partidas_abiertas(casa):
+    """Partidas abiertas con sus pozos y las apuestas agregadas por (partida, apostador, equipo)."""
+    partidas = casa.cursor.execute("""
+        SELECT id, nombre_equipo1, nombre_equipo2, total_apostado_e1, total_apostado_e2
+        FROM partidas WHERE estado = 'Abierta'
+        ORDER BY id
+    """).fetchall()
+    apuestas = casa.cursor.execute("""
+        SELECT a.partida_id, ap.nombre AS nombre_apostador, a.equipo_apostado, SUM(a.monto_cent) / 100.0 AS monto
+        FROM apuestas a JOIN partidas p ON p.id = a.partida_id JOIN apostadores ap ON ap.id = a.apostador_id
+        WHERE p.estado = 'Abierta'
+        GROUP BY a.partida_id, a.apostador_id, a.equipo_apostado
+    """).fetchall()
+    return partidas, apuestas
+
+
+def escenarios_partida(total_e1, total_e2):
+    """
+    ((ganancia_casa, pagado) si gana el equipo 1, (ganancia_casa, pagado) si gana el 2),
+    igual que resolver_partida: si nadie apostó al ganador no se paga nada.
+    """
+    casa_e1 = total_e2 * COMISION_CASA_PCT
+    casa_e2 = total_e1 * COMISION_CASA_PCT
+    pago_e1 = total_e1 + total_e2 * COMISION_GANADORES_PCT if total_e1 > 0 else 0.0
+    pago_e2 = total_e2 + total_e1 * COMISION_GANADORES_PCT if total_e2 > 0 else 0.0
+    return (casa_e1, pago_e1), (casa_e2, pago_e2)
+
+
+def probabilidad_equipo1(total_e1, total_e2, modelo='pozo'):
+    if modelo == 'pozo' and total_e1 + total_e2 > 0:
+        return total_e1 / (total_e1 + total_e2)
+    return 0.5
+
+
+def _resumen_cerrado(prob, valores_e1, valores_e2):
+    """Media, desviación, mínimo y máximo de la suma de variables de dos valores independientes."""
+    media = varianza = minimo = maximo = 0.0
+    for p, v1, v2 in zip(prob, valores_e1, valores_e2):
+        media += p * v1 + (1 - p) * v2
+        varianza += p * (1 - p) * (v1 - v2) ** 2
+        minimo += min(v1, v2)
+        maximo += max(v1, v2)
+    return {'esperada': media, 'desviacion': math.sqrt(varianza), 'minima': minimo, 'maxima': maximo}
+
+
+def _percentiles_normal(resumen, percentiles):
+    if resumen['desviacion'] == 0:
+        return {f"p{pct}": resumen['esperada'] for pct in percentiles}
+    normal = NormalDist(resumen['esperada'], resumen['desviacion'])
+    return {f"p{pct}": min(resumen['maxima'], max(resumen['minima'], normal.inv_cdf(pct / 100.0)))
+            for pct in percentiles}
+
+
+def _percentiles_montecarlo(prob, columnas_e1, columnas_e2, simulaciones, seed, percentiles):
+    """
+    Sortea el ganador de todas las partidas en cada simulación y devuelve, por columna
+    (ganancia de la casa, pagos), los percentiles de la suma. El total de una simulación
+    es base + gana_e1 @ diferencia, un producto matriz-vector por bloque.
+    """
+    np = _numpy()
+    rng = np.random.default_rng(seed)
+    p = np.asarray(prob, dtype=float)
+    valores_e1 = np.asarray(columnas_e1, dtype=float).T  # (partidas, columnas)
+    valores_e2 = np.asarray(columnas_e2, dtype=float).T
+    base, diferencia = valores_e2.sum(axis=0), valores_e1 - valores_e2
+    bloque = max(1, ELEMENTOS_POR_BLOQUE // max(1, len(p)))
+    totales = []
+    for inicio in range(0, simulaciones, bloque):
+        gana_e1 = rng.random((min(bloque, simulaciones - inicio), len(p))) < p
+        totales.append(base + gana_e1 @ diferencia)
+    cortes = np.percentile(np.concatenate(totales), percentiles, axis=0)
+    return [{f"p{pct}": float(cortes[i, col]) for i, pct in enumerate(percentiles)}
+            for col in range(len(columnas_e1))]
+
+
+def simular_riesgo(casa, simulaciones=10000, modelo='pozo', probabilidades=None, seed=None,
+                   metodo='auto', limite_apostadores=50, limite_partidas=10, percentiles=PERCENTILES):
+    """
+    Riesgo de todas las partidas abiertas. probabilidades = {partida_id: prob. de que gane el equipo 1}
+    sustituye al modelo en las partidas indicadas. metodo: 'montecarlo' (requiere NumPy), 'normal'
+    o 'auto' (Monte Carlo si NumPy está instalado). Devuelve un diccionario listo para JSON.
+    """
+    if modelo not in MODELOS_PROBABILIDAD:
+        raise ValueError(f"Modelo '{modelo}' no válido. Opciones: {', '.join(MODELOS_PROBABILIDAD)}.")
+    if metodo not in METODOS:
+        raise ValueError(f"Método '{metodo}' no válido. Opciones: {', '.join(METODOS)}.")
+    np = None if metodo == 'normal' else _numpy()  # con 'normal' ni se carga
+    if metodo == 'montecarlo' and np is None:
+        raise ValueError("El método 'montecarlo' necesita NumPy instalado.")
+    if simulaciones <= 0:
+        raise ValueError("El número de simulaciones debe ser mayor a cero.")
+    metodo = 'montecarlo' if metodo == 'auto' and np is not None else ('normal' if metodo == 'auto' else metodo)
+    probabilidades = probabilidades or {}
+
+    partidas, apuestas = cargar_partidas_abiertas(casa)
+    prob, casa_e1, casa_e2, pago_e1, pago_e2 = [], [], [], [], []
+    factores, prob_por_partida, mayor_pago = {}, {}, []
+    for partida in partidas:
+        t1, t2 = partida['total_apostado_e1'] or 0.0, partida['total_apostado_e2'] or 0.0
+        p = probabilidades.get(partida['id'], probabilidad_equipo1(t1, t2, modelo))
+        if not 0 <= p <= 1:
+            raise ValueError(f"Probabilidad no válida para la partida {partida['id']}: {p}")
+        (c1, g1), (c2, g2) = escenarios_partida(t1, t2)
+        prob.append(p)
+        casa_e1.append(c1)
+        casa_e2.append(c2)
+        pago_e1.append(g1)
+        pago_e2.append(g2)
+        prob_por_partida[partida['id']] = p
+        # Lo que cobra cada unidad apostada al equipo si gana (0 si nadie le apostó)
+        factores[partida['id']] = (g1 / t1 if t1 > 0 else 0.0, g2 / t2 if t2 > 0 else 0.0)
+        mayor_pago.append({'id': partida['id'], 'equipo1': partida['nombre_equipo1'],
+                           'equipo2': partida['nombre_equipo2'], 'prob_equipo1': p,
+                           'pago_si_gana_e1': g1, 'pago_si_gana_e2': g2,
+                           'ganancia_casa_si_gana_e1': c1, 'ganancia_casa_si_gana_e2': c2})
+
+    ganancia = _resumen_cerrado(prob, casa_e1, casa_e2)
+    pagos = _resumen_cerrado(prob, pago_e1, pago_e2)
+    if metodo == 'montecarlo' and partidas:
+        ganancia['percentiles'], pagos['percentiles'] = _percentiles_montecarlo(
+            prob, [casa_e1, pago_e1], [casa_e2, pago_e2], simulaciones, seed, percentiles)
+    else:
+        ganancia['percentiles'] = _percentiles_normal(ganancia, percentiles)
+        pagos['percentiles'] = _percentiles_normal(pagos, percentiles)
+
+    # Por apostador: neto (cobrado - apostado) de cada partida en los dos resultados.
+    # Las partidas son independientes, así que el peor caso total es la suma de los peores.
+    por_partida_apostador = {}
+    for fila in apuestas:
+        montos = por_partida_apostador.setdefault((fila['partida_id'], fila['nombre_apostador']), [0.0, 0.0])
+        montos[0 if fila['equipo_apostado'] == 1 else 1] += fila['monto']
+    apostadores = {}
+    for (partida_id, nombre), (m1, m2) in por_partida_apostador.items():
+        f1, f2 = factores[partida_id]
+        p = prob_por_partida[partida_id]
+        neto_e1, neto_e2 = m1 * f1 - (m1 + m2), m2 * f2 - (m1 + m2)
+        datos = apostadores.setdefault(nombre, {'nombre': nombre, 'apostado': 0.0, 'partidas': 0,
+                                                'neto_esperado': 0.0, 'peor_caso': 0.0, 'mejor_caso': 0.0})
+        datos['apostado'] += m1 + m2
+        datos['partidas'] += 1
+        datos['neto_esperado'] += p * neto_e1 + (1 - p) * neto_e2
+        datos['peor_caso'] += min(neto_e1, neto_e2)
+        datos['mejor_caso'] += max(neto_e1, neto_e2)
+
+    return {
+        'partidas_abiertas': len(partidas),
+        'total_apostado': sum(a['apostado'] for a in apostadores.values()),
+        'modelo': modelo,
+        'metodo': metodo,
+        'simulaciones': simulaciones if metodo == 'montecarlo' else 0,
+        'ganancia_casa': ganancia,
+        'pagos': pagos,
+        'partidas_mayor_pago': sorted(mayor_pago, key=lambda d: -max(d['pago_si_gana_e1'], d['pago_si_gana_e2']))[:limite_partidas],
+        'apostadores': sorted(apostadores.values(), key=lambda d: d['peor_caso'])[:limite_apostadores],
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+    from casa_apuestas import CasaDeApuestas, inicializar_base_datos
+
+    parser = argparse.ArgumentParser(description="Riesgo de las partidas abiertas.")
+    parser.add_argument('db', nargs='?', default='casa_apuestas.db')
+    parser.add_argument('--simulaciones', type=int, default=10000)
+    parser.add_argument('--modelo', choices=MODELOS_PROBABILIDAD, default='pozo')
+    parser.add_argument('--metodo', choices=METODOS, default='auto')
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--json', action='store_true', help="Imprime el resultado completo en JSON.")
+    args = parser.parse_args()
+
+    inicializar_base_datos(args.db)
+    casa = CasaDeApuestas(args.db)
+    riesgo = simular_riesgo(casa, args.simulaciones, args.modelo, seed=args.seed, metodo=args.metodo)
+    casa.cerrar_conexion()
+
+    if args.json:
+        print(json.dumps(riesgo, ensure_ascii=False, indent=2))
+    else:
+        g = riesgo['ganancia_casa']
+        print(f"Partidas abiertas: {riesgo['partidas_abiertas']} | Apostado: S/{riesgo['total_apostado']:.2f} "
+              f"| Método: {riesgo['metodo']} ({riesgo['modelo']})")
+        print(f"Ganancia casa esperada: S/{g['esperada']:.2f} (desv. {g['desviacion']:.2f}, "
+              f"rango {g['minima']:.2f} - {g['maxima']:.2f})")
+        print("Percentiles: " + ", ".join(f"{k}: S/{v:.2f}" for k, v in g['percentiles'].items()))
+        print(f"Pagos esperados: S/{riesgo['pagos']['esperada']:.2f} (máximo S/{riesgo['pagos']['maxima']:.2f})")
+        print("Apostadores con peor caso más bajo:")
+        for a in riesgo['apostadores'][:10]:
+            print(f"  {a['nombre']}: apostado S/{a['apostado']:.2f} | esperado S/{a['neto_esperado']:.2f} "
+                  f"| peor S/{a['peor_caso']:.2f} | mejor S/{a['mejor_caso']:.2f}")
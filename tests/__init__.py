@@ -0,0 +1 @@
+"""Pruebas de la Casa de Apuestas (ejecutar con ``python -m pytest`` desde la raíz del repositorio)."""
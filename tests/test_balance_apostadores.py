@@ -0,0 +1,74 @@
+"""
+obtener_balance_apostadores (lee resumen_apostadores) frente al cálculo original,
+dos SUM por apostador sobre apuestas_historial, con los mismos datos sembrados.
+"""
+import pytest
+
+from benchmarks.generador import generar
+from casa_apuestas import CasaDeApuestas
+
+
+def balance_original(cursor):
+    """El reporte como se calculaba antes: un SELECT de apostadores y dos SUM por cada uno."""
+    balance = []
+    for apostador in cursor.execute("SELECT nombre, saldo FROM apostadores ORDER BY id").fetchall():
+        nombre = apostador['nombre']
+        total_apostado = cursor.execute(
+            "SELECT SUM(monto_apostado) FROM apuestas_historial WHERE apostador = ?", (nombre,)).fetchone()[0] or 0.0
+        total_retornado = cursor.execute(
+            "SELECT SUM(monto_cobrado) FROM apuestas_historial WHERE apostador = ?", (nombre,)).fetchone()[0] or 0.0
+        balance.append({
+            'nombre': nombre,
+            'saldo_final': apostador['saldo'],
+            'total_apostado': total_apostado,
+            'total_ganado': total_retornado,
+            'ganancia_neta': total_retornado - total_apostado,
+        })
+    return balance
+
+
+def comparar(casa):
+    nuevo = casa.obtener_balance_apostadores()
+    original = balance_original(casa.cursor)
+    assert [b['nombre'] for b in nuevo] == [b['nombre'] for b in original]
+    for b_nuevo, b_original in zip(nuevo, original):
+        # Las sumas en céntimos y las de los montos en soles solo difieren por el redondeo de los float
+        assert b_nuevo == pytest.approx(b_original, abs=1e-6), b_nuevo['nombre']
+
+
+@pytest.fixture
+def casa(tmp_path):
+    db_path = str(tmp_path / 'casa.db')
+    generar(db_path, apostadores=60, partidas=40, historial=3000, partidas_abiertas=5, apuestas_abiertas=200, seed=7)
+    casa = CasaDeApuestas(db_path)
+    yield casa
+    casa.cerrar_conexion()
+
+
+def test_coincide_con_el_calculo_original(casa):
+    # Un apostador sin historial también sale, con la actividad en 0
+    casa.registrar_apostador('sin_historial', 12.5)
+    comparar(casa)
+
+
+def test_coincide_tras_resolver_partidas(casa):
+    # resolver_partida actualiza resumen_apostadores de forma incremental
+    abiertas = [fila['id'] for fila in casa.cursor.execute("SELECT id FROM partidas WHERE estado = 'Abierta'")]
+    casa.registrar_apostador('nuevo', 500)
+    casa.registrar_apuesta(abiertas[0], 'nuevo', 120.35, 1)
+    casa.registrar_apuesta(abiertas[0], 'nuevo', 0.01, 2)
+    for i, partida_id in enumerate(abiertas):
+        casa.resolver_partida(partida_id, 1 + i % 2)
+    comparar(casa)
+
+
+def test_borrar_partidas_resueltas_descuenta_resumenes(casa):
+    # Quien solo tenía historial en las partidas borradas sale de resumen_apostadores
+    partida_id = casa.cursor.execute("SELECT id FROM partidas WHERE estado = 'Abierta'").fetchone()[0]
+    casa.registrar_apostador('de_paso', 100)
+    casa.registrar_apuesta(partida_id, 'de_paso', 10, 1)
+    casa.resolver_partida(partida_id, 1)
+    casa.borrar_partidas_resueltas()
+    assert casa.cursor.execute("SELECT COUNT(*) FROM resumen_apostadores").fetchone()[0] == 0
+    assert casa.reconstruir_resumenes() == []
+    comparar(casa)
@@ -0,0 +1,66 @@
+"""
+Caché de cuotas (cuotas.py) frente a la base: apuestas, resolución y borrado hechos
+con otra conexión (como otro worker) mientras la app sigue el bus de eventos.
+"""
+import importlib
+import sys
+import time
+
+import pytest
+
+from casa_apuestas import CasaDeApuestas
+from cuotas import verificar_consistencia
+
+# Segundos máximos esperando a que el bus aplique los eventos
+ESPERA_MAXIMA = 5
+
+
+@pytest.fixture
+def aplicacion(tmp_path, monkeypatch):
+    # app.py lee CASA_DB_PATH al importarse: se importa de nuevo apuntando a una base temporal
+    monkeypatch.setenv('CASA_DB_PATH', str(tmp_path / 'casa.db'))
+    monkeypatch.delitem(sys.modules, 'app', raising=False)
+    aplicacion = importlib.import_module('app')
+    aplicacion.bus_eventos.intervalo = 0.02
+    yield aplicacion
+    aplicacion.bus_eventos.detener()
+    monkeypatch.delitem(sys.modules, 'app', raising=False)
+
+
+def esperar_consistencia(cache):
+    """Diferencias con la base en cuanto el bus se pone al día (o las que queden al agotar la espera)."""
+    limite = time.monotonic() + ESPERA_MAXIMA
+    diferencias = verificar_consistencia(cache)
+    while diferencias and time.monotonic() < limite:
+        time.sleep(0.01)
+        diferencias = verificar_consistencia(cache)
+    return diferencias
+
+
+def test_cache_al_dia_tras_apostar_resolver_y_borrar(aplicacion):
+    cliente = aplicacion.app.test_client()
+    cache = aplicacion.cache_cuotas
+    casa = CasaDeApuestas(aplicacion.DB_PATH)
+    try:
+        for nombre in ('ana', 'beto'):
+            casa.registrar_apostador(nombre, 1000)
+        resuelta = casa.crear_partida('Leones', 'Tigres')
+        abierta = casa.crear_partida('Pumas', 'Osos')
+        # Primera lectura: carga la caché y arranca el bus
+        assert {p['partida_id'] for p in cliente.get('/api/odds').get_json()['partidas']} == {resuelta, abierta}
+
+        casa.registrar_apuesta(resuelta, 'ana', 30, 1)
+        casa.registrar_apuesta(resuelta, 'beto', 10.5, 2)
+        casa.registrar_apuestas_lote([{'partida_id': abierta, 'nombre_apostador': 'beto', 'monto': 7, 'equipo': 1},
+                                      {'partida_id': abierta, 'nombre_apostador': 'ana', 'monto': 2.25, 'equipo': 2}])
+        assert esperar_consistencia(cache) == []
+        assert cliente.get(f'/api/odds/{abierta}').get_json()['total_e2'] == 2.25
+
+        casa.resolver_partida(resuelta, 1)
+        casa.borrar_partidas_resueltas()
+        assert esperar_consistencia(cache) == []
+    finally:
+        casa.cerrar_conexion()
+
+    assert cliente.get(f'/api/odds/{resuelta}').status_code == 404
+    assert [p['partida_id'] for p in cliente.get('/api/odds').get_json()['partidas']] == [abierta]
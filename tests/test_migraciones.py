@@ -0,0 +1,28 @@
+"""Migraciones del esquema: versión final e índices de las consultas críticas."""
+import sqlite3
+
+import pytest
+
+from migraciones import VERSION_ACTUAL, aplicar_migraciones, consultas_con_escaneo, obtener_version
+
+
+@pytest.fixture
+def conexion(tmp_path):
+    conexion = sqlite3.connect(tmp_path / 'casa.db')
+    yield conexion
+    conexion.close()
+
+
+def test_base_nueva_sin_escaneos(conexion):
+    aplicar_migraciones(conexion)
+    assert obtener_version(conexion) == VERSION_ACTUAL
+    assert consultas_con_escaneo(conexion) == {}
+
+
+def test_base_antigua_migrada_sin_escaneos(conexion):
+    # Una base que se quedó en el esquema inicial llega a los mismos índices
+    aplicar_migraciones(conexion, hasta=1)
+    aplicar_migraciones(conexion)
+    assert obtener_version(conexion) == VERSION_ACTUAL
+    assert consultas_con_escaneo(conexion) == {}
+    assert aplicar_migraciones(conexion) == []
@@ -0,0 +1,49 @@
+"""
+Débito de saldo al apostar: varios procesos contra los mismos apostadores
+(benchmarks/estres_saldos.py en tamaño pequeño) y reintento de _escribir
+cuando la base sigue bloqueada tras el busy_timeout.
+"""
+import json
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from benchmarks import estres_saldos
+from casa_apuestas import CasaDeApuestas, inicializar_base_datos, perfil_almacenamiento
+
+
+def test_estres_sin_saldos_negativos_y_todo_cuadra(tmp_path, capsys):
+    # Con poco saldo se agota enseguida: se prueban también los rechazos
+    with pytest.raises(SystemExit) as salida:
+        estres_saldos.main(['--procesos', '2', '--hilos', '2', '--apuestas', '50', '--saldo', '300',
+                            '--db', str(tmp_path / 'casa.db')])
+    resultado = json.loads(capsys.readouterr().out.strip().splitlines()[-1])['resultados']
+    assert resultado['fallos'] == []
+    assert resultado['errores'] == 0
+    assert resultado['rechazadas'] > 0
+    assert salida.value.code == 0
+
+
+def test_reintenta_si_la_base_sigue_bloqueada(tmp_path):
+    db_path = str(tmp_path / 'casa.db')
+    inicializar_base_datos(db_path)
+    # busy_timeout de 1 ms: la espera la hace el bucle de reintentos de _escribir, no SQLite
+    casa = CasaDeApuestas(db_path, perfil_almacenamiento(busy_timeout=1))
+    try:
+        casa.registrar_apostador('ana', 100)
+        partida_id = casa.crear_partida('Leones', 'Tigres')
+
+        # Otro "worker" tiene el bloqueo de escritura y lo suelta a los 0.1 s
+        bloqueo = sqlite3.connect(db_path, check_same_thread=False)
+        bloqueo.execute("BEGIN IMMEDIATE")
+        threading.Timer(0.1, bloqueo.rollback).start()
+        inicio = time.monotonic()
+        casa.registrar_apuesta(partida_id, 'ana', 30, 1)
+        assert time.monotonic() - inicio >= 0.1
+        bloqueo.close()
+
+        assert casa.cursor.execute("SELECT saldo FROM apostadores WHERE nombre = 'ana'").fetchone()[0] == 70
+    finally:
+        casa.cerrar_conexion()